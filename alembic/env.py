@@ -10,14 +10,17 @@ with open("config.json") as f:
     config_data = json.load(f)
 
 # Ajouter le chemin de new_project au PYTHONPATH
-sys.path.append(config_data["new_project_path"])
+if config_data["new_project_path"] not in sys.path:
+    sys.path.append(config_data["new_project_path"])
 
 # Importer les modèles de new_project
 from app.db.base import Base  # Assurez-vous que c'est le bon chemin
 
 # Configuration d'Alembic
 config = context.config
-fileConfig(config.config_file_name)
+# Skipped when Alembic runs inside the API process, whose logging is already set up
+if config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 target_metadata = Base.metadata
 
 
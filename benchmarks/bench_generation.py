@@ -0,0 +1,105 @@
+"""
+Compare the sequential `write_*` generators with the pooled `GenerationEngine`.
+
+Usage (from the repository root):
+
+    python -m benchmarks.bench_generation --classes 150 --attributes 12
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from core.generate_apis_unit_test import write_test_apis
+from core.generate_crud import write_crud
+from core.generate_crud_unit_test import write_test_crud
+from core.generate_endpoints import write_endpoints
+from core.generate_models import write_models
+from core.generate_schema import write_schemas
+from core.generation_engine import GenerationEngine
+
+TYPES = ["String", "Integer", "Text", "Boolean", "Float", "DateTime", "Date", "JSON"]
+
+
+def build_models(classes: int, attributes: int):
+    models = []
+    for i in range(classes):
+        columns = [
+            {
+                "name": f"field_{j}",
+                "type": TYPES[j % len(TYPES)],
+                "length": 100,
+                "is_required": j % 2 == 0,
+            }
+            for j in range(attributes)
+        ]
+        if i > 0:
+            columns.append({
+                "name": f"class_{i - 1}_id",
+                "type": "Integer",
+                "is_required": False,
+                "is_foreign": True,
+                "foreign_key_class": f"Class{i - 1}",
+                "foreign_key": "id",
+            })
+        models.append({"name": f"Class{i}", "attributes": columns})
+    return models
+
+
+def new_project_dir():
+    project_dir = tempfile.mkdtemp(prefix="bench_generation_")
+    for sub_dir in ("app/api/api_v1", "tests"):
+        os.makedirs(os.path.join(project_dir, sub_dir), exist_ok=True)
+    return project_dir
+
+
+def run_sequential(models, project_dir):
+    write_models(models, project_dir)
+    write_schemas(models, project_dir)
+    write_crud(models, project_dir)
+    write_endpoints(models, project_dir)
+    write_test_crud(models, project_dir)
+    write_test_apis(models, project_dir)
+
+
+def run_engine(models, project_dir, workers, executor):
+    GenerationEngine(project_dir, max_workers=workers, executor=executor).run(models)
+
+
+def timed(label, func, repeat):
+    timings = []
+    for _ in range(repeat):
+        project_dir = new_project_dir()
+        start = time.perf_counter()
+        func(project_dir)
+        timings.append(time.perf_counter() - start)
+        shutil.rmtree(project_dir, ignore_errors=True)
+    best = min(timings)
+    print(f"{label:<28} best {best * 1000:9.1f} ms   mean {sum(timings) / len(timings) * 1000:9.1f} ms")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--classes", type=int, default=150)
+    parser.add_argument("--attributes", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    models = build_models(args.classes, args.attributes)
+    print(f"{args.classes} classes, {args.attributes} attributes each, {args.workers} workers")
+
+    baseline = timed("sequential write_*", lambda d: run_sequential(models, d), args.repeat)
+    for executor in ("thread", "process"):
+        best = timed(
+            f"engine ({executor})",
+            lambda d: run_engine(models, d, args.workers, executor),
+            args.repeat,
+        )
+        print(f"{'':<28} speed-up x{baseline / best:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compare the per row `generate_data` factories with the columnar generator of `utils.seed_data`,
+then load the columnar rows in a SQLite file with `executemany`.
+
+Usage (from the repository root):
+
+    python -m benchmarks.bench_seed_data --rows 1000000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import JSON, Boolean, Column, Date, DateTime, Float, Integer, MetaData, String, Table, Text, create_engine
+
+from schemas import AttributesModel, ClassModel
+from utils import seed_data
+from utils.generate_data_test import generate_data
+
+TYPES = ["String", "Integer", "Text", "Boolean", "Float", "DateTime", "Date", "JSON"]
+
+
+def build_model() -> ClassModel:
+    attributes = [AttributesModel(name="id", type="Integer", is_primary=True, is_auto_increment=True)]
+    attributes += [AttributesModel(name=f"field_{type_.lower()}", type=type_, length=50) for type_ in TYPES]
+    attributes.append(AttributesModel(name="code", type="String", length=20, is_unique=True))
+    return ClassModel(name="Sample", attributes=attributes)
+
+
+def per_row(model: ClassModel, rows: int) -> float:
+    attributes = [attr for attr in model.attributes if not attr.is_primary]
+    start = time.perf_counter()
+    for _ in range(rows):
+        {attr.name: generate_data(attr.type, attr.length or 0) for attr in attributes}
+    return time.perf_counter() - start
+
+
+def columnar(model: ClassModel, rows: int) -> float:
+    attributes = [attr for attr in model.attributes if not attr.is_primary]
+    rng = seed_data.create_random(0)
+    start = time.perf_counter()
+    for offset in range(0, rows, seed_data.CHUNK_SIZE):
+        size = min(seed_data.CHUNK_SIZE, rows - offset)
+        [seed_data.generate_column(rng, attr, offset, size) for attr in attributes]
+    return time.perf_counter() - start
+
+
+def column_type(attr: AttributesModel):
+    return {"STRING": String(attr.length), "INTEGER": Integer, "TEXT": Text, "BOOLEAN": Boolean,
+            "FLOAT": Float, "DATETIME": DateTime, "DATE": Date, "JSON": JSON}[attr.type.upper()]
+
+
+def load(model: ClassModel, rows: int) -> float:
+    directory = tempfile.mkdtemp()
+    try:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'seed.db')}")
+        metadata = MetaData()
+        columns = [Column(attr.name, column_type(attr)) for attr in model.attributes if not attr.is_primary]
+        Table("sample", metadata, Column("id", Integer, primary_key=True), *columns)
+        metadata.create_all(engine)
+        start = time.perf_counter()
+        seed_data.seed([model], engine, rows=rows, seed_value=0)
+        return time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--per-row-rows", type=int, default=50000, help="rows of the (slow) per row run")
+    args = parser.parse_args()
+
+    model = build_model()
+    print(f"{len(model.attributes)} columns, numpy: {seed_data.np is not None}")
+    per_row_rate = args.per_row_rows / per_row(model, args.per_row_rows)
+    columnar_rate = args.rows / columnar(model, args.rows)
+    load_rate = args.rows / load(model, args.rows)
+    print(f"  {'generate_data, per row':<36} {per_row_rate:>12,.0f} rows/s")
+    print(f"  {'seed_data, columnar':<36} {columnar_rate:>12,.0f} rows/s  (x{columnar_rate / per_row_rate:.1f})")
+    print(f"  {'seed_data, generated and loaded':<36} {load_rate:>12,.0f} rows/s  (SQLite executemany)")
+
+
+if __name__ == "__main__":
+    main()
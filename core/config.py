@@ -8,6 +8,13 @@ class Settings(BaseSettings):
     MYSQL_HOST: str
     MYSQL_PORT: str
     MYSQL_DATABASE: str
+    # Code generation pool: 0 means one worker per CPU
+    GENERATION_WORKERS: int = 0
+    GENERATION_EXECUTOR: str = "process"
+    # Generation jobs run in the background by this many workers
+    GENERATION_JOB_WORKERS: int = 2
+    # "fsync" flushes the generated files once per generation, "none" skips it (CI)
+    GENERATION_DURABILITY: str = "fsync"
 
     class Config:
         env_file = ".env"
@@ -1,21 +1,29 @@
 import os
+from typing import List
 
+from core.generated_files import GenerationManifest
 from model_type import camel_to_snake
 
 LIST_DIRS = [
     {"name": "/app/models/", "prefix": "", "suffix": ""},
     {"name": "/app/schemas/", "prefix": "", "suffix": ""},
-    {"name": "/app/schemas/", "prefix": "", "suffix": ""},
     {"name": "/app/crud/", "prefix": "crud_", "suffix": ""},
     {"name": "/app/api/api_v1/endpoints/", "prefix": "", "suffix": "s"},
-    {"name": "/test/", "prefix": "test_apis_", "suffix": ""},
-    {"name": "/test/", "prefix": "test_crud_", "suffix": ""},
+    {"name": "/tests/", "prefix": "test_apis_", "suffix": ""},
+    {"name": "/tests/", "prefix": "test_crud_", "suffix": ""},
+    {"name": "/benchmarks/", "prefix": "bench_api_", "suffix": ""},
 ]
 
 
-def delete_files(model: str, output_dir: str):
+def delete_files(model: str, output_dir: str, manifest: GenerationManifest = None) -> List[str]:
+    """Remove the generated files of a deleted class and drop them from the manifest. Return the removed paths."""
     file_name = camel_to_snake(model)
+    removed = []
     for dirs_ in LIST_DIRS:
-        path_ = output_dir + dirs_["name"] + dirs_["prefix"]+file_name+dirs_["suffix"]
+        path_ = output_dir + dirs_["name"] + dirs_["prefix"] + file_name + dirs_["suffix"] + ".py"
         if os.path.exists(path_):
             os.remove(path_)
+            removed.append(path_)
+        if manifest is not None:
+            manifest.forget(path_)
+    return removed
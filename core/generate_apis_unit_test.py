@@ -1,9 +1,11 @@
 import os
 import logging
-from typing import List, Dict, Any
+import random
+from typing import List, Dict, Any, Tuple
 
 from schemas import ClassModel, AttributesModel
 
+from core.generated_files import GenerationManifest, write_generated_file
 from model_type import preserve_custom_sections, camel_to_snake
 from utils.generate_data_test import generate_data
 
@@ -25,12 +27,12 @@ def generate_import() -> str:
     ])
 
 
-def generate_column(data: List[AttributesModel]) -> Dict[str, Any]:
+def generate_column(data: List[AttributesModel], rng: random.Random) -> Dict[str, Any]:
     """Generate column data based on model attributes."""
     result = {}
     for attr in data:
         if attr.is_required:
-            result[attr.name] = generate_data(attr.type, attr.length)
+            result[attr.name] = generate_data(attr.type, attr.length, rng)
     return result
 
 
@@ -72,7 +74,7 @@ generate_access_token_str = "\n".join(generate_access_token())
 generate_bearer_str = "\n".join(generate_bearer())
 
 
-def generate_test_api(model: ClassModel, table_name: str) -> str:
+def generate_test_api(model: ClassModel, table_name: str, rng: random.Random) -> str:
     """Generate test functions for API operations (create, update, delete, get, get_by_id)."""
     test_name = camel_to_snake(model.name)
     class_lines = []
@@ -84,7 +86,7 @@ def generate_test_api(model: ClassModel, table_name: str) -> str:
             # Test for creating a new record via API
             data = [
                 generate_access_token_str,
-                f"    {test_name}_data = {generate_column(model.attributes)}",
+                f"    {test_name}_data = {generate_column(model.attributes, rng)}",
                 f"    response = client.post(",
                 f"        '/api/v1/{table_name}/',",
                 f"        {table_name}_in={test_name}_data,",
@@ -93,7 +95,7 @@ def generate_test_api(model: ClassModel, table_name: str) -> str:
                 f"    assert response.status_code == 200, response.text",
                 f"    created_{test_name} = response.json()",
                 f"    assert created_{test_name}['id'] is not None",
-                f"    assert created_{test_name}['{list(generate_column(model.attributes).keys())[0]}'] == {test_name}_data['{list(generate_column(model.attributes).keys())[0]}']"
+                f"    assert created_{test_name}['{list(generate_column(model.attributes, rng).keys())[0]}'] == {test_name}_data['{list(generate_column(model.attributes, rng).keys())[0]}']"
             ]
             test_lines.extend(data)
 
@@ -102,7 +104,7 @@ def generate_test_api(model: ClassModel, table_name: str) -> str:
             data = [
                 generate_access_token_str,
                 f"    # Create a record first",
-                f"    {test_name}_data = {generate_column(model.attributes)}",
+                f"    {test_name}_data = {generate_column(model.attributes, rng)}",
                 f"    create_response = client.post(",
                 f"        '/api/v1/{table_name}/',",
                 f"        {table_name}_in={test_name}_data",
@@ -111,7 +113,7 @@ def generate_test_api(model: ClassModel, table_name: str) -> str:
                 f"    created_{test_name} = create_response",
                 f"",
                 f"    # Update the record",
-                f"    update_data = {generate_column(model.attributes)}",
+                f"    update_data = {generate_column(model.attributes, rng)}",
                 f"    update_response = client.put(",
                 f"        '/api/v1/{table_name}/',",
                 f"        {table_name}_in=update_data,",
@@ -130,7 +132,7 @@ def generate_test_api(model: ClassModel, table_name: str) -> str:
             data = [
                 generate_access_token_str,
                 f"    # Create a record first",
-                f"    {test_name}_data = {generate_column(model.attributes)}",
+                f"    {test_name}_data = {generate_column(model.attributes, rng)}",
                 f"    create_response = client.post(",
                 f"        '/api/v1/{table_name}/',",
                 f"        {table_name}_in={test_name}_data,",
@@ -156,7 +158,7 @@ def generate_test_api(model: ClassModel, table_name: str) -> str:
             data = [
                 generate_access_token_str,
                 f"    # Create a record first",
-                f"    {test_name}_data = {generate_column(model.attributes)}",
+                f"    {test_name}_data = {generate_column(model.attributes, rng)}",
                 f"    create_response = client.post(",
                 f"        '/api/v1/{table_name}/',",
                 f"        {table_name}_in={test_name}_data,",
@@ -183,7 +185,7 @@ def generate_test_api(model: ClassModel, table_name: str) -> str:
             data = [
                 generate_access_token_str,
                 f"    # Create a record first",
-                f"    {test_name}_data = {generate_column(model.attributes)}",
+                f"    {test_name}_data = {generate_column(model.attributes, rng)}",
                 f"    create_response = client.post(",
                 f"        '/api/v1/{table_name}/',",
                 f"        {table_name}_in={test_name}_data,",
@@ -217,32 +219,40 @@ def generate_test_api(model: ClassModel, table_name: str) -> str:
     return "\n".join(class_lines)
 
 
-def generate_full_schema(model: ClassModel, table_name: str) -> str:
+def generate_full_schema(model: ClassModel, table_name: str, rng: random.Random) -> str:
     """Generate the full schema for a model, including imports and test functions."""
     return "\n".join([
         generate_import(),
-        generate_test_api(model, table_name),
+        generate_test_api(model, table_name, rng),
     ])
 
 
-def write_test_apis(models: List[ClassModel], output_dir: str) -> None:
-    """Write the generated schemas to files, preserving custom sections."""
-    output_dir = output_dir + OUTPUT_DIR
+def render_test_api(model: ClassModel, output_dir: str, config: dict = None) -> Tuple[str, str]:
+    """Render the API test file of a class, preserving custom sections. Return (file_path, content)."""
+    # Seeded from the class definition so an unchanged class renders the same test data. A
+    # generator of its own: the renderers run in threads, they can't share the global one
+    rng = random.Random(repr(model))
+    table_name = camel_to_snake(model.name)
+    schemas = generate_full_schema(model, table_name, rng)
+    file_name = f"test_apis_{table_name}.py"
+    file_path = os.path.join(output_dir + OUTPUT_DIR, file_name)
+
+    # Preserve custom sections in the file
+    return file_path, preserve_custom_sections(file_path, schemas)
+
 
+def write_test_apis(models: List[ClassModel], output_dir: str, manifest: GenerationManifest = None) -> None:
+    """Write the generated schemas to files, preserving custom sections."""
     for model in models:
         # try:
         model = ClassModel(**model)
         table_name = camel_to_snake(model.name)
-        schemas = generate_full_schema(model, table_name)
-        file_name = f"test_apis_{table_name}.py"
-        file_path = os.path.join(output_dir, file_name)
-
-        # Preserve custom sections in the file
-        final_content = preserve_custom_sections(file_path, schemas)
+        file_path, final_content = render_test_api(model, output_dir)
 
-        with open(file_path, "w") as f:
-            f.write(final_content)
-        logger.info(f"Generated schemas for: {table_name}")
+        if write_generated_file(file_path, final_content, manifest):
+            logger.info(f"Generated schemas for: {table_name}")
+        else:
+            logger.info(f"Unchanged schemas for: {table_name}")
     # except Exception as e:
     #     logger.error(f"Failed to generate schema for {model.name}: {e}")
 
@@ -1,6 +1,7 @@
 import os
 from typing import List
 
+from core.generated_files import GenerationManifest, write_generated_file
 from model_type import snake_to_camel, camel_to_snake, generate_class_name
 from schemas import ClassModel
 
@@ -23,13 +24,12 @@ def generate_base_file(models: List[ClassModel]):
     return "\n".join(lines) + "\n"
 
 
-def write_base_files(models: List[ClassModel], output_dir: str):
+def write_base_files(models: List[ClassModel], output_dir: str, manifest: GenerationManifest = None):
     schema_folder = output_dir + "/app/db"
 
     # Generate __init__.py content
     init_content_schemas = generate_base_file(models)
 
     # Write the content to __init__.py
-    with open(os.path.join(schema_folder, "base.py"), "w") as init_file_schemas:
-        init_file_schemas.write(init_content_schemas)
+    write_generated_file(os.path.join(schema_folder, "base.py"), init_content_schemas, manifest)
     print("Successfully generated base.py!")
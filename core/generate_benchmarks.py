@@ -0,0 +1,96 @@
+import os
+import random
+from typing import List, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from schemas import ClassModel, AttributesModel
+
+from model_type import camel_to_snake, snake_to_camel
+from utils.generate_data_test import generate_comumn_name, generate_data
+
+# Configuration
+OUTPUT_DIR = "/benchmarks"
+# Request bodies rendered per class, the harness cycles over them
+FIXTURE_COUNT = 20
+
+
+def generate_fixture(model: ClassModel, rng: random.Random) -> dict:
+    """
+    Body of a create request. Foreign keys are left out: the harness sets the required ones to a
+    row of the parent class it seeds first, see `generate_parents`.
+    """
+    fixture = {}
+    for attr in model.attributes:
+        if attr.is_primary or attr.is_auto_increment or attr.is_foreign:
+            continue
+        fixture[generate_comumn_name(attr.name)["name"]] = generate_data(attr.type, attr.length or 0, rng)
+    return jsonable_encoder(fixture)
+
+
+def generate_unique(model: ClassModel) -> dict:
+    return {
+        generate_comumn_name(attr.name)["name"]: attr.length or 0
+        for attr in model.attributes
+        if attr.is_unique and not attr.is_primary and not attr.is_foreign
+    }
+
+
+def generate_parents(model: ClassModel) -> List[Tuple[str, str]]:
+    """(column, parent table) of the required foreign keys to another class."""
+    return [
+        (attr.name, camel_to_snake(attr.foreign_key_class))
+        for attr in model.attributes
+        if attr.is_foreign and attr.is_required and attr.foreign_key_class and attr.foreign_key_class != model.name
+    ]
+
+
+def generate_benchmark(model: ClassModel, table_name: str, rng: random.Random) -> str:
+    """Generate the benchmark module of a class, run by `benchmarks/harness.py`."""
+    schema_name = snake_to_camel(table_name)
+    fixtures = [generate_fixture(model, rng) for _ in range(FIXTURE_COUNT)]
+    parents = generate_parents(model)
+    lines = [
+        '"""',
+        f"Benchmark of the {table_name} endpoints: list, get by id, create, update and delete,",
+        "see benchmarks/harness.py.",
+        "",
+        f"    python -m benchmarks.bench_api_{table_name} --rows 10000 --requests 500 --concurrency 16 \\",
+        f"        --output benchmarks/results/{table_name}.json",
+        '"""',
+        "from app import crud, schemas",
+        f"from app.api.api_v1.endpoints import {table_name}s",
+        *(f"from benchmarks import bench_api_{parent}" for parent in sorted({parent for _, parent in parents})),
+        "from benchmarks import harness",
+        "",
+        "# Request bodies rendered with the test data factories of the generator",
+        "FIXTURES = [",
+        *(f"    {fixture!r}," for fixture in fixtures),
+        "]",
+        "# Unique columns and their length, their values are suffixed with a counter",
+        f"UNIQUE = {generate_unique(model)!r}",
+        "# Required foreign keys: (crud, create schema, FIXTURES, UNIQUE, PARENTS) of the parent class,",
+        "# the harness seeds a parent row first and every body references it",
+        "PARENTS = {",
+        *(f"    '{column}': (crud.{parent}, schemas.{snake_to_camel(parent)}Create, bench_api_{parent}.FIXTURES,"
+          f" bench_api_{parent}.UNIQUE, bench_api_{parent}.PARENTS)," for column, parent in parents),
+        "}",
+        "",
+        "",
+        "if __name__ == '__main__':",
+        f"    harness.run('{table_name}', {table_name}s.router, crud.{table_name}, schemas.{schema_name}Create,",
+        "                FIXTURES, UNIQUE, PARENTS)",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def render_benchmark(model: ClassModel, output_dir: str, config: dict = None) -> Tuple[str, str]:
+    """Render the benchmark module of a class. Return (file_path, content)."""
+    # Seeded from the class definition so an unchanged class renders the same fixtures, and a
+    # generator of its own since the renderers run in threads
+    rng = random.Random(repr(model))
+    table_name = camel_to_snake(model.name)
+    file_path = os.path.join(output_dir + OUTPUT_DIR, f"bench_api_{table_name}.py")
+    return file_path, generate_benchmark(model, table_name, rng)
+
@@ -1,7 +1,8 @@
 import os
 import re
-from typing import List
+from typing import List, Tuple
 
+from core.generated_files import GenerationManifest, write_generated_file
 from model_type import preserve_custom_sections, \
     snake_to_camel, camel_to_snake  # Import your model definitions
 from schemas import ClassModel
@@ -9,7 +10,7 @@ from schemas import ClassModel
 OUTPUT_DIR = "/app/crud"
 
 
-def generate_crud_imports(table_name: str, model_name: str) -> str:
+def generate_crud_imports(table_name: str, model_name: str, async_db: bool = False) -> str:
     """Generate the necessary imports for the CRUD class."""
     schema_create = f"{snake_to_camel(table_name)}Create"
     schema_update = f"{snake_to_camel(table_name)}Update"
@@ -18,18 +19,26 @@ def generate_crud_imports(table_name: str, model_name: str) -> str:
         "from typing import Optional, List, Dict, Any",
         "from sqlalchemy.orm import Session",
         "",
-        f"from app.crud.base import CRUDBase",
+        "from app.crud.base_copy import CRUDBase",
         f"from app.models.{table_name} import {model_name}",
         f"from app.schemas.{table_name} import {schema_create}, {schema_update}",
         "",
     ]
 
     import_user = [
-        "from app.core.security import get_password_hash, verify_password",
-        "from fastapi.encoders import jsonable_encoder",
+        "from fastapi import HTTPException",
+        "from app.core import hashing",
+        "from fastapi.concurrency import run_in_threadpool",
+    ]
+    import_async = [
+        "from sqlalchemy import select",
+        "from sqlalchemy.ext.asyncio import AsyncSession",
+        "from app.crud.base_async import AsyncCRUDBase",
     ]
     if model_name == "User":
         imports += import_user
+    if async_db:
+        imports += import_async
     return "\n".join(imports)
 
 
@@ -79,18 +88,58 @@ def generate_crud_functions(table_name: str, model_name: str) -> str:
         f"        user = self.get_by_email(db, email=email)",
         f"        if not user:",
         f"            return None",
-        f"        if not verify_password(password, user.hashed_password):",
+        f"        valid, new_hash = hashing.verify_and_update(password, user.hashed_password)",
+        f"        if not valid:",
         f"            return None",
+        f"        if new_hash:",
+        f"            self.rehash(db, user=user, hashed_password=new_hash)",
+        f"        return user",
+        "",
+        f"    async def authenticate_async(self, db: Session, *, email: str, password: str) -> {model_name}:",
+        f"        \"\"\"Same as authenticate, no threadpool slot is held while the password is verified.\"\"\"",
+        f"        user = await run_in_threadpool(self.get_by_email, db, email=email)",
+        f"        if not user:",
+        f"            return None",
+        f"        valid, new_hash = await hashing.verify_and_update_async(password, user.hashed_password)",
+        f"        if not valid:",
+        f"            return None",
+        f"        if new_hash:",
+        f"            await run_in_threadpool(self.rehash, db, user=user, hashed_password=new_hash)",
+        f"        return user",
+        "",
+        f"    def rehash(self, db: Session, *, user: User, hashed_password: str) -> User:",
+        f"        \"\"\"Replace a hash made with deprecated settings, after a successful verification.\"\"\"",
+        f"        user.hashed_password = hashed_password",
+        f"        db.add(user)",
+        f"        db.commit()",
         f"        return user",
         "",
         f"    def create(self, db: Session, *, obj_in: UserCreate) -> User:",
-        f"        obj_data = jsonable_encoder(obj_in)",
+        f"        obj_data = obj_in.dict()",
         f"        pass_value = obj_data.pop('password')",
-        f"        db_obj = User(hashed_password=get_password_hash(pass_value), **obj_data)",
+        f"        db_obj = User(hashed_password=hashing.hash_password(pass_value), **obj_data)",
         f"        db.add(db_obj)",
         f"        db.commit()",
         f"        db.refresh(db_obj)",
         f"        return db_obj",
+        "",
+        f"    def get_bulk_rows(self, objs_in: List[Any], upsert: bool = False) -> List[dict]:",
+        f"        \"\"\"Rows of a bulk insert, 400 when a user to create has no password.\"\"\"",
+        f"        rows = [dict(obj_in) if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True) for obj_in in objs_in]",
+        f"        for row in rows:",
+        f"            created = not upsert or row.get('id') is None",
+        f"            if created and not row.get('password') and not row.get('hashed_password'):",
+        f"                raise HTTPException(status_code=400, detail='A password is required to create a user')",
+        f"        return rows",
+        "",
+        f"    def create_bulk(self, db: Session, *, objs_in: List[Any], upsert: bool = False, **kwargs) -> List[Optional[int]]:",
+        f"        \"\"\"CRUDBase.create_bulk, the passwords are hashed into hashed_password in the hashing pool.\"\"\"",
+        f"        rows = self.get_bulk_rows(objs_in, upsert=upsert)",
+        f"        with_password = [row for row in rows if row.get('password')]",
+        f"        hashes = hashing.hash_passwords([row.pop('password') for row in with_password])",
+        f"        for row, hashed_password in zip(with_password, hashes):",
+        f"            row['hashed_password'] = hashed_password",
+        f"        return super().create_bulk(db, objs_in=rows, upsert=upsert, **kwargs)",
         f"",
         f"",
     ]
@@ -110,32 +159,106 @@ def generate_crud_instance(table_name: str, model_name: str) -> str:
     return "\n".join(instance)
 
 
-def generate_crud(table_name: str, model_name: str) -> str:
+def generate_async_crud(table_name: str, model_name: str) -> str:
+    """Generate the AsyncCRUDBase class and its `{table_name}_async` instance."""
+    crud_class_name = f"CRUD{snake_to_camel(table_name)}Async"
+    schema_create = f"{snake_to_camel(table_name)}Create"
+    schema_update = f"{snake_to_camel(table_name)}Update"
+
+    lines = [
+        f"\nclass {crud_class_name}(AsyncCRUDBase[{model_name}, {schema_create}, {schema_update}]):",
+    ]
+    if model_name == "User":
+        lines += [
+            f"    async def get_by_email(self, db: AsyncSession, *, email: str) -> Optional[{model_name}]:",
+            f"        result = await db.execute(select({model_name}).where({model_name}.email == email).limit(1))",
+            f"        return result.scalars().first()",
+            "",
+            f"    def is_superuser(self, user: User) -> {model_name}:",
+            f"        return user.is_superuser",
+            "",
+            f"    def is_active(self, user: User) -> {model_name}:",
+            f"        return user.is_active",
+            "",
+            f"    async def authenticate(self, db: AsyncSession, *, email: str, password: str) -> {model_name}:",
+            f"        user = await self.get_by_email(db, email=email)",
+            f"        if not user:",
+            f"            return None",
+            f"        valid, new_hash = await hashing.verify_and_update_async(password, user.hashed_password)",
+            f"        if not valid:",
+            f"            return None",
+            f"        if new_hash:",
+            f"            user.hashed_password = new_hash",
+            f"            db.add(user)",
+            f"            await db.commit()",
+            f"        return user",
+            "",
+            f"    async def create(self, db: AsyncSession, *, obj_in: UserCreate) -> User:",
+            f"        obj_data = obj_in.dict()",
+            f"        pass_value = obj_data.pop('password')",
+            f"        db_obj = User(hashed_password=await hashing.hash_password_async(pass_value), **obj_data)",
+            f"        db.add(db_obj)",
+            f"        await db.commit()",
+            f"        await db.refresh(db_obj)",
+            f"        return db_obj",
+            "",
+            f"    async def create_bulk(",
+            f"            self, db: AsyncSession, *, objs_in: List[Any], upsert: bool = False, **kwargs",
+            f"    ) -> List[Optional[int]]:",
+            f"        rows = {table_name}.get_bulk_rows(objs_in, upsert=upsert)",
+            f"        with_password = [row for row in rows if row.get('password')]",
+            f"        hashes = await hashing.hash_passwords_async([row.pop('password') for row in with_password])",
+            f"        for row, hashed_password in zip(with_password, hashes):",
+            f"            row['hashed_password'] = hashed_password",
+            f"        return await super().create_bulk(db, objs_in=rows, upsert=upsert, **kwargs)",
+            "",
+        ]
+    else:
+        lines += [
+            "    pass",
+            "",
+        ]
+    lines += [
+        "",
+        f"{table_name}_async = {crud_class_name}({model_name})",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def generate_crud(table_name: str, model_name: str, async_db: bool = False) -> str:
     """Generate the full CRUD class for a given model."""
     crud_lines = [
-        generate_crud_imports(table_name, model_name),
+        generate_crud_imports(table_name, model_name, async_db),
         generate_crud_class(table_name, model_name),
         generate_crud_functions(table_name, model_name),
         generate_crud_instance(table_name, model_name),
     ]
+    if async_db:
+        crud_lines.append(generate_async_crud(table_name, model_name))
     return "\n".join(crud_lines)
 
 
-def write_crud(models: List[ClassModel], output_dir):
+def render_crud(model: ClassModel, output_dir, config: dict = None) -> Tuple[str, str]:
+    """Render the CRUD file of a class, preserving custom sections. Return (file_path, content)."""
+    table_name = camel_to_snake(model.name)
+    crud_content = generate_crud(table_name, model.name, bool((config or {}).get("async_db")))
+    file_name = f"crud_{table_name}.py"
+    file_path = os.path.join(output_dir + OUTPUT_DIR, file_name)
+
+    # Preserve custom sections in the file
+    return file_path, preserve_custom_sections(file_path, crud_content)
+
+
+def write_crud(models: List[ClassModel], output_dir, manifest: GenerationManifest = None, config: dict = None):
     """Write the generated CRUD classes to files, preserving custom sections."""
-    output_dir += OUTPUT_DIR
-    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(output_dir + OUTPUT_DIR, exist_ok=True)
     for model in models:
         model = ClassModel(**model)
         table_name = camel_to_snake(model.name)
-        model_name = model.name
-        crud_content = generate_crud(table_name, model_name)
-        file_name = f"crud_{table_name}.py"
-        file_path = os.path.join(output_dir, file_name)
-
-        # Preserve custom sections in the file
-        final_content = preserve_custom_sections(file_path, crud_content)
+        file_path, final_content = render_crud(model, output_dir, config)
 
-        with open(file_path, "w") as f:
-            f.write(final_content)
-        print(f"Generated CRUD for: {table_name}")
+        if write_generated_file(file_path, final_content, manifest):
+            print(f"Generated CRUD for: {table_name}")
+        else:
+            print(f"Unchanged CRUD for: {table_name}")
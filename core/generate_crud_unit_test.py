@@ -1,8 +1,10 @@
 import os
 import logging
-from typing import List, Dict, Any
+import random
+from typing import List, Dict, Any, Tuple
 
 from schemas import ClassModel, AttributesModel
+from core.generated_files import GenerationManifest, write_generated_file
 from model_type import preserve_custom_sections, camel_to_snake
 from utils.generate_data_test import  generate_data
 
@@ -25,16 +27,16 @@ def generate_import() -> str:
     ])
 
 
-def generate_column(data: List[AttributesModel]) -> Dict[str, Any]:
+def generate_column(data: List[AttributesModel], rng: random.Random) -> Dict[str, Any]:
     """Generate column data based on model attributes."""
     result = {}
     for attr in data:
         if attr.is_required:
-            result[attr.name] = generate_data(attr.type, attr.length)
+            result[attr.name] = generate_data(attr.type, attr.length, rng)
     return result
 
 
-def generate_test_crud(model: ClassModel, table_name: str) -> str:
+def generate_test_crud(model: ClassModel, table_name: str, rng: random.Random) -> str:
     """Generate test functions for CRUD operations."""
     test_name = camel_to_snake(model.name)
     class_lines = []
@@ -45,7 +47,7 @@ def generate_test_crud(model: ClassModel, table_name: str) -> str:
         if test_key == "create":
             # Test for creating a new record
             data = [
-                f"    {test_name}_data = schemas.{model.name}Create(**{generate_column(model.attributes)})",
+                f"    {test_name}_data = schemas.{model.name}Create(**{generate_column(model.attributes, rng)})",
                 f"    {test_name} = crud.{table_name}.create(db=db, obj_in={test_name}_data)",
                 f"    data_json = pick_random_key_value(jsonable_encoder({test_name}_data))",
                 f"    test_json = jsonable_encoder({test_name})",
@@ -58,12 +60,12 @@ def generate_test_crud(model: ClassModel, table_name: str) -> str:
             # Test for updating an existing record
             data = [
                 f"    # Create a record first",
-                f"    {test_name}_data = schemas.{model.name}Create(**{generate_column(model.attributes)})",
+                f"    {test_name}_data = schemas.{model.name}Create(**{generate_column(model.attributes, rng)})",
                 f"    {test_name} = crud.{table_name}.create(db=db, obj_in={test_name}_data)",
                 f"    assert {test_name}.id is not None",
                 f"",
                 f"    # Update the record",
-                f"    update_data = schemas.{model.name}Update(**{generate_column(model.attributes)})",
+                f"    update_data = schemas.{model.name}Update(**{generate_column(model.attributes, rng)})",
                 f"    updated_{test_name} = crud.{table_name}.update(db=db, db_obj={test_name}, obj_in=update_data)",
                 f"    assert updated_{test_name}.id == {test_name}.id",
                 f"    assert updated_{test_name} != {test_name}  # Ensure the record was actually updated"
@@ -74,7 +76,7 @@ def generate_test_crud(model: ClassModel, table_name: str) -> str:
             # Test for retrieving all records
             data = [
                 f"    # Create a record first",
-                f"    {test_name}_data = schemas.{model.name}Create(**{generate_column(model.attributes)})",
+                f"    {test_name}_data = schemas.{model.name}Create(**{generate_column(model.attributes, rng)})",
                 f"    {test_name} = crud.{table_name}.create(db=db, obj_in={test_name}_data)",
                 f"    assert {test_name}.id is not None",
                 f"",
@@ -89,7 +91,7 @@ def generate_test_crud(model: ClassModel, table_name: str) -> str:
             # Test for retrieving a record by its ID
             data = [
                 f"    # Create a record first",
-                f"    {test_name}_data = schemas.{model.name}Create(**{generate_column(model.attributes)})",
+                f"    {test_name}_data = schemas.{model.name}Create(**{generate_column(model.attributes, rng)})",
                 f"    {test_name} = crud.{table_name}.create(db=db, obj_in={test_name}_data)",
                 f"    assert {test_name}.id is not None",
                 f"",
@@ -105,7 +107,7 @@ def generate_test_crud(model: ClassModel, table_name: str) -> str:
             # Test for deleting a record
             data = [
                 f"    # Create a record first",
-                f"    {test_name}_data = schemas.{model.name}Create(**{generate_column(model.attributes)})",
+                f"    {test_name}_data = schemas.{model.name}Create(**{generate_column(model.attributes, rng)})",
                 f"    {test_name} = crud.{table_name}.create(db=db, obj_in={test_name}_data)",
                 f"    assert {test_name}.id is not None",
                 f"",
@@ -125,32 +127,40 @@ def generate_test_crud(model: ClassModel, table_name: str) -> str:
     return "\n".join(class_lines)
 
 
-def generate_full_schema(model: ClassModel, table_name: str) -> str:
+def generate_full_schema(model: ClassModel, table_name: str, rng: random.Random) -> str:
     """Generate the full test for a model, including imports and test functions."""
     return "\n".join([
         generate_import(),
-        generate_test_crud(model, table_name),
+        generate_test_crud(model, table_name, rng),
     ])
 
 
-def write_test_crud(models: List[ClassModel], output_dir: str) -> None:
-    """Write the generated test to files, preserving custom sections."""
-    output_dir = output_dir + OUTPUT_DIR
+def render_test_crud(model: ClassModel, output_dir: str, config: dict = None) -> Tuple[str, str]:
+    """Render the CRUD test file of a class, preserving custom sections. Return (file_path, content)."""
+    # Seeded from the class definition so an unchanged class renders the same test data. A
+    # generator of its own: the renderers run in threads, they can't share the global one
+    rng = random.Random(repr(model))
+    table_name = camel_to_snake(model.name)
+    schemas = generate_full_schema(model, table_name, rng)
+    file_name = f"test_crud_{table_name}.py"
+    file_path = os.path.join(output_dir + OUTPUT_DIR, file_name)
+
+    # Preserve custom sections in the file
+    return file_path, preserve_custom_sections(file_path, schemas)
+
 
+def write_test_crud(models: List[ClassModel], output_dir: str, manifest: GenerationManifest = None) -> None:
+    """Write the generated test to files, preserving custom sections."""
     for model in models:
         # try:
             model = ClassModel(**model)
             table_name = camel_to_snake(model.name)
-            schemas = generate_full_schema(model, table_name)
-            file_name = f"test_crud_{table_name}.py"
-            file_path = os.path.join(output_dir, file_name)
-
-            # Preserve custom sections in the file
-            final_content = preserve_custom_sections(file_path, schemas)
+            file_path, final_content = render_test_crud(model, output_dir)
 
-            with open(file_path, "w") as f:
-                f.write(final_content)
-            logger.info(f"Generated schemas for: {table_name}")
+            if write_generated_file(file_path, final_content, manifest):
+                logger.info(f"Generated schemas for: {table_name}")
+            else:
+                logger.info(f"Unchanged schemas for: {table_name}")
         # except Exception as e:
         #     logger.error(f"Failed to generate schema for {model.name}: {e}")
 
@@ -1,150 +1,314 @@
 import os
-from typing import List
+from typing import List, Tuple
 
 from schemas import ClassModel
 from sqlalchemy.orm import DeclarativeMeta
 
+from core.generated_files import GenerationManifest, write_generated_file
 from model_type import  snake_to_camel, camel_to_snake
 
 OUTPUT_DIR = "/app/api/api_v1/endpoints"
 
 
-def generate_router_file(table_name):
-    """Generate a FastAPI router file for CRUD operations."""
+def generate_router_file(table_name, async_db: bool = False):
+    """Generate a FastAPI router file for CRUD operations, with `async def` endpoints when `async_db`."""
     schema_name = snake_to_camel(table_name)
     router_name = table_name
     crud_name = table_name
     response_model_name = f"Response{schema_name}"
 
+    if async_db:
+        def_keyword = "async def"
+        await_keyword = "await "
+        crud_object = f"crud.{crud_name}_async"
+        db_dependency = "db: AsyncSession = Depends(deps.get_async_db),"
+        read_db_dependency = "db: AsyncSession = Depends(deps.get_async_read_db),"
+        user_dependency = "deps.get_current_active_user_async"
+        session_import = "from sqlalchemy.ext.asyncio import AsyncSession"
+    else:
+        def_keyword = "def"
+        await_keyword = ""
+        crud_object = f"crud.{crud_name}"
+        db_dependency = "db: Session = Depends(deps.get_db),"
+        read_db_dependency = "db: Session = Depends(deps.get_read_db),"
+        user_dependency = "deps.get_current_active_user"
+        session_import = "from sqlalchemy.orm import Session"
+
     router_lines = [
-        "from typing import Any",
-        "from fastapi import APIRouter, Depends, HTTPException",
-        "from fastapi.encoders import jsonable_encoder",
-        "from sqlalchemy.orm import Session",
+        "from typing import Any, List, Optional",
+        "from fastapi import APIRouter, Depends, HTTPException, Query",
+        session_import,
         "",
         "from app import crud, models, schemas",
-        "from app.api import deps",
+        "from app.api import deps, export, serializers",
         "",
         f"router = APIRouter()",
         "",
         "",
         f"@router.get('/', response_model=schemas.{response_model_name})",
-        f"def read_{router_name}s(",
-        "        db: Session = Depends(deps.get_db),",
-        "        current_user: models.User = Depends(deps.get_current_active_user),",
+        f"{def_keyword} read_{router_name}s(",
+        f"        {read_db_dependency}",
+        "        skip: int = 0,",
+        "        limit: int = 100,",
+        "        cursor: Optional[str] = None,",
+        "        order_by: str = 'id',",
+        "        order: str = 'DESC',",
+        "        count: str = 'exact',",
+        "        relations: Optional[List[str]] = Query(None),",
+        "        fields: Optional[List[str]] = Depends(deps.get_fields),",
+        f"        current_user: models.User = Depends({user_dependency}),",
         ") -> Any:",
         f"    \"\"\"",
         f"    Retrieve {router_name}s.",
+        "",
+        "    Pages with skip/limit, or pass the next_cursor of the previous page as cursor",
+        "    to continue after it without an OFFSET (skip is then ignored).",
+        "    count is exact, estimate (faster, approximate) or none.",
+        "    relations are loaded with the page, e.g. relations=role{id,name}:joined, see",
+        "    CRUDBase.get_joined_load_v2 for the syntax and the loading strategies.",
+        "    fields=id,label only loads and returns these columns.",
         f"    \"\"\"",
-        f"    {router_name}s = crud.{crud_name}.get_multi_where_array(db=db)",
-        f"    count = crud.{crud_name}.get_count_where_array(db=db)",
-        f"    response = schemas.{response_model_name}(**{{'count': count, 'data': jsonable_encoder({router_name}s)}})",
-        "    return response",
+        f"    fields_model = serializers.get_fields_model({crud_object}, schemas.{schema_name}, fields) if fields else None",
+        f"    {router_name}s, next_cursor, total = {await_keyword}{crud_object}.get_page_where_array(",
+        "        db=db, skip=skip, limit=limit, cursor=cursor, order_by=order_by, order=order, count=count,",
+        "        relations=relations, base_columns=fields,",
+        "    )",
+        "    if fields_model:",
+        f"        return serializers.fields_page_response(fields_model, {router_name}s, count=total, next_cursor=next_cursor)",
+        f"    return serializers.page_response(schemas.{response_model_name}, {router_name}s, count=total, next_cursor=next_cursor)",
+        "",
+        "",
+        "@router.get('/export')",
+        f"def export_{router_name}s(",
+        "        where: Optional[list] = Depends(deps.get_where),",
+        "        order_by: str = 'id',",
+        "        order: str = 'DESC',",
+        "        format: str = 'ndjson',",
+        f"        current_user: models.User = Depends({user_dependency}),",
+        ") -> Any:",
+        f"    \"\"\"",
+        f"    Export the {router_name}s matching where (a JSON where array) as ndjson or csv,",
+        f"    with the columns of schemas.{schema_name}.",
+        "",
+        "    Rows are streamed in chunks, the whole result is never held in memory.",
+        f"    \"\"\"",
+        "    if not crud.user.is_superuser(current_user):",
+        "        raise HTTPException(status_code=400, detail='Not enough permissions')",
+        "    return export.stream_export(",
+        f"        crud.{crud_name}, schemas.{schema_name}, where=where, order_by=order_by, order=order,",
+        "        export_format=format,",
+        "    )",
         "",
         "",
         f"@router.post('/', response_model=schemas.{schema_name})",
-        f"def create_{router_name}(",
+        f"{def_keyword} create_{router_name}(",
         "        *,",
-        "        db: Session = Depends(deps.get_db),",
+        f"        {db_dependency}",
         f"        {router_name}_in: schemas.{schema_name}Create,",
-        "        current_user: models.User = Depends(deps.get_current_active_user),",
+        f"        current_user: models.User = Depends({user_dependency}),",
         ") -> Any:",
         f"    \"\"\"",
         f"    Create new {router_name}.",
         f"    \"\"\"",
         "    if crud.user.is_superuser(current_user):",
-        f"        {router_name} = crud.{crud_name}.create(db=db, obj_in={router_name}_in)",
+        f"        {router_name} = {await_keyword}{crud_object}.create(db=db, obj_in={router_name}_in)",
         "    else:",
         "        raise HTTPException(status_code=400, detail='Not enough permissions')",
-        f"    return {router_name}",
+        f"    return serializers.object_response(schemas.{schema_name}, {router_name})",
+        "",
+        "",
+        "@router.post('/bulk', response_model=schemas.BulkResult)",
+        f"{def_keyword} create_{router_name}s_bulk(",
+        "        *,",
+        f"        {db_dependency}",
+        f"        {router_name}s_in: List[schemas.{schema_name}Create],",
+        f"        current_user: models.User = Depends({user_dependency}),",
+        ") -> Any:",
+        f"    \"\"\"",
+        f"    Create many {router_name}s in one transaction, with multi-row INSERTs.",
+        "",
+        "    Return the ids of the created rows, in the order of the body.",
+        f"    \"\"\"",
+        "    if not crud.user.is_superuser(current_user):",
+        "        raise HTTPException(status_code=400, detail='Not enough permissions')",
+        f"    ids = {await_keyword}{crud_object}.create_bulk(db=db, objs_in={router_name}s_in)",
+        "    return {'count': len(ids), 'ids': ids}",
+        "",
+        "",
+        "@router.put('/bulk', response_model=schemas.BulkResult)",
+        f"{def_keyword} upsert_{router_name}s_bulk(",
+        "        *,",
+        f"        {db_dependency}",
+        f"        {router_name}s_in: List[schemas.{schema_name}Upsert],",
+        f"        current_user: models.User = Depends({user_dependency}),",
+        ") -> Any:",
+        f"    \"\"\"",
+        f"    Create or update many {router_name}s in one transaction: a {router_name} whose id",
+        "    exists is updated with the fields that are set, the others are created.",
+        f"    \"\"\"",
+        "    if not crud.user.is_superuser(current_user):",
+        "        raise HTTPException(status_code=400, detail='Not enough permissions')",
+        f"    ids = {await_keyword}{crud_object}.create_bulk(db=db, objs_in={router_name}s_in, upsert=True)",
+        "    return {'count': len(ids), 'ids': ids}",
+        "",
+        "",
+        "@router.post('/bulk/soft_delete', response_model=schemas.BulkResult)",
+        f"{def_keyword} soft_delete_{router_name}s_bulk(",
+        "        *,",
+        f"        {db_dependency}",
+        "        where: Optional[list] = Depends(deps.get_where),",
+        "        ids: Optional[List[int]] = Query(None),",
+        f"        current_user: models.User = Depends({user_dependency}),",
+        ") -> Any:",
+        f"    \"\"\"",
+        f"    Soft delete the {router_name}s matching where (a JSON where array) and/or ids,",
+        "    in a single UPDATE. The ids of the rows are returned when the database has RETURNING.",
+        f"    \"\"\"",
+        "    if not crud.user.is_superuser(current_user):",
+        "        raise HTTPException(status_code=400, detail='Not enough permissions')",
+        f"    count, ids = {await_keyword}{crud_object}.soft_delete_where(db=db, where=where, ids=ids, user_id=current_user.id)",
+        "    return {'count': count, 'ids': ids}",
+        "",
+        "",
+        "@router.post('/bulk/restore', response_model=schemas.BulkResult)",
+        f"{def_keyword} restore_{router_name}s_bulk(",
+        "        *,",
+        f"        {db_dependency}",
+        "        where: Optional[list] = Depends(deps.get_where),",
+        "        ids: Optional[List[int]] = Query(None),",
+        f"        current_user: models.User = Depends({user_dependency}),",
+        ") -> Any:",
+        f"    \"\"\"",
+        f"    Restore the soft deleted {router_name}s matching where and/or ids, in a single UPDATE.",
+        f"    \"\"\"",
+        "    if not crud.user.is_superuser(current_user):",
+        "        raise HTTPException(status_code=400, detail='Not enough permissions')",
+        f"    count, ids = {await_keyword}{crud_object}.restore_where(db=db, where=where, ids=ids, user_id=current_user.id)",
+        "    return {'count': count, 'ids': ids}",
+        "",
+        "",
+        "@router.delete('/bulk', response_model=schemas.BulkResult)",
+        f"{def_keyword} delete_{router_name}s_bulk(",
+        "        *,",
+        f"        {db_dependency}",
+        "        where: Optional[list] = Depends(deps.get_where),",
+        "        ids: Optional[List[int]] = Query(None),",
+        f"        current_user: models.User = Depends({user_dependency}),",
+        ") -> Any:",
+        f"    \"\"\"",
+        f"    Delete the {router_name}s matching where and/or ids, in a single DELETE.",
+        f"    \"\"\"",
+        "    if not crud.user.is_superuser(current_user):",
+        "        raise HTTPException(status_code=400, detail='Not enough permissions')",
+        f"    count, ids = {await_keyword}{crud_object}.remove_where(db=db, where=where, ids=ids)",
+        "    return {'count': count, 'ids': ids}",
         "",
         "",
         f"@router.put('/', response_model=schemas.{schema_name})",
-        f"def update_{router_name}(",
+        f"{def_keyword} update_{router_name}(",
         "        *,",
-        "        db: Session = Depends(deps.get_db),",
+        f"        {db_dependency}",
         f"        {router_name}_id: int,",
         f"        {router_name}_in: schemas.{schema_name}Update,",
-        "        current_user: models.User = Depends(deps.get_current_active_user),",
+        f"        current_user: models.User = Depends({user_dependency}),",
         ") -> Any:",
         f"    \"\"\"",
         f"    Update an {router_name}.",
         f"    \"\"\"",
-        f"    {router_name} = crud.{crud_name}.get(db=db, id={router_name}_id)",
+        f"    {router_name} = {await_keyword}{crud_object}.get(db=db, id={router_name}_id)",
         f"    if not {router_name}:",
         f"        raise HTTPException(status_code=404, detail='{schema_name} not found')",
-        f"    {router_name} = crud.{crud_name}.update(db=db, db_obj={router_name}, obj_in={router_name}_in)",
-        f"    return {router_name}",
+        f"    {router_name} = {await_keyword}{crud_object}.update(db=db, db_obj={router_name}, obj_in={router_name}_in)",
+        f"    return serializers.object_response(schemas.{schema_name}, {router_name})",
         "",
         "",
         f"@router.get('/by_id/', response_model=schemas.{schema_name})",
-        f"def read_{router_name}(",
+        f"{def_keyword} read_{router_name}(",
         "        *,",
-        "        db: Session = Depends(deps.get_db),",
+        f"        {read_db_dependency}",
         f"        {router_name}_id: int,",
-        "        current_user: models.User = Depends(deps.get_current_active_user),",
+        "        fields: Optional[List[str]] = Depends(deps.get_fields),",
+        f"        current_user: models.User = Depends({user_dependency}),",
         ") -> Any:",
         f"    \"\"\"",
-        f"    Get {router_name} by ID.",
+        f"    Get {router_name} by ID, fields=id,label only loads and returns these columns.",
         f"    \"\"\"",
-        f"    {router_name} = crud.{crud_name}.get(db=db, id={router_name}_id)",
+        f"    fields_model = serializers.get_fields_model({crud_object}, schemas.{schema_name}, fields) if fields else None",
+        f"    {router_name} = {await_keyword}{crud_object}.get(db=db, id={router_name}_id, base_columns=fields)",
         f"    if not {router_name}:",
         f"        raise HTTPException(status_code=404, detail='{schema_name} not found')",
-        f"    return {router_name}",
+        "    if fields_model:",
+        f"        return serializers.fields_response(fields_model, {router_name})",
+        f"    return serializers.object_response(schemas.{schema_name}, {router_name})",
         "",
         "",
         f"@router.delete('/', response_model=schemas.{schema_name})",
-        f"def delete_{router_name}(",
+        f"{def_keyword} delete_{router_name}(",
         "        *,",
-        "        db: Session = Depends(deps.get_db),",
+        f"        {db_dependency}",
         f"        {router_name}_id: int,",
-        "        current_user: models.User = Depends(deps.get_current_active_user),",
+        f"        current_user: models.User = Depends({user_dependency}),",
         ") -> Any:",
         f"    \"\"\"",
         f"    Delete an {router_name}.",
         f"    \"\"\"",
-        f"    {router_name} = crud.{crud_name}.get(db=db, id={router_name}_id)",
+        f"    {router_name} = {await_keyword}{crud_object}.get(db=db, id={router_name}_id)",
         f"    if not {router_name}:",
         f"        raise HTTPException(status_code=404, detail='{schema_name} not found')",
-        f"    {router_name} = crud.{crud_name}.remove(db=db, id={router_name}_id)",
-        f"    return {router_name}",
+        f"    {router_name} = {await_keyword}{crud_object}.remove(db=db, id={router_name}_id)",
+        f"    return serializers.object_response(schemas.{schema_name}, {router_name})",
         "",
     ]
 
     return "\n".join(router_lines)
 
 
-def write_endpoints(models: List[ClassModel], output_dir):
+def render_endpoint(model: ClassModel, output_dir, config: dict = None) -> Tuple[str, str]:
+    """Render the router file of a class. Return (file_path, content)."""
+    table_name = camel_to_snake(model.name)
+    file_name = f"{table_name}s.py"
+    content = generate_router_file(table_name, bool((config or {}).get("async_db")))
+    return os.path.join(output_dir + OUTPUT_DIR, file_name), content
+
+
+def write_endpoints(models: List[ClassModel], output_dir, manifest: GenerationManifest = None, config: dict = None):
     """Write the generated schemas to files."""
     endpoints_directory = output_dir + OUTPUT_DIR
     os.makedirs(endpoints_directory, exist_ok=True)
     for model in models:
         model = ClassModel(**model)
         table_name = camel_to_snake(model.name)
-        endpoints = generate_router_file(table_name)
-        file_name = f"{table_name}s.py"
-        with open(os.path.join(endpoints_directory, file_name), "w") as f:
-            f.write(endpoints)
-        print(f"Generated endpoints for: {table_name}")
+        file_path, endpoints = render_endpoint(model, output_dir, config)
+        if write_generated_file(file_path, endpoints, manifest):
+            print(f"Generated endpoints for: {table_name}")
+        else:
+            print(f"Unchanged endpoints for: {table_name}")
+
+    write_api_router(output_dir, manifest)
 
+
+def write_api_router(output_dir, manifest: GenerationManifest = None):
+    """Write `api.py` including every router found in the endpoints directory."""
+    endpoints_directory = output_dir + OUTPUT_DIR
     apis_directory = output_dir + "/app/api/api_v1"  # Path to endpoints directory
     output_file_path = os.path.join(apis_directory, "api.py")  # Output file path
 
     print(endpoints_directory)
-    generate_endpoints_file(endpoints_directory, output_file_path)
+    generate_endpoints_file(endpoints_directory, output_file_path, manifest)
 
 
-def generate_endpoints_file(endpoints_dir, output_file):
+def generate_endpoints_file(endpoints_dir, output_file, manifest: GenerationManifest = None):
     """
     Generate an `endpoints.py` file that includes all FastAPI routers from the endpoints directory.
 
     Args:
         endpoints_dir (str): Path to the directory containing the endpoint files.
         output_file (str): Path to the output `endpoints.py` file.
+        manifest (GenerationManifest): Skip the write when the content is unchanged.
     """
     # List all Python files in the endpoints directory
     endpoint_files = [
-        f[:-3] for f in os.listdir(endpoints_dir)
+        f[:-3] for f in sorted(os.listdir(endpoints_dir))
         if f.endswith(".py") and f != "__init__.py"
     ]
 
@@ -172,7 +336,5 @@ def generate_endpoints_file(endpoints_dir, output_file):
     ]
 
     # Write to the output file
-    with open(output_file, "w") as f:
-        f.write("\n".join(lines))
-
-    print(f"Generated {output_file} successfully!")
+    if write_generated_file(output_file, "\n".join(lines), manifest):
+        print(f"Generated {output_file} successfully!")
@@ -1,18 +1,21 @@
+from core.generated_files import GenerationManifest, write_generated_file
+
+
 def replace_cote(value: str):
     if type(value) == type([]):
         return str(value).replace("'", '"')
     return value
 
 
-def generate_env(config: dict, output_file: str = ".env"):
+def generate_env(config: dict, output_file: str = ".env", manifest: GenerationManifest = None):
     """
     Generate a .env file with the provided configuration values.
 
     Args:
         config (dict): A dictionary containing key-value pairs for the .env file.
         output_file (str): The path to the output .env file (default: .env).
+        manifest (GenerationManifest): Skip the write when the content is unchanged.
     """
-    with open(output_file, "w") as f:
-        for key, value in config.items():
-            f.write(f"{key.upper()}='{replace_cote(value)}'\n")
-    print(f"Generated .env file at: {output_file}")
+    content = "".join(f"{key.upper()}='{replace_cote(value)}'\n" for key, value in config.items())
+    if write_generated_file(output_file, content, manifest):
+        print(f"Generated .env file at: {output_file}")
@@ -1,12 +1,14 @@
 import os
 
+from core.generated_files import GenerationManifest, write_generated_file
 from model_type import snake_to_camel, generate_class_name
 
 
-def generate_init_file(folder, folder_type: str = "schemas"):
+def generate_init_file(folder, folder_type: str = "schemas", async_db: bool = False):
     """Generate an __init__.py file to import schema classes from each file."""
     lines = []
-    for file_name in os.listdir(folder):
+    # Sorted so the rendered content is stable between generations
+    for file_name in sorted(os.listdir(folder)):
         if file_name.endswith(".py") and file_name != "__init__.py" and file_name != "base.py":
             module_name = file_name.replace(".py", "")
             class_name = generate_class_name(module_name)
@@ -17,22 +19,32 @@ def generate_init_file(folder, folder_type: str = "schemas"):
                 elif module_name == "token":
                     lines.append(
                         f"from .{module_name} import  {class_name}, {class_name}Payload")
+                elif module_name == "bulk":
+                    lines.append(
+                        f"from .{module_name} import BulkResult")
                 else:
                     lines.append(
-                        f"from .{module_name} import ( \n  {class_name},  \n  {class_name}Create,  \n  {class_name}Update,  \n  Response{class_name}\n)")
+                        f"from .{module_name} import ( \n  {class_name},  \n  {class_name}Create,  \n  {class_name}Update,  \n  {class_name}Upsert,  \n  Response{class_name}\n)")
             elif folder_type == "models":
                 lines.append(
                     f"from .{module_name} import {class_name}")
             else:
+                # base_copy.py, base_async.py, operators.py... are not CRUD objects
+                if not file_name.startswith("crud_"):
+                    continue
                 module_name = file_name.replace(".py", "").replace("crud_", '')
-                lines.append(
-                    f"from .crud_{module_name} import {module_name}")
+                if async_db:
+                    lines.append(
+                        f"from .crud_{module_name} import {module_name}, {module_name}_async")
+                else:
+                    lines.append(
+                        f"from .crud_{module_name} import {module_name}")
 
     # Join all import statements with a newline and add a final newline
     return "\n".join(lines) + "\n"
 
 
-def write_init_files(output_dir: str):
+def write_init_files(output_dir: str, manifest: GenerationManifest = None, config: dict = None):
     schema_folder = output_dir + "/app/schemas"
     models_folder = output_dir + "/app/models"
     crud_folder = output_dir + "/app/crud"
@@ -41,19 +53,16 @@ def write_init_files(output_dir: str):
     init_content_schemas = generate_init_file(schema_folder, "schemas")
 
     # Write the content to __init__.py
-    with open(os.path.join(schema_folder, "__init__.py"), "w") as init_file_schemas:
-        init_file_schemas.write(init_content_schemas)
+    write_generated_file(os.path.join(schema_folder, "__init__.py"), init_content_schemas, manifest)
 
     init_content_models = generate_init_file(models_folder, "models")
 
     # Write the content to __init__.py
-    with open(os.path.join(models_folder, "__init__.py"), "w") as init_file_models:
-        init_file_models.write(init_content_models)
+    write_generated_file(os.path.join(models_folder, "__init__.py"), init_content_models, manifest)
 
-    init_content_crud = generate_init_file(crud_folder, "crud")
+    init_content_crud = generate_init_file(crud_folder, "crud", bool((config or {}).get("async_db")))
 
     # Write the content to __init__.py
-    with open(os.path.join(crud_folder, "__init__.py"), "w") as init_file_crud:
-        init_file_crud.write(init_content_crud)
+    write_generated_file(os.path.join(crud_folder, "__init__.py"), init_content_crud, manifest)
 
     print("Successfully generated __init__.py!")
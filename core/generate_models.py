@@ -1,7 +1,8 @@
 import os
 import re
-from typing import List
+from typing import List, Tuple
 
+from core.generated_files import GenerationManifest, write_generated_file
 from model_type import preserve_custom_sections, camel_to_snake, snake_to_camel, generate_class_name
 from schemas import ClassModel, AttributesModel
 
@@ -16,6 +17,8 @@ def generate_import(model: ClassModel):
         "from sqlalchemy.orm import relationship, column_property, aliased",
         f"from sqlalchemy import {model.column_type_list}"
     ]
+    if model.versioned and "Integer" not in model.column_type_list.split(", "):
+        imports.append("from sqlalchemy import Integer")
     return "\n".join(imports)
 
 
@@ -31,6 +34,8 @@ def generate_models(model: ClassModel):
         AttributesModel(name="updated_at", type="DateTime", is_required=False),
         AttributesModel(name="deleted_at", type="DateTime", is_required=False)
     ]
+    if model.versioned:
+        default_columns.append(AttributesModel(name="version_id", type="Integer", is_required=True))
 
     # Combine model attributes with default columns
     all_columns = model.attributes + default_columns
@@ -64,10 +69,17 @@ def generate_models(model: ClassModel):
         elif column.name == "updated_at":
             column_options.append("default=func.now()")
             column_options.append("onupdate=func.now()")
+        elif column.name == "version_id" and model.versioned:
+            # The ORM sets it itself, the default covers Core inserts (bulk endpoints)
+            column_options.append("default=1")
 
         column_def += ", " + ", ".join(column_options) if len(column_options) > 0 else ", ".join(column_options)
         column_def += ")"
         models_lines.append(column_def)
+    if model.versioned:
+        # SQLAlchemy increments version_id on every UPDATE and checks it in the WHERE clause
+        models_lines.append("")
+        models_lines.append('    __mapper_args__ = {"version_id_col": version_id}')
     models_lines.append("")
     models_lines.append("    # Relations")
     for column in model.attributes:
@@ -88,24 +100,29 @@ def generate_full_models(model):
     ]
     return "\n".join(schema_lines)
 
-def write_models(models: List[ClassModel], output_dir):
-    """Write the generated models to files."""
-    output_dir += OUTPUT_DIR
+def render_model(model: ClassModel, output_dir, config: dict = None) -> Tuple[str, str]:
+    """Render the model file of a class, preserving custom sections. Return (file_path, content)."""
+    model_name = camel_to_snake(model.name)
+    models_content = generate_full_models(model)
+    file_name = f"{model_name}.py"
+    file_path = os.path.join(output_dir + OUTPUT_DIR, file_name)
+
+    # Preserve custom sections in the file
+    return file_path, preserve_custom_sections(file_path, models_content)
+
+
+def write_models(models: List[ClassModel], output_dir, manifest: GenerationManifest = None):
     """Write the generated models to files, preserving custom sections."""
-    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(output_dir + OUTPUT_DIR, exist_ok=True)
     for model in models:
         model = ClassModel(**model)
         model_name = camel_to_snake(model.name)
-        models_content = generate_full_models(model)
-        file_name = f"{model_name}.py"
-        file_path = os.path.join(output_dir, file_name)
-
-        # Preserve custom sections in the file
-        final_content = preserve_custom_sections(file_path, models_content)
+        file_path, final_content = render_model(model, output_dir)
 
-        with open(file_path, "w") as f:
-            f.write(final_content)
-        print(f"Generated model for: {model_name}")
+        if write_generated_file(file_path, final_content, manifest):
+            print(f"Generated model for: {model_name}")
+        else:
+            print(f"Unchanged model for: {model_name}")
 
 
 
@@ -1,12 +1,13 @@
 import os
 import re
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from schemas import ClassModel
 from sqlalchemy.ext.declarative import DeclarativeMeta
 from sqlalchemy import inspect
 from pydantic import BaseModel
 
+from core.generated_files import GenerationManifest, write_generated_file
 from model_type import preserve_custom_sections, \
     camel_to_snake, snake_to_camel  # Import your model definitions
 from utils.generate_data_test import get_column_type, generate_comumn_name
@@ -64,12 +65,23 @@ def generate_create_schema(model: ClassModel, base_schema: str, table_name: str)
     return "\n".join(schema_lines)
 
 
-def generate_update_schema(base_schema: str, table_name: str) -> str:
-    """Generate the update schema class."""
+def generate_update_schema(base_schema: str, table_name: str, versioned: bool = False) -> str:
+    """Generate the update schema class, with the expected version_id of a versioned model."""
     schema_name = f"{snake_to_camel(table_name)}Update"
     schema_lines = [
         f"\nclass {schema_name}({base_schema}):",
-        "    pass",
+        "    version_id: Optional[int] = None" if versioned else "    pass",
+        "",
+    ]
+    return "\n".join(schema_lines)
+
+
+def generate_upsert_schema(table_name: str) -> str:
+    """Generate the upsert schema class: a create schema whose id, when set, updates that row."""
+    schema_name = f"{snake_to_camel(table_name)}Upsert"
+    schema_lines = [
+        f"\nclass {schema_name}({snake_to_camel(table_name)}Create):",
+        "    id: Optional[int] = None",
         "",
     ]
     return "\n".join(schema_lines)
@@ -82,6 +94,8 @@ def generate_in_db_base_schema(model: ClassModel, base_schema: str, table_name:
 
     # Add primary key field
     schema_lines.append("    id: Optional[int]")
+    if model.versioned:
+        schema_lines.append("    version_id: Optional[int] = None")
 
     # Inspect columns for foreign keys
     for column in model.attributes:
@@ -133,8 +147,9 @@ def generate_response_class(class_name: str, table_name: str) -> str:
     schema_name = f"Response{snake_to_camel(table_name)}"
     schema_lines = [
         f"\nclass {schema_name}(BaseModel):",
-        "    count: int",
+        "    count: Optional[int] = None",
         f"    data: Optional[List[{class_name}]]",
+        "    next_cursor: Optional[str] = None",
         "",
     ]
     return "\n".join(schema_lines)
@@ -150,7 +165,8 @@ def generate_full_schema(model: ClassModel, table_name: str) -> str:
         generate_import(model),
         generate_base_schema(model, table_name),
         generate_create_schema(model, base_schema, table_name),
-        generate_update_schema(base_schema, table_name),
+        generate_update_schema(base_schema, table_name, model.versioned),
+        generate_upsert_schema(table_name),
         generate_in_db_base_schema(model, base_schema, table_name),
         generate_model_class(model, in_db_base_schema, table_name),
         generate_in_db_class(in_db_base_schema, table_name),
@@ -159,20 +175,26 @@ def generate_full_schema(model: ClassModel, table_name: str) -> str:
     return "\n".join(schema_lines)
 
 
-def write_schemas(models: List[ClassModel], output_dir: str):
+def render_schema(model: ClassModel, output_dir: str, config: dict = None) -> Tuple[str, str]:
+    """Render the schema file of a class, preserving custom sections. Return (file_path, content)."""
+    table_name = camel_to_snake(model.name)
+    schemas = generate_full_schema(model, table_name)
+    file_name = f"{table_name}.py"
+    file_path = os.path.join(output_dir + OUTPUT_DIR, file_name)
+
+    # Preserve custom sections in the file
+    return file_path, preserve_custom_sections(file_path, schemas)
+
+
+def write_schemas(models: List[ClassModel], output_dir: str, manifest: GenerationManifest = None):
     """Write the generated schemas to files, preserving custom sections."""
-    output_dir += OUTPUT_DIR
-    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(output_dir + OUTPUT_DIR, exist_ok=True)
     for model in models:
         model = ClassModel(**model)
         table_name = camel_to_snake(model.name)
-        schemas = generate_full_schema(model, table_name)
-        file_name = f"{table_name}.py"
-        file_path = os.path.join(output_dir, file_name)
-
-        # Preserve custom sections in the file
-        final_content = preserve_custom_sections(file_path, schemas)
+        file_path, final_content = render_schema(model, output_dir)
 
-        with open(file_path, "w") as f:
-            f.write(final_content)
-        print(f"Generated schemas for: {table_name}")
+        if write_generated_file(file_path, final_content, manifest):
+            print(f"Generated schemas for: {table_name}")
+        else:
+            print(f"Unchanged schemas for: {table_name}")
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import stat
+import tempfile
+from typing import Iterable
+
+MANIFEST_FILE = ".generation_manifest.json"
+
+# "fsync": flush the written files and their directories once generation is done
+# "none": leave it to the OS (CI, throw-away projects)
+DURABILITY_MODES = ("fsync", "none")
+
+DEFAULT_FILE_MODE = 0o644
+
+
+def content_hash(content: str) -> str:
+    """Return the sha256 digest of a rendered file."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def atomic_write(file_path: str, content: str):
+    """Write `content` to a temporary file next to `file_path` and rename it over the target."""
+    directory = os.path.dirname(file_path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        try:
+            mode = stat.S_IMODE(os.stat(file_path).st_mode)
+        except FileNotFoundError:
+            mode = DEFAULT_FILE_MODE
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def fsync_paths(file_paths: Iterable[str]):
+    """fsync the given files, then each of their directories once so the renames are durable."""
+    directories = set()
+    for file_path in file_paths:
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        directories.add(os.path.dirname(file_path) or ".")
+
+    if os.name != "posix":
+        return  # Directories can't be opened for fsync on Windows
+    for directory in sorted(directories):
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class GenerationManifest:
+    """
+    Content-hash manifest of the files written into a generated project.
+
+    The manifest is stored at the root of the generated project and maps every
+    generated file (relative path) to the hash of the content we rendered for
+    it, together with the size and mtime the file had right after we wrote it.
+    A file is only rewritten when its rendered content changed or when it was
+    modified on disk since the last generation.
+    """
+
+    def __init__(self, project_dir: str):
+        self.project_dir = project_dir
+        self.path = os.path.join(project_dir, MANIFEST_FILE)
+        self.entries = {}
+        self.written = []
+        self.skipped = []
+        self.touched = []
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable manifest {self.path}: {e}")
+                self.entries = {}
+
+    def _key(self, file_path: str) -> str:
+        return os.path.relpath(os.path.normpath(file_path), self.project_dir)
+
+    def is_unchanged(self, file_path: str, digest: str) -> bool:
+        """Check whether `file_path` already holds the content hashed as `digest`."""
+        entry = self.entries.get(self._key(file_path))
+        if not entry or entry.get("sha256") != digest:
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        return stat.st_size == entry.get("size") and stat.st_mtime_ns == entry.get("mtime_ns")
+
+    def record(self, file_path: str, digest: str):
+        """Remember the hash and on-disk state of a file we just wrote."""
+        stat = os.stat(file_path)
+        self.entries[self._key(file_path)] = {
+            "sha256": digest,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    def write(self, file_path: str, content: str) -> bool:
+        """Write `content` to `file_path` unless it is unchanged. Return True if written."""
+        key = self._key(file_path)
+        digest = content_hash(content)
+        if self.is_unchanged(file_path, digest):
+            self.skipped.append(key)
+            return False
+
+        atomic_write(file_path, content)
+        self.record(file_path, digest)
+        self.written.append(key)
+        self.touched.append(file_path)
+        return True
+
+    def forget(self, file_path: str):
+        """Drop a deleted file from the manifest."""
+        self.entries.pop(self._key(file_path), None)
+
+    def save(self):
+        atomic_write(self.path, json.dumps(self.entries, indent=4, sort_keys=True))
+        self.touched.append(self.path)
+
+    def sync(self, durability: str = "fsync"):
+        """Flush every file written through this manifest in one batch, according to `durability`."""
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Invalid durability mode {durability}")
+        if durability == "fsync":
+            fsync_paths(self.touched)
+        self.touched = []
+
+    def report(self) -> dict:
+        """Files written and skipped during this generation."""
+        return {
+            "written": list(self.written),
+            "skipped": list(self.skipped),
+        }
+
+
+def write_generated_file(file_path: str, content: str, manifest: GenerationManifest = None) -> bool:
+    """Write a generated file, going through the manifest when one is given."""
+    if manifest is not None:
+        return manifest.write(file_path, content)
+    atomic_write(file_path, content)
+    return True
@@ -0,0 +1,120 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.generate_apis_unit_test import OUTPUT_DIR as TEST_APIS_DIR, render_test_api
+from core.generate_benchmarks import OUTPUT_DIR as BENCHMARKS_DIR, render_benchmark
+from core.generate_crud import OUTPUT_DIR as CRUD_DIR, render_crud
+from core.generate_crud_unit_test import OUTPUT_DIR as TEST_CRUD_DIR, render_test_crud
+from core.generate_endpoints import OUTPUT_DIR as ENDPOINTS_DIR, render_endpoint, write_api_router
+from core.generate_models import OUTPUT_DIR as MODELS_DIR, render_model
+from core.generate_schema import OUTPUT_DIR as SCHEMAS_DIR, render_schema
+from core.generated_files import GenerationManifest, write_generated_file
+from schemas import ClassModel
+
+# (step, renderer, output sub-directory) in the order the files are generated
+ARTIFACTS = [
+    ("models", render_model, MODELS_DIR),
+    ("schemas", render_schema, SCHEMAS_DIR),
+    ("crud", render_crud, CRUD_DIR),
+    ("endpoints", render_endpoint, ENDPOINTS_DIR),
+    ("test_crud", render_test_crud, TEST_CRUD_DIR),
+    ("test_apis", render_test_api, TEST_APIS_DIR),
+    ("benchmarks", render_benchmark, BENCHMARKS_DIR),
+]
+
+RENDERERS = {step: renderer for step, renderer, _ in ARTIFACTS}
+
+# Below this many classes the pool start-up costs more than it saves
+PARALLEL_THRESHOLD = 8
+
+
+def parse_models(models: List) -> List[ClassModel]:
+    """Parse the raw class definitions of a project once."""
+    return [model if isinstance(model, ClassModel) else ClassModel(**model) for model in models]
+
+
+def _render(step: str, model: ClassModel, output_dir: str, config: dict = None) -> Tuple[str, str, str]:
+    file_path, content = RENDERERS[step](model, output_dir, config)
+    return step, file_path, content
+
+
+class GenerationEngine:
+    """
+    Render every artifact of every class in a worker pool, then write them in one flush.
+
+    **Parameters**
+
+    * `output_dir`: Root of the generated project
+    * `manifest`: Optional `GenerationManifest` used to skip unchanged files
+    * `max_workers`: Pool size, defaults to the number of CPUs
+    * `executor`: `"process"` (default, rendering is CPU bound) or `"thread"`
+    * `config`: Project config, e.g. `async_db` switches crud and endpoints to the async stack
+    """
+
+    def __init__(
+            self,
+            output_dir: str,
+            manifest: Optional[GenerationManifest] = None,
+            max_workers: Optional[int] = None,
+            executor: str = "process",
+            config: Optional[dict] = None,
+    ):
+        if executor not in ("process", "thread"):
+            raise ValueError(f"Invalid executor {executor}")
+        self.output_dir = output_dir
+        self.manifest = manifest
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = executor
+        self.config = dict(config or {})
+
+    def _pool(self):
+        if self.executor == "thread":
+            return ThreadPoolExecutor(max_workers=self.max_workers)
+        return ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def render(self, models: List[ClassModel]) -> Dict[str, List[Tuple[str, str]]]:
+        """Render all artifacts. Return {step: [(file_path, content), ...]}."""
+        rendered = {step: [] for step, _, _ in ARTIFACTS}
+        tasks = [(step, model) for step, _, _ in ARTIFACTS for model in models]
+
+        if len(models) < PARALLEL_THRESHOLD or self.max_workers == 1:
+            for step, model in tasks:
+                _, file_path, content = _render(step, model, self.output_dir, self.config)
+                rendered[step].append((file_path, content))
+            return rendered
+
+        with self._pool() as pool:
+            futures = [pool.submit(_render, step, model, self.output_dir, self.config) for step, model in tasks]
+            for future in as_completed(futures):
+                step, file_path, content = future.result()
+                rendered[step].append((file_path, content))
+
+        # Keep the flush order deterministic whatever the completion order was
+        for files in rendered.values():
+            files.sort()
+        return rendered
+
+    def flush(
+            self,
+            rendered: Dict[str, List[Tuple[str, str]]],
+            on_step: Callable[[str], None] = None,
+    ) -> List[str]:
+        """Write the rendered files, calling `on_step(step)` once each step is on disk. Return the paths written."""
+        written = []
+        for step, _, sub_dir in ARTIFACTS:
+            os.makedirs(self.output_dir + sub_dir, exist_ok=True)
+            for file_path, content in rendered[step]:
+                if write_generated_file(file_path, content, self.manifest):
+                    written.append(file_path)
+            if on_step:
+                on_step(step)
+        write_api_router(self.output_dir, self.manifest)
+        return written
+
+    def run(self, models: List, on_step: Callable[[str], None] = None) -> List[str]:
+        """Parse, render and write the files of every class."""
+        rendered = self.render(parse_models(models))
+        written = self.flush(rendered, on_step=on_step)
+        print(f"Generated {len(written)} files for {len(models)} classes")
+        return written
@@ -0,0 +1,155 @@
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable, List, Optional
+
+JOB_STEPS = ["models", "schemas", "crud", "endpoints", "test_crud", "test_apis", "benchmarks", "migrations"]
+
+# Finished jobs kept around for GET /project/jobs/{id}
+MAX_FINISHED_JOBS = 200
+
+
+def snapshot_project(project) -> SimpleNamespace:
+    """Copy the project fields generation needs, so the job does not depend on the request session."""
+    return SimpleNamespace(
+        id=project.id,
+        name=project.name,
+        path=project.path,
+        config=dict(project.config or {}),
+        class_model=list(project.class_model or []),
+    )
+
+
+class GenerationJob:
+    """A queued or running generation of one project."""
+
+    def __init__(self, project, migration_message: str, deleted_class: List[str]):
+        self.id = uuid.uuid4().hex
+        self.project = project
+        self.project_id = project.id
+        self.migration_message = migration_message
+        self.deleted_class = list(deleted_class)
+        self.status = "queued"
+        self.steps = {step: "pending" for step in JOB_STEPS}
+        self.coalesced = 0
+        self.report = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+
+    def progress(self, step: str, state: str = "done"):
+        self.steps[step] = state
+
+    def coalesce(self, project, migration_message: str, deleted_class: List[str]):
+        """Fold a newer request for the same project into this still queued job."""
+        self.project = project
+        if migration_message:
+            self.migration_message = migration_message
+        self.deleted_class += [name for name in deleted_class if name not in self.deleted_class]
+        self.coalesced += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "project_id": self.project_id,
+            "status": self.status,
+            "steps": dict(self.steps),
+            "coalesced": self.coalesced,
+            "report": self.report,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class GenerationJobManager:
+    """
+    Run project generations in a bounded pool of background workers.
+
+    **Parameters**
+
+    * `runner`: `runner(project, migration_message, deleted_class, progress)` doing the generation
+    * `max_workers`: Number of generations running at the same time
+
+    A project has at most one queued job: saving again while a job is queued
+    updates that job instead of adding another one. Jobs of the same project
+    never run concurrently: a job saved while its project is running waits
+    outside the pool and is submitted when the running one finishes, so it
+    never holds a worker that jobs of other projects could use.
+    """
+
+    def __init__(self, runner: Callable, max_workers: int = 2):
+        self.runner = runner
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._queued = {}
+        self._running = set()
+        self._waiting = {}
+
+    def submit(self, project, migration_message: str = "", deleted_class: List[str] = None) -> GenerationJob:
+        project = snapshot_project(project)
+        deleted_class = deleted_class or []
+        with self._lock:
+            job = self._queued.get(project.id)
+            if job is not None:
+                job.coalesce(project, migration_message, deleted_class)
+                return job
+
+            job = GenerationJob(project, migration_message, deleted_class)
+            self._jobs[job.id] = job
+            self._queued[project.id] = job
+            self._prune()
+            if project.id in self._running:
+                self._waiting[project.id] = job
+                return job
+            self._running.add(project.id)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        return self._jobs.get(job_id)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: GenerationJob):
+        with self._lock:
+            # From now on a new save of this project gets a new job
+            if self._queued.get(job.project_id) is job:
+                del self._queued[job.project_id]
+            job.status = "running"
+            job.started_at = datetime.now()
+        try:
+            job.report = self.runner(job.project, job.migration_message, job.deleted_class, job.progress)
+            job.status = "done"
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = datetime.now()
+            self._run_next(job.project_id)
+
+    def _run_next(self, project_id):
+        """Submit the job waiting for `project_id`, or mark the project idle."""
+        with self._lock:
+            job = self._waiting.pop(project_id, None)
+            if job is None:
+                self._running.discard(project_id)
+                return
+        try:
+            self._executor.submit(self._run, job)
+        except RuntimeError:
+            pass  # Shut down: the waiting job is dropped like the queued ones
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,19 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app import models
+from app.api import deps
+from app.core import security
+
+router = APIRouter()
+
+
+@router.get("/stats")
+def read_cache_stats(
+        current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Hit and miss counters of the caches of this worker.
+    """
+    return {"user": deps.user_cache.info(), "token": security.token_verifier.cache.info()}
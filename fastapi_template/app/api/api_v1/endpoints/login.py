@@ -9,7 +9,7 @@ from app import crud, models, schemas
 from app.api import deps
 from app.core import security
 from app.core.config import settings
-from app.core.security import get_password_hash
+from app.core.hashing import hash_password
 from app.utils import (
     generate_password_reset_token,
     send_reset_password_email,
@@ -20,13 +20,13 @@ router = APIRouter()
 
 
 @router.post("/access-token", response_model=schemas.Token)
-def login_access_token(
+async def login_access_token(
         db: Session = Depends(deps.get_db), form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = crud.user.authenticate(
+    user = await crud.user.authenticate_async(
         db, email=form_data.username, password=form_data.password
     )
     if not user:
@@ -39,11 +39,6 @@ def login_access_token(
         data={"id": str(user.id), "email": form_data.username},
         expires_delta=access_token_expires,
     )
-    token_data = deps.get_user(token)
-    user = crud.user.get(db=db, id=token_data.id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     return {"access_token": token, "token_type": "Bearer"}
 
 
@@ -118,7 +113,7 @@ def reset_password(
         )
     elif not crud.user.is_active(user):
         raise HTTPException(status_code=400, detail="Inactive user")
-    hashed_password = get_password_hash(new_password)
+    hashed_password = hash_password(new_password)
     user.hashed_password = hashed_password
     db.add(user)
     db.commit()
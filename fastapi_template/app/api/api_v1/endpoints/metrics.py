@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app import models
+from app.api import deps
+from app.core import instrumentation, timing
+from app.core.config import settings
+
+router = APIRouter()
+
+
+@router.get("", response_class=PlainTextResponse)
+def read_metrics(
+        current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> PlainTextResponse:
+    """
+    SQL statements, database time and N+1 patterns of each endpoint of this worker, and the
+    histograms of the request phases of each route, in the Prometheus text format.
+
+    The statements are shown, so only superusers can read it: scrape it with the access token
+    of a superuser (`authorization` of the Prometheus scrape config).
+    """
+    if not settings.QUERY_METRICS and not settings.SERVER_TIMING:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    metrics = ""
+    if settings.QUERY_METRICS:
+        metrics += instrumentation.render_metrics()
+    if settings.SERVER_TIMING:
+        metrics += timing.render_metrics()
+    return PlainTextResponse(metrics, media_type="text/plain; version=0.0.4")
@@ -1,44 +1,179 @@
-from typing import Generator
+import json
+from typing import AsyncGenerator, Generator, List, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy import Column, inspect
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from app import crud, models, schemas
-from app.core import security
+from app.core import cache, security, timing
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.db import replicas
+from app.db.session import (
+    AsyncReadSessionLocal, AsyncSessionLocal, ReadSessionLocal, SessionLocal, replica_pool
+)
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
 
+# Column values of the authenticated users, keyed by id. Entries are dropped when a user
+# is updated (deactivated, soft deleted...) or deleted, through the ORM or the bulk methods
+user_cache = cache.create_cache("user", settings.USER_CACHE_TTL, settings.USER_CACHE_SIZE)
+cache.invalidate_on_change(models.User, user_cache)
+# The password hash is never cached (the cache may be a shared Redis), it is loaded when read
+USER_COLUMNS = [
+    attribute.key for attribute in inspect(models.User).column_attrs
+    if isinstance(attribute.expression, Column) and attribute.key != "hashed_password"
+]
+
+
+def get_writer(request: Optional[Request]) -> Optional[str]:
+    """Id of the user of the bearer token of `request`, None when there is no valid one."""
+    authorization = request.headers.get("Authorization") if request is not None else None
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return str(security.token_verifier.verify(token).id)
+    except (jwt.JWTError, ValidationError):
+        return None
 
-def get_db() -> Generator:
+
+def get_db(request: Request = None) -> Generator:
     try:
         db = SessionLocal()
         yield db
     finally:
+        if replica_pool and replicas.has_written(db):
+            replicas.mark_writer(get_writer(request))
         db.close()
 
 
-def get_current_user(
-        db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
-) -> models.User:
+async def get_async_db(request: Request = None) -> AsyncGenerator:
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        finally:
+            if replica_pool and replicas.has_written(db):
+                replicas.mark_writer(get_writer(request))
+
+
+def choose_replica(request: Request) -> Optional[replicas.Replica]:
+    if not replica_pool or replicas.is_sticky(get_writer(request)):
+        return None
+    return replica_pool.choose()
+
+
+def get_read_db(request: Request, db: Session = Depends(get_db)) -> Generator:
+    """
+    Session of the read-only endpoints: on a healthy replica, or the session of `get_db` when
+    there is none or the user wrote recently (read your writes), see app/db/replicas.py.
+    """
+    replica = choose_replica(request)
+    if replica is None:
+        yield db
+        return
+    read_db = ReadSessionLocal(bind=replica.engine)
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        token_data = schemas.TokenPayload(**payload)
+        yield read_db
+    except OperationalError as e:
+        replica.mark_down(str(e))
+        raise
+    finally:
+        read_db.close()
+
+
+async def get_async_read_db(request: Request, db: AsyncSession = Depends(get_async_db)) -> AsyncGenerator:
+    replica = choose_replica(request)
+    if replica is None:
+        yield db
+        return
+    async with AsyncReadSessionLocal(bind=replica.async_engine) as read_db:
+        try:
+            yield read_db
+        except OperationalError as e:
+            replica.mark_down(str(e))
+            raise
+
+
+def get_where(where: Optional[str] = None) -> Optional[List]:
+    """`where` query parameter: a JSON encoded where array, see `CRUDBase.get_multi_where_array`."""
+    if where is None:
+        return None
+    try:
+        where = json.loads(where)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="where must be a JSON array")
+    if not isinstance(where, list):
+        raise HTTPException(status_code=400, detail="where must be a JSON array")
+    return where
+
+
+def get_fields(fields: Optional[str] = None) -> Optional[List[str]]:
+    """`fields` query parameter: comma separated columns to load and return, e.g. `id,label`."""
+    if not fields:
+        return None
+    return list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+
+
+def cache_user(user: models.User):
+    user_cache.set(user.id, {key: getattr(user, key) for key in USER_COLUMNS})
+
+
+def cached_user(data: dict) -> models.User:
+    """Rebuild a detached `User` from cached column values, ready to be merged without a query."""
+    user = models.User(**data)
+    make_transient_to_detached(user)
+    return user
+
+
+def get_user_by_id(db: Session, user_id: int) -> Optional[models.User]:
+    if settings.USER_CACHE_TTL <= 0:
+        return crud.user.get(db, id=user_id)
+    data = user_cache.get(user_id)
+    if data is not None:
+        return db.merge(cached_user(data), load=False)
+    user = crud.user.get(db, id=user_id)
+    if user:
+        cache_user(user)
+    return user
+
+
+async def get_user_by_id_async(db: AsyncSession, user_id: int) -> Optional[models.User]:
+    if settings.USER_CACHE_TTL <= 0:
+        return await crud.user_async.get(db, id=user_id)
+    data = user_cache.get(user_id)
+    if data is not None:
+        return await db.merge(cached_user(data), load=False)
+    user = await crud.user_async.get(db, id=user_id)
+    if user:
+        cache_user(user)
+    return user
+
+
+def verify_token(token: str) -> schemas.TokenPayload:
+    """Payload of a valid access token, shared by every dependency that reads the token."""
+    try:
+        return security.token_verifier.verify(token)
     except (jwt.JWTError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
 
-    user = crud.user.get(db, id=token_data.id)
+
+def get_current_user(
+        db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
+) -> models.User:
+    with timing.phase("auth"):
+        token_data = verify_token(token)
+        user = get_user_by_id(db, token_data.id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     return user
@@ -46,32 +181,12 @@ def get_current_user(
 
 def get_user(
         token: str,
-) -> models.User:
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        token_data = schemas.TokenPayload(**payload)
-    except (jwt.JWTError, ValidationError):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Could not validate credentials",
-        )
-    return token_data
+) -> schemas.TokenPayload:
+    return verify_token(token)
 
 
-def get_token_info(token: str = Depends(reusable_oauth2)):
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        token_data = schemas.TokenPayload(**payload)
-    except (jwt.JWTError, ValidationError):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Could not validate credentials",
-        )
-    return token_data
+def get_token_info(token: str = Depends(reusable_oauth2)) -> schemas.TokenPayload:
+    return verify_token(token)
 
 
 def get_current_active_user(
@@ -90,3 +205,32 @@ def get_current_active_superuser(
             status_code=400, detail="The user doesn't have enough privileges"
         )
     return current_user
+
+
+async def get_current_user_async(
+        db: AsyncSession = Depends(get_async_db), token: str = Depends(reusable_oauth2)
+) -> models.User:
+    with timing.phase("auth"):
+        token_data = verify_token(token)
+        user = await get_user_by_id_async(db, token_data.id)
+    if not user:
+        raise HTTPException(status_code=403, detail="User not found")
+    return user
+
+
+async def get_current_active_user_async(
+        current_user: models.User = Depends(get_current_user_async),
+) -> models.User:
+    if not crud.user.is_active(current_user):
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
+
+async def get_current_active_superuser_async(
+        current_user: models.User = Depends(get_current_user_async),
+) -> models.User:
+    if not crud.user.is_superuser(current_user):
+        raise HTTPException(
+            status_code=400, detail="The user doesn't have enough privileges"
+        )
+    return current_user
@@ -0,0 +1,95 @@
+"""
+Response serialization of the generated endpoints.
+
+Rows are turned into JSON once, by a `TypeAdapter` compiled once per response schema, and
+returned as a raw `Response`: FastAPI does not validate and encode them again against the
+`response_model`, which is only kept for the OpenAPI documentation.
+
+Only the loaded state of the ORM objects is read, like `jsonable_encoder` did, so serializing
+never lazy loads a relation that was not asked for (with `relations=`). The create, update and
+delete endpoints need it too: their object is committed, deleted or on an async session, a
+relation can't be lazy loaded from it.
+
+`fields=` query parameter: the model of a (schema, fields) pair is built once and cached, the
+columns it needs are the only ones loaded from the database.
+"""
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter, create_model
+
+from app.core import timing
+
+
+@lru_cache(maxsize=256)
+def get_adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def loaded_state(value: Any) -> Any:
+    """Plain data of an ORM object (or list of them): its loaded attributes, recursively."""
+    if isinstance(value, list):
+        return [loaded_state(item) for item in value]
+    state = getattr(value, "__dict__", None)
+    if state is None or "_sa_instance_state" not in state:
+        return value
+    return {key: loaded_state(item) for key, item in state.items() if key != "_sa_instance_state"}
+
+
+def json_response(schema: Any, value: Any) -> Response:
+    adapter = get_adapter(schema)
+    return Response(adapter.dump_json(adapter.validate_python(value)), media_type="application/json")
+
+
+def object_response(schema: Type[BaseModel], db_obj: Any) -> Response:
+    with timing.phase("serialize"):
+        return json_response(schema, loaded_state(db_obj))
+
+
+def page_response(
+        response_schema: Type[BaseModel], items: List[Any], count: Optional[int] = None, next_cursor: Optional[str] = None
+) -> Response:
+    """List response of a `Response{Model}` schema (count, data, next_cursor)."""
+    with timing.phase("serialize"):
+        return json_response(
+            response_schema, {"count": count, "data": loaded_state(items), "next_cursor": next_cursor}
+        )
+
+
+@lru_cache(maxsize=256)
+def _fields_model(crud_object, schema: Type[BaseModel], fields: Tuple[str, ...]) -> Type[BaseModel]:
+    unknown = [
+        field for field in fields
+        if field not in schema.model_fields or field not in crud_object.column_keys
+    ]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}")
+    definitions = {field: (schema.model_fields[field].annotation, None) for field in fields}
+    return create_model(f"{schema.__name__}Fields", **definitions)
+
+
+def get_fields_model(crud_object, schema: Type[BaseModel], fields: List[str]) -> Type[BaseModel]:
+    """Model of `schema` with only `fields`, which must be columns of the model of `crud_object`."""
+    return _fields_model(crud_object, schema, tuple(fields))
+
+
+@lru_cache(maxsize=256)
+def get_fields_page_model(fields_model: Type[BaseModel]) -> Type[BaseModel]:
+    return create_model(
+        f"Response{fields_model.__name__}",
+        count=(Optional[int], None),
+        data=(List[fields_model], []),
+        next_cursor=(Optional[str], None),
+    )
+
+
+def fields_response(fields_model: Type[BaseModel], db_obj: Any) -> Response:
+    return object_response(fields_model, db_obj)
+
+
+def fields_page_response(
+        fields_model: Type[BaseModel], items: List[Any], count: Optional[int] = None, next_cursor: Optional[str] = None
+) -> Response:
+    return page_response(get_fields_page_model(fields_model), items, count=count, next_cursor=next_cursor)
@@ -0,0 +1,269 @@
+"""
+Small key/value caches with a TTL, used to skip database lookups between requests.
+
+`create_cache` returns the backend chosen by `settings.CACHE_BACKEND`:
+
+* `memory`: a bounded LRU in the worker process.
+* `redis`: a Redis compatible server at `settings.REDIS_URL` (needs the `redis`
+  package), shared by every worker, so an invalidation is seen by all of them.
+
+Values are dicts of column values (the memory backend also keeps any object as is).
+Every backend counts its hits and misses. A Redis error is logged and counted, a failed
+`get` is a miss so the caller falls back to the database.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Session.info key of the entries to drop again once the session commits, see `invalidate_on_change`
+PENDING_INVALIDATIONS = "cache_invalidations"
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def to_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "sets": self.sets,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+class MemoryCache:
+    """Thread safe LRU of at most `max_size` entries, each kept `ttl` seconds unless `set` is given another ttl."""
+
+    backend = "memory"
+
+    def __init__(self, namespace: str, ttl: float, max_size: int):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key: Any, value: Any, ttl: float = None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            self.stats.sets += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, key: Any):
+        with self._lock:
+            self._entries.pop(key, None)
+            self.stats.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats.invalidations += 1
+
+    def info(self) -> dict:
+        return {"backend": self.backend, "namespace": self.namespace, "size": len(self._entries),
+                **self.stats.to_dict()}
+
+
+def _encode(value: Any):
+    # Column types JSON can't hold are tagged so they are read back as the same type, the
+    # others are encoded as in the responses (enums by value)
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, dt_time):
+        return {"__time__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    if isinstance(value, UUID):
+        return {"__uuid__": str(value)}
+    if isinstance(value, Enum):
+        return value.value
+    return jsonable_encoder(value)
+
+
+def _decode(value: dict):
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__date__" in value:
+        return date.fromisoformat(value["__date__"])
+    if "__time__" in value:
+        return dt_time.fromisoformat(value["__time__"])
+    if "__decimal__" in value:
+        return Decimal(value["__decimal__"])
+    if "__uuid__" in value:
+        return UUID(value["__uuid__"])
+    return value
+
+
+class RedisCache:
+    """Same interface as `MemoryCache` on a Redis server, entries expire after `ttl` seconds."""
+
+    backend = "redis"
+
+    def __init__(self, namespace: str, ttl: float, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package: pip install redis")
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._client = redis.Redis.from_url(url)
+        self._errors = (redis.RedisError,)
+
+    def _key(self, key: Any) -> str:
+        return f"{settings.PROJECT_NAME}:{self.namespace}:{key}"
+
+    def _error(self, operation: str, key: Any, error: Exception):
+        self.stats.errors += 1
+        logger.warning("Cache %s %s of %s failed: %s", self.namespace, operation, key, error)
+
+    def get(self, key: Any) -> Optional[dict]:
+        try:
+            raw = self._client.get(self._key(key))
+            value = None if raw is None else json.loads(raw, object_hook=_decode)
+        except (*self._errors, ValueError) as e:
+            self._error("get", key, e)
+            value = None
+        if value is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: Any, value: dict, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            self._client.set(self._key(key), json.dumps(value, default=_encode), px=int(ttl * 1000))
+        except (*self._errors, TypeError, ValueError) as e:
+            self._error("set", key, e)
+            return
+        self.stats.sets += 1
+
+    def delete(self, key: Any):
+        try:
+            self._client.delete(self._key(key))
+        except self._errors as e:
+            self._error("delete", key, e)
+            return
+        self.stats.invalidations += 1
+
+    def clear(self):
+        try:
+            keys = list(self._client.scan_iter(match=self._key("*")))
+            if keys:
+                self._client.delete(*keys)
+        except self._errors as e:
+            self._error("clear", "*", e)
+            return
+        self.stats.invalidations += 1
+
+    def info(self) -> dict:
+        return {"backend": self.backend, "namespace": self.namespace, **self.stats.to_dict()}
+
+
+def create_cache(namespace: str, ttl: float, max_size: int):
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCache(namespace, ttl, settings.REDIS_URL)
+    if settings.CACHE_BACKEND != "memory":
+        raise ValueError(f"Invalid CACHE_BACKEND {settings.CACHE_BACKEND}")
+    return MemoryCache(namespace, ttl, max_size)
+
+
+# Caches of the rows of each model, see `invalidate_model`
+_model_caches: Dict[type, List[Any]] = {}
+
+
+def invalidate_on_change(model, cache):
+    """
+    Drop the cached entry of a `model` row (keyed by id) whenever it is updated or deleted
+    through the ORM, and the whole cache on bulk UPDATE/DELETE statements on `model`.
+    Core statements are not seen by these events, `invalidate_model` clears the cache after them.
+
+    The events fire at flush: until the commit, another request still reads the old row and
+    may cache it again, so the entries are dropped a second time once the session commits.
+    """
+    _model_caches.setdefault(model, []).append(cache)
+
+    def drop_entry(mapper, connection, target):
+        cache.delete(target.id)
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(PENDING_INVALIDATIONS, []).append((cache, target.id))
+
+    def drop_all(orm_execute_state):
+        if orm_execute_state.is_update or orm_execute_state.is_delete:
+            mapper = orm_execute_state.bind_mapper
+            if mapper is not None and mapper.class_ is model:
+                cache.clear()
+                orm_execute_state.session.info.setdefault(PENDING_INVALIDATIONS, []).append((cache, None))
+
+    event.listen(model, "after_update", drop_entry)
+    event.listen(model, "after_delete", drop_entry)
+    event.listen(Session, "do_orm_execute", drop_all)
+
+
+def drop_committed(session):
+    """Drop the entries of the rows the committed session changed (None: the whole cache)."""
+    for cache, key in session.info.pop(PENDING_INVALIDATIONS, ()):
+        if key is None:
+            cache.clear()
+        else:
+            cache.delete(key)
+
+
+def forget_rolled_back(session):
+    session.info.pop(PENDING_INVALIDATIONS, None)
+
+
+event.listen(Session, "after_commit", drop_committed)
+event.listen(Session, "after_rollback", forget_rolled_back)
+
+
+def invalidate_model(model):
+    """Clear the caches of the rows of `model`, after a Core statement changed some of them (bulk upsert, set-based UPDATE/DELETE)."""
+    for cache in _model_caches.get(model, ()):
+        cache.clear()
@@ -37,6 +37,47 @@ class Settings(BaseSettings):
     MYSQL_DATABASE: str = os.getenv("MYSQL_DATABASE")
 
     SQLALCHEMY_DATABASE_URI: Any = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
+    # Generated with the async stack: routers use an AsyncSession on this URI
+    ASYNC_DB: bool = False
+    ASYNC_SQLALCHEMY_DATABASE_URI: Any = f"mysql+aiomysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
+    # Read replicas: DSNs, or host[:port] with the credentials of the primary, see app/db/replicas.py
+    MYSQL_REPLICAS: List[str] = []
+    REPLICA_HEALTH_INTERVAL: float = 5.0
+    # Reads of a user stay on the primary this many seconds after one of their writes
+    REPLICA_STICKY_SECONDS: float = 5.0
+    # SQL statements timed per endpoint and served at /metrics, see app/core/instrumentation.py
+    QUERY_METRICS: bool = True
+    # Statements slower than this many seconds are logged with their EXPLAIN plan (0 disables it)
+    SLOW_QUERY_SECONDS: float = 0.5
+    SLOW_QUERY_EXPLAIN: bool = True
+    # A statement run this many times in one request is reported as an N+1 (0 disables it)
+    N_PLUS_ONE_THRESHOLD: int = 5
+    SLOWEST_QUERIES: int = 10
+    # Server-Timing header (total, db, auth, serialize) and phase histograms per route, see app/core/timing.py
+    SERVER_TIMING: bool = True
+    # Compiled where-array conditions kept per CRUD object
+    WHERE_CACHE_SIZE: int = 256
+    # Estimated list counts (count=estimate) are reused for this many seconds (0 disables it)
+    COUNT_CACHE_TTL: float = 5.0
+    COUNT_CACHE_SIZE: int = 1024
+    # Authenticated users are cached between requests for this many seconds (0 disables it).
+    # memory is per worker process, redis (REDIS_URL) is shared by every worker
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    REDIS_URL: Optional[str] = os.getenv("REDIS_URL")
+    USER_CACHE_TTL: float = 60.0
+    USER_CACHE_SIZE: int = 10000
+    # Verified access tokens are remembered until they expire, at most this many seconds
+    TOKEN_CACHE_TTL: float = 300.0
+    TOKEN_CACHE_SIZE: int = 10000
+    # bcrypt runs in this many processes per server worker (0 runs it in the request thread), see
+    # app/core/hashing.py. Each uvicorn/gunicorn worker has its own pool: keep workers x HASH_WORKERS
+    # around the number of cores
+    HASH_WORKERS: int = 2
+    HASH_MAX_PENDING: int = 64
+    HASH_QUEUE_TIMEOUT: float = 5.0
+    # Rows per multi-row INSERT of the bulk endpoints, at most: fewer are sent when
+    # rows * columns exceeds the bind parameter limit of the driver
+    BULK_CHUNK_SIZE: int = 1000
 
     SMTP_TLS: bool = True
     SMTP_PORT: Optional[int] = None
@@ -0,0 +1,149 @@
+"""
+Password hashing off the request thread.
+
+bcrypt costs a few hundred milliseconds of CPU per call. Hashes and verifications run in a
+dedicated process pool of `settings.HASH_WORKERS` processes per server worker, so they hold
+neither the GIL nor a threadpool slot of the server (0 runs them in the calling thread, or the
+default threadpool for the async variants). The processes are started with forkserver (spawn
+where it is missing): forking the server, which runs threads, could copy locks held by them.
+At most `settings.HASH_MAX_PENDING` jobs are queued or running. A job that cannot get a slot
+within `settings.HASH_QUEUE_TIMEOUT` seconds is rejected with a 503, so a login storm cannot
+starve the other endpoints.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.config import settings
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(settings.HASH_MAX_PENDING)
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if settings.HASH_WORKERS <= 0:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                _executor = ProcessPoolExecutor(max_workers=settings.HASH_WORKERS, mp_context=context)
+    return _executor
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many password operations in progress, retry later",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _run(func, *args):
+    if not _slots.acquire(timeout=settings.HASH_QUEUE_TIMEOUT):
+        raise _busy()
+    try:
+        executor = get_executor()
+        if executor is None:
+            return func(*args)
+        return executor.submit(func, *args).result()
+    finally:
+        _slots.release()
+
+
+def _release_acquired(future: asyncio.Future):
+    if not future.cancelled() and future.exception() is None and future.result():
+        _slots.release()
+
+
+async def _acquire_async():
+    """Take a slot, waiting for it in a thread so the event loop keeps serving other requests."""
+    if _slots.acquire(blocking=False):
+        return
+    loop = asyncio.get_running_loop()
+    waiter = loop.run_in_executor(None, _slots.acquire, True, settings.HASH_QUEUE_TIMEOUT)
+    try:
+        acquired = await asyncio.shield(waiter)
+    except asyncio.CancelledError:
+        # The request is gone but the thread still waits: give the slot back when it gets it
+        waiter.add_done_callback(_release_acquired)
+        raise
+    if not acquired:
+        raise _busy()
+
+
+async def _run_async(func, *args):
+    loop = asyncio.get_running_loop()
+    await _acquire_async()
+    try:
+        return await loop.run_in_executor(get_executor(), func, *args)
+    finally:
+        _slots.release()
+
+
+def _run_many(func, values: list) -> list:
+    """`func` on each value, in parallel in the pool. The whole batch takes a single slot."""
+    if not _slots.acquire(timeout=settings.HASH_QUEUE_TIMEOUT):
+        raise _busy()
+    try:
+        executor = get_executor()
+        if executor is None:
+            return [func(value) for value in values]
+        return list(executor.map(func, values))
+    finally:
+        _slots.release()
+
+
+async def _run_many_async(func, values: list) -> list:
+    loop = asyncio.get_running_loop()
+    await _acquire_async()
+    try:
+        executor = get_executor()
+        return list(await asyncio.gather(*(loop.run_in_executor(executor, func, value) for value in values)))
+    finally:
+        _slots.release()
+
+
+def hash_password(password: str) -> str:
+    return _run(security.get_password_hash, password)
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hashes of `passwords`, in order, for the bulk inserts."""
+    return _run_many(security.get_password_hash, passwords) if passwords else []
+
+
+def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify `password` against `hashed_password`.
+    Return (valid, new_hash), new_hash is set when the hash uses deprecated settings and must be replaced.
+    """
+    return _run(security.verify_and_update_password, password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_async(security.get_password_hash, password)
+
+
+async def hash_passwords_async(passwords: List[str]) -> List[str]:
+    return await _run_many_async(security.get_password_hash, passwords) if passwords else []
+
+
+async def verify_and_update_async(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run_async(security.verify_and_update_password, password, hashed_password)
@@ -0,0 +1,210 @@
+"""
+SQL instrumentation: what the endpoints ask the database.
+
+Every statement sent by an engine (sync, async or replica) is timed by `before_cursor_execute`
+and `after_cursor_execute` listeners. `QueryStatsMiddleware` gives each request its
+`RequestStats` (through a context variable, so the threadpool of the sync endpoints sees it)
+and adds them, once the request is done, to the totals of its route:
+
+* requests, statements and seconds spent in the database
+* N+1 patterns: a statement run `settings.N_PLUS_ONE_THRESHOLD` times or more in one request
+  (a lazy load in a loop), each is logged once per request
+* the slowest statements of the worker
+
+`render_metrics` writes them in the Prometheus text format (`GET /metrics`, superusers only).
+Statements slower than `settings.SLOW_QUERY_SECONDS` are logged with their EXPLAIN plan and
+the types of their parameters, never their values (emails, password hashes...).
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = Counter()
+        # Seconds spent in the phases timed by `app.core.timing.phase`
+        self.phases: Dict[str, float] = {}
+
+    def add(self, statement: str, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Statements run at least `threshold` times."""
+        return {statement: count for statement, count in self.statements.items() if count >= threshold}
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.max_queries = 0
+        self.n_plus_one = 0
+
+
+current_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_stats", default=None)
+
+_lock = threading.Lock()
+endpoints: Dict[str, EndpointStats] = {}
+slowest: Dict[str, float] = {}
+
+
+def normalize(statement: str) -> str:
+    return " ".join(statement.split())
+
+
+def record_slowest(statement: str, seconds: float):
+    with _lock:
+        if seconds <= slowest.get(statement, 0.0):
+            return
+        slowest[statement] = seconds
+        if len(slowest) > settings.SLOWEST_QUERIES:
+            del slowest[min(slowest, key=slowest.get)]
+
+
+def record_request(endpoint: str, stats: RequestStats):
+    repeated = stats.repeated(settings.N_PLUS_ONE_THRESHOLD) if settings.N_PLUS_ONE_THRESHOLD > 0 else {}
+    for statement, count in repeated.items():
+        logger.warning("N+1 on %s: statement run %s times: %s", endpoint, count, statement)
+    with _lock:
+        totals = endpoints.get(endpoint)
+        if totals is None:
+            totals = endpoints[endpoint] = EndpointStats()
+        totals.requests += 1
+        totals.queries += stats.queries
+        totals.db_seconds += stats.db_seconds
+        totals.max_queries = max(totals.max_queries, stats.queries)
+        totals.n_plus_one += len(repeated)
+
+
+def explain(connection, statement: str, parameters) -> Optional[List]:
+    """Plan of a SELECT, read on the DBAPI connection of `connection` so no event fires again."""
+    if not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    prefix = "EXPLAIN QUERY PLAN " if connection.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [tuple(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def describe_parameters(parameters, executemany: bool) -> str:
+    """Count and types of the parameters of a statement, without their values."""
+    if executemany:
+        return f"{len(parameters)} parameter sets"
+    if isinstance(parameters, dict):
+        types = [f"{key}: {type(value).__name__}" for key, value in parameters.items()]
+    else:
+        types = [type(value).__name__ for value in parameters or ()]
+    return f"{len(types)} ({', '.join(types)})"
+
+
+def log_slow_query(connection, statement: str, parameters, seconds: float, executemany: bool, streaming: bool):
+    plan = None
+    # EXPLAIN on the connection of an unbuffered cursor would consume its pending rows
+    if settings.SLOW_QUERY_EXPLAIN and not executemany and not streaming:
+        try:
+            plan = explain(connection, statement, parameters)
+        except Exception as e:
+            plan = f"EXPLAIN failed: {e}"
+    logger.warning(
+        "Slow query (%.3fs): %s\nparameters: %s\nplan: %s",
+        seconds, statement, describe_parameters(parameters, executemany), plan,
+    )
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start"].pop()
+    statement = normalize(statement)
+    stats = current_stats.get()
+    if stats is not None:
+        stats.add(statement, seconds)
+    record_slowest(statement, seconds)
+    if 0 < settings.SLOW_QUERY_SECONDS <= seconds:
+        streaming = context is not None and bool(context.execution_options.get("stream_results"))
+        log_slow_query(conn, statement, parameters, seconds, executemany, streaming)
+
+
+def install():
+    """Listen to the statements of every engine, once."""
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware collecting the `RequestStats` of each HTTP request, by route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # Shared with the ServerTimingMiddleware when it runs first
+        stats = current_stats.get()
+        token = None
+        if stats is None:
+            stats = RequestStats()
+            token = current_stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if token is not None:
+                current_stats.reset(token)
+            # The router sets the matched route on the scope, its path keeps the ids out of the labels
+            route = scope.get("route")
+            endpoint = f"{scope['method']} {route.path if route is not None else 'unmatched'}"
+            record_request(endpoint, stats)
+
+
+def escape_label(value: str, max_length: int = 200) -> str:
+    if len(value) > max_length:
+        value = value[:max_length] + "..."
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = [
+    ("db_requests_total", "counter", "HTTP requests", lambda totals: totals.requests),
+    ("db_queries_total", "counter", "SQL statements executed", lambda totals: totals.queries),
+    ("db_query_seconds_total", "counter", "Seconds spent executing SQL statements", lambda totals: totals.db_seconds),
+    ("db_queries_per_request_max", "gauge", "Most SQL statements of a request", lambda totals: totals.max_queries),
+    ("db_n_plus_one_total", "counter", "Statements repeated N_PLUS_ONE_THRESHOLD times or more in a request",
+     lambda totals: totals.n_plus_one),
+]
+
+
+def render_metrics() -> str:
+    """Totals of this worker in the Prometheus text format."""
+    with _lock:
+        totals = sorted(endpoints.items())
+        slow = sorted(slowest.items(), key=lambda item: -item[1])
+    lines = []
+    for name, kind, description, value in METRICS:
+        lines += [f"# HELP {name} {description}, by endpoint", f"# TYPE {name} {kind}"]
+        lines += [f'{name}{{endpoint="{escape_label(endpoint)}"}} {value(stats)}' for endpoint, stats in totals]
+    lines += ["# HELP db_slowest_query_seconds Slowest SQL statements", "# TYPE db_slowest_query_seconds gauge"]
+    lines += [f'db_slowest_query_seconds{{statement="{escape_label(statement)}"}} {seconds}' for statement, seconds in slow]
+    return "\n".join(lines) + "\n"
@@ -1,8 +1,13 @@
+import hashlib
+import time
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
 
 from jose import jwt
 from passlib.context import CryptContext
 
+from app import schemas
+from app.core.cache import MemoryCache
 from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -23,9 +28,43 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     return encoded_jwt
 
 
+class TokenVerifier:
+    """
+    Decode and validate access tokens, keeping the `TokenPayload` of the valid ones.
+
+    Entries are keyed by the SHA-256 digest of the token (the token itself is never kept)
+    and live until the token expires, at most `ttl` seconds. Invalid tokens are not cached.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.cache = MemoryCache("token", ttl, max_size)
+
+    def verify(self, token: str) -> schemas.TokenPayload:
+        """Return the payload of `token`. Raise `jwt.JWTError` or `ValidationError` when it is invalid."""
+        digest = hashlib.sha256(token.encode()).digest()
+        token_data = self.cache.get(digest)
+        if token_data is not None:
+            return token_data
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        token_data = schemas.TokenPayload(**payload)
+        ttl = self.cache.ttl
+        if "exp" in payload:
+            ttl = min(ttl, payload["exp"] - time.time())
+        if ttl > 0:
+            self.cache.set(digest, token_data, ttl=ttl)
+        return token_data
+
+
+token_verifier = TokenVerifier(settings.TOKEN_CACHE_TTL, settings.TOKEN_CACHE_SIZE)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
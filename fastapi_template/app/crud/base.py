@@ -1,11 +1,13 @@
 from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
 
+from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy import desc, asc, and_
+from sqlalchemy import Column, desc, asc, and_, inspect
 from sqlalchemy.orm import (
     Session,
 )
+from sqlalchemy.orm.exc import StaleDataError
 
 from db.base_class import Base
 
@@ -25,6 +27,17 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         * `schema`: A Pydantic model (schema) class
         """
         self.model = model
+        self._column_keys = None
+
+    @property
+    def column_keys(self) -> frozenset:
+        """Attribute names of the table columns of the model, read once from the mapper."""
+        if self._column_keys is None:
+            self._column_keys = frozenset(
+                attribute.key for attribute in inspect(self.model).column_attrs
+                if isinstance(attribute.expression, Column)
+            )
+        return self._column_keys
 
     def get(
             self,
@@ -104,18 +117,31 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             *,
             db_obj: ModelType,
             obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+            refresh: bool = False,
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
+        """
+        Write the fields set in `obj_in` that changed, as a partial `UPDATE ... WHERE id = ?`.
+        The object is not read back after the commit unless `refresh` is set.
+        """
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        for field, value in update_data.items():
+            if field in self.column_keys and getattr(db_obj, field) != value:
+                setattr(db_obj, field, value)
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        expire_on_commit = db.expire_on_commit
+        db.expire_on_commit = False
+        try:
+            db.commit()
+        except StaleDataError:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=f"{self.model.__name__} was modified since it was read")
+        finally:
+            db.expire_on_commit = expire_on_commit
+        if refresh:
+            db.refresh(db_obj)
         return db_obj
 
     def remove(self, db: Session, *, id: int) -> ModelType:
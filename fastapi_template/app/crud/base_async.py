@@ -0,0 +1,308 @@
+import ast
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.crud.base_copy import CRUDBase, CreateSchemaType, ModelType, UpdateSchemaType
+
+
+class AsyncCRUDBase(CRUDBase[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """
+    CRUD object working on an `AsyncSession`, used when the project is generated with `async_db`.
+
+    Where arrays, cursors and count modes behave as in `CRUDBase`, whose parsing,
+    compiled condition cache and count cache are shared: only the statements are
+    executed differently. Relationships are not lazy loaded with an async session,
+    load them with `relations` or `selectinload` options.
+    """
+
+    def filter_statement(self, statement, where: Any = None, include_deleted=False):
+        """`filter_where` for select statements. Return (statement, params), params go to `execute`."""
+        condition, params = self.get_compiled_condition(where=where, include_deleted=include_deleted)
+        if condition is not None:
+            statement = statement.where(condition)
+        return statement, params
+
+    def get_multi_statement(
+            self,
+            db: AsyncSession,
+            *,
+            order_by: str = "id",
+            where: Any = None,
+            order: str = "DESC",
+            include_deleted: bool = False,
+            today_first: bool = False,
+    ):
+        statement, params = self.filter_statement(
+            select(self.model), where=where, include_deleted=include_deleted
+        )
+        # The sync session only builds the relation subqueries, nothing is executed with it
+        order_by_clauses = self.get_order_by_clauses(
+            db.sync_session, order_by=order_by, order=order, today_first=today_first
+        )
+        return statement.order_by(*order_by_clauses), params
+
+    async def get(
+            self,
+            db: AsyncSession,
+            id: Any,
+            where: Any = "",
+            relations=None,
+            current_user=None,
+            include_deleted=False,
+            base_columns=None,
+    ) -> Optional[ModelType]:
+        statement = select(self.model).where(self.model.id == id)
+        params = {}
+        if where is not None and where != "":
+            if isinstance(where, str):
+                where = ast.literal_eval(where)
+            statement, params = self.filter_statement(statement, where=where, include_deleted=include_deleted)
+        statement = self.apply_load_options(statement, base_columns=base_columns, relations=relations)
+        result = await db.execute(statement.limit(1), params)
+        return result.scalars().first()
+
+    async def get_multi_where_array(
+            self,
+            db: AsyncSession,
+            *,
+            skip: int = 0,
+            limit: int = 100,
+            order_by: str = "id",
+            where: Any = None,
+            order: str = "DESC",
+            base_columns=None,
+            relations=None,
+            current_user=None,
+            include_deleted: bool = False,
+            today_first: bool = False,
+    ) -> List[ModelType]:
+        statement, params = self.get_multi_statement(
+            db,
+            order_by=order_by,
+            where=where,
+            order=order,
+            include_deleted=include_deleted,
+            today_first=today_first,
+        )
+        statement = self.apply_load_options(
+            statement.offset(skip).limit(limit), base_columns=base_columns, relations=relations
+        )
+        result = await db.execute(statement, params)
+        return list(result.scalars().all())
+
+    async def get_page_where_array(
+            self,
+            db: AsyncSession,
+            *,
+            skip: int = 0,
+            limit: int = 100,
+            cursor: Optional[str] = None,
+            order_by: str = "id",
+            where: Any = None,
+            order: str = "DESC",
+            base_columns=None,
+            relations=None,
+            include_deleted: bool = False,
+            count: str = "none",
+    ) -> Tuple[List[ModelType], Optional[str], Optional[int]]:
+        """Async `CRUDBase.get_page_where_array`."""
+        self.check_count_mode(count)
+        if "." in order_by:
+            raise HTTPException(status_code=400, detail="Cursor pagination needs a column of the model as order_by")
+        statement, params = self.get_multi_statement(
+            db, order_by=order_by, where=where, order=order, include_deleted=include_deleted
+        )
+        if cursor is not None:
+            statement = statement.where(
+                self.get_seek_condition(self.decode_cursor(cursor, order_by, order), order_by, order)
+            )
+        else:
+            statement = statement.offset(skip)
+        if base_columns is not None and len(base_columns) > 0:
+            base_columns = list(base_columns) + [getattr(self.model, order_by), self.model.id]
+        statement = self.apply_load_options(statement.limit(limit + 1), base_columns=base_columns, relations=relations)
+
+        total = None
+        count_in_page = count == "exact" and cursor is None
+        if count_in_page:
+            statement = statement.add_columns(func.count().over().label("total_count"))
+
+        result = await db.execute(statement, params)
+        if count_in_page:
+            rows = result.all()
+            if rows:
+                total = rows[0][1]
+            items = [row[0] for row in rows]
+        else:
+            items = list(result.scalars().all())
+        if total is None and count != "none":
+            total = await self.get_count_where_array(db, where=where, include_deleted=include_deleted, mode=count)
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = self.encode_cursor(items[-1], order_by, order)
+        return items, next_cursor, total
+
+    async def get_count_where_array(
+            self,
+            db: AsyncSession,
+            where: Any = None,
+            current_user=None,
+            include_deleted=False,
+            mode: str = "exact",
+    ) -> Optional[int]:
+        self.check_count_mode(mode)
+        if mode == "none":
+            return None
+        cache_key = self.get_count_cache_key(where, include_deleted, mode)
+        result = self.get_cached_count(cache_key)
+        if result is not None:
+            return result
+
+        if mode == "estimate" and db.get_bind().dialect.name == "mysql":
+            result = await db.run_sync(
+                lambda session: self.get_estimated_count(session, where=where, include_deleted=include_deleted)
+            )
+        else:
+            statement, params = self.filter_statement(
+                select(func.count(self.model.id)), where=where, include_deleted=include_deleted
+            )
+            result = (await db.execute(statement, params)).scalar()
+        self.set_cached_count(cache_key, result)
+        return result
+
+    async def create(
+            self,
+            db: AsyncSession,
+            *,
+            obj_in: CreateSchemaType,
+            user_id: int = None,
+            commit: bool = True,
+            refresh: bool = True,
+    ) -> ModelType:
+        obj_in_data = obj_in.dict()
+        db_obj = (
+            self.model(**obj_in_data)
+            if not user_id
+            else self.model(**obj_in_data, last_user_to_interact=user_id)
+        )  # type: ignore
+        db.add(db_obj)
+        if commit:
+            await db.commit()
+        if refresh:
+            await db.refresh(db_obj)
+        return db_obj
+
+    async def create_bulk(
+            self,
+            db: AsyncSession,
+            *,
+            objs_in: List[Union[CreateSchemaType, Dict[str, Any]]],
+            upsert: bool = False,
+            chunk_size: int = None,
+            user_id: int = None,
+            commit: bool = True,
+    ) -> List[Optional[int]]:
+        dialect = db.sync_session.get_bind().dialect
+        ids = [None] * len(objs_in)
+        for indices, rows in self.get_bulk_chunks(dialect, objs_in, chunk_size=chunk_size, user_id=user_id):
+            statement, params = self.get_bulk_insert(dialect, rows, upsert=upsert)
+            result = await db.execute(statement, params)
+            for index, id in zip(indices, self.get_bulk_ids(dialect, result, rows, upsert=upsert)):
+                ids[index] = id
+        if commit:
+            await db.commit()
+        if upsert:
+            self.invalidate_caches()
+        return ids
+
+    async def update(
+            self,
+            db: AsyncSession,
+            *,
+            db_obj: ModelType,
+            obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+            user_id: int = None,
+            commit: bool = True,
+            current_user=None,
+            refresh: bool = False,
+    ) -> ModelType:
+        self.set_update_values(db_obj, self.get_update_values(db_obj, obj_in, current_user))
+        db.add(db_obj)
+        if commit:
+            try:
+                await db.commit()
+            except StaleDataError:
+                await db.rollback()
+                raise HTTPException(status_code=409, detail=f"{self.model.__name__} was modified since it was read")
+            if refresh:
+                await db.refresh(db_obj)
+        return db_obj
+
+    async def remove(self, db: AsyncSession, *, id: int, commit: bool = True) -> ModelType:
+        obj = await db.get(self.model, id)
+        await db.delete(obj)
+        if commit:
+            await db.commit()
+        return obj
+
+    async def soft_delete_where(
+            self,
+            db: AsyncSession,
+            *,
+            where: Any = None,
+            ids: List[int] = None,
+            user_id: int = None,
+            commit: bool = True,
+    ) -> Tuple[int, List[int]]:
+        statement = self.get_set_statement(
+            update(self.model).where(self.get_deleted_at().is_(None)), where=where, ids=ids
+        )
+        values = {"deleted_at": func.now(), **self.get_version_bump()}
+        if user_id and "last_user_to_interact" in self.model.__table__.columns:
+            values["last_user_to_interact"] = user_id
+        return await self.execute_set_statement(db, statement.values(values), where=where, commit=commit)
+
+    async def restore_where(
+            self,
+            db: AsyncSession,
+            *,
+            where: Any = None,
+            ids: List[int] = None,
+            user_id: int = None,
+            commit: bool = True,
+    ) -> Tuple[int, List[int]]:
+        statement = self.get_set_statement(
+            update(self.model).where(self.get_deleted_at().isnot(None)), where=where, ids=ids
+        )
+        values = {"deleted_at": None, **self.get_version_bump()}
+        if user_id and "last_user_to_interact" in self.model.__table__.columns:
+            values["last_user_to_interact"] = user_id
+        return await self.execute_set_statement(db, statement.values(values), where=where, commit=commit)
+
+    async def remove_where(
+            self, db: AsyncSession, *, where: Any = None, ids: List[int] = None, commit: bool = True
+    ) -> Tuple[int, List[int]]:
+        statement = self.get_set_statement(delete(self.model), where=where, ids=ids)
+        return await self.execute_set_statement(db, statement, where=where, commit=commit)
+
+    async def execute_set_statement(
+            self, db: AsyncSession, statement, *, where: Any = None, commit: bool = True
+    ) -> Tuple[int, List[int]]:
+        _, params = self.get_compiled_condition(where=where, include_deleted=True)
+        returning = self.get_set_returning(db.sync_session, statement)
+        if returning is not None:
+            ids = list((await db.execute(returning, params)).scalars())
+            count = len(ids)
+        else:
+            ids = []
+            count = (await db.execute(statement, params)).rowcount
+        if commit:
+            await db.commit()
+        self.invalidate_caches()
+        return count, ids
@@ -1,22 +1,60 @@
 import ast
+import base64
+import itertools
 import json
-from datetime import datetime, timedelta, date
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, date, time as dt_time
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Generic, List, Optional, Tuple, Type, TypeVar, Union
+from uuid import UUID
 import re
 import regex
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy import and_, asc, delete, desc, extract, func, inspect, or_, case
+from sqlalchemy import Column, and_, asc, bindparam, delete, desc, extract, func, insert, inspect, or_, case, text, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.orm import (
     Session,
     joinedload,
     load_only,
+    raiseload,
+    selectinload,
+    subqueryload,
 )
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.interfaces import MANYTOONE
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core import cache
 from app.core.config import settings
+from app.crud.operators import get_operator
 from app.db.base_class import Base
 from app.models import User
 
+# Parsed where keys kept per CRUD object
+KEY_PARTS_CACHE_SIZE = 4096
+
+COUNT_MODES = ("exact", "estimate", "none")
+
+# Relation loading strategies accepted after a ":" in a relations path
+LOAD_STRATEGIES = {"selectin": selectinload, "subquery": subqueryload, "joined": joinedload, "raise": raiseload}
+
+# Order values a cursor carries as a string, (name, type, encode, decode). datetime is before
+# date, of which it is a subclass
+CURSOR_VALUE_TYPES = (
+    ("datetime", datetime, datetime.isoformat, datetime.fromisoformat),
+    ("date", date, date.isoformat, date.fromisoformat),
+    ("time", dt_time, dt_time.isoformat, dt_time.fromisoformat),
+    ("decimal", Decimal, str, Decimal),
+    ("uuid", UUID, str, UUID),
+)
+
+# Dialects with an INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE construct
+UPSERT_INSERTS = {"mysql": mysql.insert, "postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
@@ -33,6 +71,30 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         * `schema`: A Pydantic model (schema) class
         """
         self.model = model
+        self._key_parts_cache = {}
+        self._where_cache = OrderedDict()
+        self._count_cache = OrderedDict()
+        self._where_cache_lock = threading.Lock()
+        self._column_keys = None
+        self._version_key = None
+        self._load_options_cache = {}
+
+    @property
+    def column_keys(self) -> frozenset:
+        """Attribute names of the table columns of the model, read once from the mapper."""
+        if self._column_keys is None:
+            mapper = inspect(self.model)
+            self._column_keys = frozenset(
+                attribute.key for attribute in mapper.column_attrs if isinstance(attribute.expression, Column)
+            )
+            if mapper.version_id_col is not None:
+                self._version_key = mapper.get_property_by_column(mapper.version_id_col).key
+        return self._column_keys
+
+    @property
+    def version_key(self) -> Optional[str]:
+        """Attribute of the optimistic concurrency version column (`version_id_col`), if any."""
+        return self._version_key if self.column_keys else None
 
     def get(
             self,
@@ -42,27 +104,19 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             relations=None,
             current_user=None,
             include_deleted=False,
+            base_columns=None,
     ) -> Optional[ModelType]:
         query = db.query(self.model).filter(self.model.id == id)
 
         if where is not None and where != "":
             where = ast.literal_eval(where)
-            conditions = self.get_full_condition(
-                db=db,
-                where=where,
-                current_user=current_user,
-                include_deleted=include_deleted,
-            )
-            if conditions is not None:
-                query = query.filter(conditions)
-
-        if relations is not None and len(relations) > 0:
-            query = query.options(*(self.get_all_relations(relations)))
+            query = self.filter_where(query, where=where, include_deleted=include_deleted)
 
+        query = self.apply_load_options(query, base_columns=base_columns, relations=relations)
         return query.first()
 
     def get_all_relations(self, relations: List):
-        return [self.get_joined_load(x) for x in relations]
+        return self.get_joined_load_v2(relations)
 
     def get_joined_load(self, relations):
         def process_relation(relation):
@@ -103,7 +157,77 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
         return options
 
+    def get_joined_load_v2(self, relations: List[str]) -> List[Any]:
+        """
+        Loader options for a list of relation paths, e.g.
+        `["client", "lines{id,label}:selectin.product:joined", "invoices:raise"]`.
+
+        Each segment of a path is `relation[{columns}][:strategy]`: only `columns` are loaded
+        when given (all of them otherwise) and `strategy` is one of `LOAD_STRATEGIES`. Without
+        a strategy, many-to-one relations are joined and collections are loaded with selectin,
+        so that several collections don't multiply the rows of the main query.
+        Options are built once per list of paths.
+        """
+        key = tuple(relations)
+        options = self._load_options_cache.get(key)
+        if options is None:
+            options = [self.get_relation_load(path) for path in relations]
+            if len(self._load_options_cache) >= KEY_PARTS_CACHE_SIZE:
+                self._load_options_cache.clear()
+            self._load_options_cache[key] = options
+        return options
+
+    def get_relation_load(self, path: str):
+        parts = path.split(".")
+        previous_model = self.model
+        result = None
+        for i, part in enumerate(parts):
+            part, _, strategy = part.partition(":")
+            if "{" in part and part.endswith("}"):
+                relationship, columns = part[:-1].split("{")
+                columns = [column.strip() for column in columns.split(",")]
+            else:
+                relationship, columns = part, []
+            prop = inspect(previous_model).relationships.get(relationship)
+            if prop is None:
+                raise HTTPException(status_code=400, detail=f"Unknown relation {relationship} in {path}")
+            if not strategy:
+                strategy = "joined" if prop.direction is MANYTOONE else "selectin"
+            if strategy not in LOAD_STRATEGIES:
+                raise HTTPException(status_code=400, detail=f"Unknown loading strategy {strategy} in {path}")
+            if strategy == "raise" and i < len(parts) - 1:
+                raise HTTPException(status_code=400, detail=f"Nothing can be loaded after a raise in {path}")
+
+            attr = getattr(previous_model, relationship)
+            if result is None:
+                result = LOAD_STRATEGIES[strategy](attr)
+            else:
+                result = getattr(result, LOAD_STRATEGIES[strategy].__name__)(attr)
+            if columns and strategy != "raise":
+                unknown = [column for column in columns if column not in inspect(prop.mapper.class_).column_attrs]
+                if unknown:
+                    raise HTTPException(status_code=400, detail=f"Unknown columns {unknown} in {path}")
+                result = result.load_only(*(getattr(prop.mapper.class_, column) for column in columns))
+            previous_model = prop.mapper.class_
+        return result
+
     def get_key_parts(self, key):
+        """Parse a where key once, e.g. "rel.[a,b.c]" -> ("rel", (("a",), ("b", "c")))."""
+        parts = self._key_parts_cache.get(key)
+        if parts is None:
+            parts = self._freeze_key_parts(self.parse_key_parts(key))
+            if len(self._key_parts_cache) >= KEY_PARTS_CACHE_SIZE:
+                self._key_parts_cache.clear()
+            self._key_parts_cache[key] = parts
+        return parts
+
+    def _freeze_key_parts(self, parts):
+        return tuple(
+            tuple(self._freeze_key_parts(sub) for sub in part) if isinstance(part, list) else part
+            for part in parts
+        )
+
+    def parse_key_parts(self, key):
         # print(key)
         subpart_start_idx = key.find(".[")
         last_index_of_parts1 = len(key)
@@ -119,7 +243,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             all_sub_parts = []
 
             for i in range(0, len(subpart_keys)):
-                subpart = self.get_key_parts(regex.sub(";", ",", subpart_keys[i]))
+                subpart = self.parse_key_parts(regex.sub(";", ",", subpart_keys[i]))
                 # if len(subpart) == 1:
                 #     subpart = subpart[0]
                 all_sub_parts.append(subpart)
@@ -152,29 +276,35 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         return cond
 
     def get_condition_deep_multiple(self, db, condition, current_user=None):
+        return self.build_condition_plan(self.parse_condition(condition))
+
+    def sub_get_condition_deep_multiple(self, db, condition, current_user=None):
+        return self.build_sub_condition_plan(self.parse_sub_condition(condition))
+
+    def parse_condition(self, condition):
         key = condition.get("key", None)
         value = condition.get("value", None)
         operator = condition.get("operator", None)
         # key, value, operator must be an array and with same length
-        cond_arr_sql = []
         if isinstance(key, list):
+            sub_conditions = []
             for i in range(len(key)):
                 current_cond = {
                     "key": key[i],
                     "operator": operator[i],
                     "value": value[i] if value else None,
                 }
-                cond_sql = self.sub_get_condition_deep_multiple(
-                    db=db, condition=current_cond, current_user=current_user
-                )
-                cond_arr_sql.append(cond_sql)
-            return or_(*cond_arr_sql)
-        else:
-            return self.sub_get_condition_deep_multiple(
-                db=db, condition=condition, current_user=current_user
-            )
+                sub_conditions.append(self.parse_sub_condition(current_cond))
+            return True, sub_conditions
+        return False, [self.parse_sub_condition(condition)]
 
-    def sub_get_condition_deep_multiple(self, db, condition, current_user=None):
+    def parse_sub_condition(self, condition):
+        """
+        Parse one condition into (keys, match, leaves), one leaf per filtered column.
+
+        A leaf is (operator, variant, params, args): `params` are the values bound to the
+        query and `variant` what else changes the SQL (e.g. comparing to None).
+        """
         keys = self.get_key_parts(condition["key"])
         # print(keys)
         operators = condition["operator"].split(",")
@@ -185,11 +315,49 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                 values = json.loads(values[0])
             else:
                 values = str(values[0]).split(",")
+
+        leaves = []
+        for idx, leaf_key in enumerate(self._leaf_keys(keys)):
+            operator = operators[idx]
+            value = values[idx]
+            args = ()
+            if leaf_key.startswith("@"):
+                args = tuple(value["args"])
+                value = value["operator_value"]
+            variant, params = self.prepare_operator_value(operator, value)
+            leaves.append((operator, variant, params, args))
+        return keys, match, leaves
+
+    def _leaf_keys(self, keys):
+        """Leaf columns of parsed keys, in the order `get_attrs` consumes the values."""
+        if not keys:
+            return
+        last = keys[-1]
+        if isinstance(last, str):
+            yield last
+        else:
+            for sub_keys in last:
+                yield from self._leaf_keys(sub_keys)
+
+    def build_condition_plan(self, plan, bind=None):
+        is_multiple, sub_plans = plan
+        conditions = [self.build_sub_condition_plan(sub_plan, bind) for sub_plan in sub_plans]
+        if is_multiple:
+            return or_(*conditions)
+        return conditions[0]
+
+    def build_sub_condition_plan(self, sub_plan, bind=None):
+        keys, match, leaves = sub_plan
+        if bind is not None:
+            leaves = [
+                (operator, variant, tuple(bind(param) for param in params), args)
+                for operator, variant, params, args in leaves
+            ]
         condition_operator = or_ if match == "or" else and_
         current_idx = {"value": 0}
-        attrs = self.get_attrs(self.model, current_idx, keys, operators, values)
-        cond = self.get_cond_reccur(attrs=attrs, condition_operator=condition_operator)
-        return cond
+        operators = [leaf[0] for leaf in leaves]
+        attrs = self.get_attrs(self.model, current_idx, keys, operators, leaves)
+        return self.get_cond_reccur(attrs=attrs, condition_operator=condition_operator)
 
     def getStringDateTimeFormat(self, date_string):
         if len(date_string.split(" ")) >= 2:
@@ -199,7 +367,22 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             formatted_string = parsed_date.strftime("%Y-%m-%d %H:%M")
         return formatted_string
 
+    def prepare_operator_value(self, operator, value):
+        """Return (variant, params) of a filter value, see `parse_sub_condition`."""
+        filter_operator = get_operator(operator)
+        if filter_operator is None:
+            return "unknown", ()
+        return filter_operator.prepare(value)
+
+    def build_operator_condition(self, attribute, operator, variant, params):
+        """Build the SQL condition of one leaf from the output of `prepare_operator_value`."""
+        filter_operator = get_operator(operator)
+        if filter_operator is None:
+            return None
+        return filter_operator.build(attribute, operator, variant, params)
+
     def get_attrs(self, parent_model, current_idx, keys, operators, values):
+        """`values` are the leaves of `parse_sub_condition`, consumed in key order."""
         previous_model = parent_model
         attrs = []
         for i in range(0, len(keys)):
@@ -216,118 +399,17 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                 if isinstance(keys[i], str):
                     idx = current_idx["value"]
                     operator = operators[idx]
-                    value = values[idx]
-                    filter_condition = None
+                    _, variant, params, args = values[idx]
 
                     attribute = None
                     if keys[i].startswith("@"):
                         method_name = keys[i]
-                        args = value["args"]
-                        value = value["operator_value"]
                         method = getattr(previous_model, method_name.replace("@", ""))
                         attribute = method(*args)
                     else:
                         attribute = getattr(previous_model, keys[i])
 
-                    if operator == "==":
-                        filter_condition = attribute == value
-                    elif operator == "!=":
-                        filter_condition = attribute != value
-                    elif operator == ">":
-                        filter_condition = attribute > value
-                    elif operator == "<":
-                        filter_condition = attribute < value
-                    elif operator == "like":
-                        filter_condition = attribute.like("%" + value + "%")
-                    elif operator == "month":
-                        if value is None:
-                            filter_condition = extract("month", attribute).is_(None)
-                        else:
-                            filter_condition = extract("month", attribute) == value
-                    elif operator == "date":
-                        date_value = datetime.strptime(value, "%Y-%m-%d").date()
-                        filter_condition = func.date(attribute) == date_value
-                    # elif operator == "last_24h":
-                    #     twenty_four_hours_ago = datetime.now() - timedelta(hours=24)
-                    #     filter_condition = (
-                    #         getattr(previous_model,
-                    #                 keys[i]) >= twenty_four_hours_ago
-                    #     )
-                    elif operator == "last_24h":
-                        now = datetime.now()
-                        twenty_four_hours_ago = now - timedelta(hours=24)
-
-                        filter_condition = attribute.between(twenty_four_hours_ago, now)
-                        print(
-                            "HERE IT IS: ", now, twenty_four_hours_ago, filter_condition
-                        )
-
-                    elif operator == "between_date":
-                        date_split = value.split(",")
-                        date_1 = datetime.strptime(
-                            self.getStringDateTimeFormat(date_split[0]),
-                            "%Y-%m-%d %H:%M",
-                        ).date()
-                        date_2 = datetime.strptime(
-                            self.getStringDateTimeFormat(date_split[1]),
-                            "%Y-%m-%d %H:%M",
-                        ).date()
-                        filter_condition = attribute.between(date_1, date_2)
-                    elif operator == "year":
-                        if value is None:
-                            filter_condition = extract("year", attribute).is_(None)
-                        else:
-                            filter_condition = extract("year", attribute) == value
-                    elif operator == "lower_or_equal_year":
-                        if value is None:
-                            filter_condition = extract("year", attribute).is_(None)
-                        else:
-                            filter_condition = extract("year", attribute) <= value
-                    elif operator == "greater_or_equal_year":
-                        if value is None:
-                            filter_condition = extract("year", attribute).is_(None)
-                        else:
-                            filter_condition = extract("year", attribute) >= value
-                    elif operator == "week":
-                        if value is None:
-                            filter_condition = extract("week", attribute).is_(None)
-                        else:
-                            filter_condition = extract("week", attribute) == value
-                    elif operator == "isNull":
-                        filter_condition = attribute.is_(None)
-                    elif operator == "isNotNull":
-                        filter_condition = attribute.isnot(None)
-                    elif operator == "isTrue":
-                        filter_condition = attribute.is_(True)
-                    elif operator == "isFalse":
-                        filter_condition = attribute.is_(False)
-                    elif operator == "notIn":
-                        filter_condition = attribute.notin_(value)
-                    elif operator == "in":
-                        filter_condition = attribute.in_(value)
-                    elif operator == "in_date_range":
-                        filter_condition = self.get_date_filter_by_range(
-                            date_column=attribute, date_list=value
-                        )
-                    elif operator.startswith("json."):
-                        json_key = "$." + operator.split(".")[1]
-                        col_value = func.json_extract(
-                            func.json_unquote(attribute), json_key
-                        )
-                        if value == "isNull":
-                            filter_condition = or_(
-                                col_value.is_(None),
-                                col_value.is_(False),
-                                col_value.like("false"),
-                            )
-                        elif value == "isNotNull":
-                            filter_condition = col_value.isnot(None)
-                        else:
-                            filter_condition = col_value.like(value)
-                    elif operator == "ratio":
-                        filter_condition = func.levenshtein_ratio(
-                            func.upper(attribute), func.upper(value[0])
-                        ) > (value[1] / 100)
+                    filter_condition = self.build_operator_condition(attribute, operator, variant, params)
                     idx += 1
                     current_idx["value"] = idx
                     attrs.append((filter_condition, False))
@@ -379,66 +461,244 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             order_by_subquery=None,
             today_first: bool = False,
     ) -> List[ModelType]:
-        query = db.query(self.model)
-        conditions = self.get_full_condition(
-            db=db,
+        query = self.get_multi_query(
+            db,
+            order_by=order_by,
+            where=where,
+            order=order,
+            include_deleted=include_deleted,
+            order_by_subquery=order_by_subquery,
+            today_first=today_first,
+        )
+        query = query.offset(skip).limit(limit)
+        query = self.apply_load_options(query, base_columns=base_columns, relations=relations)
+
+        result = query.all()
+        return result
+
+    def get_page_where_array(
+            self,
+            db: Session,
+            *,
+            skip: int = 0,
+            limit: int = 100,
+            cursor: Optional[str] = None,
+            order_by: str = "id",
+            where: Any = None,
+            order: str = "DESC",
+            base_columns=None,
+            relations=None,
+            include_deleted: bool = False,
+            count: str = "none",
+    ) -> Tuple[List[ModelType], Optional[str], Optional[int]]:
+        """
+        One page of results, the cursor of the next page (None on the last page) and
+        the total count in the given `count` mode (see `get_count_where_array`).
+
+        Without `cursor` the page starts at `skip`. With a `cursor` returned by a previous
+        call, `skip` is ignored and the page continues right after the last row of the
+        previous page with a seek predicate on (`order_by`, id) instead of an OFFSET,
+        so deep pages cost the same as the first one. `order_by` must be a column of the model.
+
+        An exact count of an offset page is read from a COUNT(*) OVER() column of the page
+        query instead of a second query.
+        """
+        self.check_count_mode(count)
+        if "." in order_by:
+            raise HTTPException(status_code=400, detail="Cursor pagination needs a column of the model as order_by")
+        query = self.get_multi_query(
+            db,
+            order_by=order_by,
+            where=where,
+            order=order,
+            include_deleted=include_deleted,
+        )
+        if cursor is not None:
+            query = query.filter(self.get_seek_condition(self.decode_cursor(cursor, order_by, order), order_by, order))
+        else:
+            query = query.offset(skip)
+        if base_columns is not None and len(base_columns) > 0:
+            # The cursor is built from these two
+            base_columns = list(base_columns) + [getattr(self.model, order_by), self.model.id]
+        query = self.apply_load_options(query.limit(limit + 1), base_columns=base_columns, relations=relations)
+
+        total = None
+        count_in_page = count == "exact" and cursor is None
+        if count_in_page:
+            query = query.add_columns(func.count().over().label("total_count"))
+
+        result = query.all()
+        if count_in_page:
+            if result:
+                total = result[0][1]
+            result = [row[0] for row in result]
+        if total is None and count != "none":
+            # Cursor pages and pages past the end can't see the total
+            total = self.get_count_where_array(db, where=where, include_deleted=include_deleted, mode=count)
+
+        next_cursor = None
+        if len(result) > limit:
+            result = result[:limit]
+            next_cursor = self.encode_cursor(result[-1], order_by, order)
+        return result, next_cursor, total
+
+    def stream_where_array(
+            self,
+            db: Session,
+            *,
+            order_by: str = "id",
+            where: Any = None,
+            order: str = "DESC",
+            include_deleted: bool = False,
+            columns: Optional[List[str]] = None,
+            chunk_size: int = 1000,
+    ):
+        """
+        Iterate over the values of `columns` (default: every column) of every matching row, as dicts.
+
+        Rows are fetched `chunk_size` at a time through a server side cursor and no ORM
+        object is built, so memory does not grow with the number of rows. `db` must stay
+        open until the iteration ends.
+        """
+        query = self.get_multi_query(
+            db,
+            order_by=order_by,
             where=where,
-            current_user=current_user,
+            order=order,
             include_deleted=include_deleted,
         )
-        if conditions is not None:
-            query = query.filter(conditions)
+        table_columns = self.model.__table__.columns
+        entities = [table_columns[column] for column in columns] if columns is not None else list(table_columns)
+        query = query.with_entities(*entities).yield_per(chunk_size)
+        for row in query:
+            yield row._asdict()
 
+    def get_multi_query(
+            self,
+            db: Session,
+            *,
+            order_by: str = "id",
+            where: Any = None,
+            order: str = "DESC",
+            include_deleted: bool = False,
+            order_by_subquery=None,
+            today_first: bool = False,
+    ):
+        """Filtered query ordered by `order_by` then id DESC, shared by the list methods."""
+        query = db.query(self.model)
+        query = self.filter_where(query, where=where, include_deleted=include_deleted)
+        order_by_clauses = self.get_order_by_clauses(
+            db,
+            order_by=order_by,
+            order=order,
+            order_by_subquery=order_by_subquery,
+            today_first=today_first,
+        )
+        return query.order_by(*order_by_clauses)
+
+    def get_order_by_clauses(
+            self,
+            db: Session,
+            *,
+            order_by: str = "id",
+            order: str = "DESC",
+            order_by_subquery=None,
+            today_first: bool = False,
+    ) -> List[Any]:
+        """ORDER BY clauses of the list methods. `db` is only used to build relation subqueries."""
         order_function = asc
         if order == "DESC":
             order_function = desc
 
+        clauses = []
         if order_by_subquery is not None:
-            query = query.order_by(order_function(order_by_subquery))
+            clauses.append(order_function(order_by_subquery))
         else:
             today = date.today()
             if len(order_by.split(".")) > 1:
-                if today_first:
-                    order_by_subquery = self.get_order_by_subquery(
-                        db=db, order_by_key=order_by
-                    )
-                    query = query.order_by(
-                        case([(func.date(order_by_subquery) == today, 0)], else_=1),
-                        order_function(order_by_subquery),
-                    )
-                else:
-                    order_by_subquery = self.get_order_by_subquery(
-                        db=db, order_by_key=order_by
-                    )
-                    query = query.order_by(order_function(order_by_subquery))
+                order_by_attribute = self.get_order_by_subquery(
+                    db=db, order_by_key=order_by
+                )
             else:
-                if today_first:
-                    order_by_attribute = getattr(self.model, order_by)
+                order_by_attribute = getattr(self.model, order_by)
+            if today_first:
+                clauses.append(case([(func.date(order_by_attribute) == today, 0)], else_=1))
+            clauses.append(order_function(order_by_attribute))
 
-                    query = query.order_by(
-                        case([(func.date(order_by_attribute) == today, 0)], else_=1),
-                        order_function(order_by_attribute),
-                    )
-                else:
-                    order_by_attribute = getattr(self.model, order_by)
-                    query = query.order_by(order_function(order_by_attribute))
+        clauses.append(desc(getattr(self.model, "id")))
+        return clauses
 
-        query = (
-            query.order_by(
-                desc(getattr(self.model, "id")),
-            )
-            .offset(skip)
-            .limit(limit)
-        )
+    def apply_load_options(self, query, base_columns=None, relations=None):
         if base_columns is not None and len(base_columns) > 0:
-            query = query.options(load_only(*base_columns))
+            columns = [
+                getattr(self.model, column) if isinstance(column, str) else column for column in base_columns
+            ]
+            query = query.options(load_only(*columns))
 
         if relations is not None and len(relations) > 0:
             load_options = self.get_joined_load_v2(relations)
             query = query.options(*load_options)
+        return query
+
+    def encode_cursor(self, db_obj: ModelType, order_by: str, order: str) -> str:
+        """Opaque cursor pointing right after `db_obj` in a list ordered by (`order_by`, id)."""
+        value = getattr(db_obj, order_by)
+        value_type = None
+        for name, type_, encode, _ in CURSOR_VALUE_TYPES:
+            if isinstance(value, type_):
+                value, value_type = encode(value), name
+                break
+        payload = {
+            "k": order_by,
+            "o": order,
+            "v": value,
+            "t": value_type,
+            "id": db_obj.id,
+        }
+        try:
+            content = json.dumps(payload, separators=(",", ":"))
+        except TypeError:
+            raise HTTPException(status_code=400, detail=f"Can't page with a cursor when ordering by {order_by}")
+        return base64.urlsafe_b64encode(content.encode()).decode()
+
+    def decode_cursor(self, cursor: str, order_by: str, order: str) -> Tuple[Any, int]:
+        """Return the (order value, id) of a cursor, 400 if it is invalid or made for another ordering."""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            value = payload["v"]
+            if payload["t"] is not None:
+                decode = next(decode for name, _, _, decode in CURSOR_VALUE_TYPES if name == payload["t"])
+                value = decode(value)
+            last_id = int(payload["id"])
+        except (ValueError, TypeError, KeyError, StopIteration, InvalidOperation):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if payload["k"] != order_by or payload["o"] != order:
+            raise HTTPException(status_code=400, detail="Cursor was made for another order_by or order")
+        return value, last_id
+
+    def get_seek_condition(self, position: Tuple[Any, int], order_by: str, order: str):
+        """
+        Rows after `position` in the order of `get_multi_query`: `order_by` in `order`, then id DESC.
 
-        result = query.all()
-        return result
+        NULLs sort first as in MySQL, so they come last with DESC and first with ASC.
+        """
+        value, last_id = position
+        id_column = self.model.id
+        if order_by == "id":
+            return id_column < last_id if order == "DESC" else id_column > last_id
+
+        column = getattr(self.model, order_by)
+        if order == "DESC":
+            if value is None:
+                return and_(column.is_(None), id_column < last_id)
+            return or_(
+                column < value,
+                column.is_(None),
+                and_(column == value, id_column < last_id),
+            )
+        if value is None:
+            return or_(column.isnot(None), and_(column.is_(None), id_column < last_id))
+        return or_(column > value, and_(column == value, id_column < last_id))
 
     def get_order_by_subquery(self, db: Session, *, order_by_key):
         key_segments = order_by_key.split(".")
@@ -488,7 +748,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             commit: bool = True,
             refresh: bool = True,
     ) -> ModelType:
-        obj_in_data = jsonable_encoder(obj_in)
+        obj_in_data = obj_in.dict()
         db_obj = (
             self.model(**obj_in_data)
             if not user_id
@@ -512,7 +772,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     ) -> List[ModelType]:
         objs_to_add = []
         for obj_in in objs_in:
-            obj_in_data = jsonable_encoder(obj_in)
+            obj_in_data = obj_in.dict()
             db_obj = (
                 self.model(**obj_in_data)
                 if not user_id
@@ -524,6 +784,123 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             db.commit()
         return objs_to_add
 
+    def create_bulk(
+            self,
+            db: Session,
+            *,
+            objs_in: List[Union[CreateSchemaType, Dict[str, Any]]],
+            upsert: bool = False,
+            chunk_size: int = None,
+            user_id: int = None,
+            commit: bool = True,
+    ) -> List[Optional[int]]:
+        """
+        Insert `objs_in` with multi-row `INSERT ... VALUES` statements, all in one transaction,
+        without building ORM objects. A statement has at most `chunk_size` rows
+        (`settings.BULK_CHUNK_SIZE` by default), fewer when rows x columns would exceed the bind
+        parameter limit of the driver.
+
+        With `upsert`, a row whose id already exists is updated with the fields that were set
+        (`ON DUPLICATE KEY UPDATE` on MySQL, `ON CONFLICT (id) DO UPDATE` on PostgreSQL/SQLite).
+
+        Return the ids of the rows in the order of `objs_in`, see `get_bulk_ids`.
+        """
+        dialect = db.get_bind().dialect
+        ids = [None] * len(objs_in)
+        for indices, rows in self.get_bulk_chunks(dialect, objs_in, chunk_size=chunk_size, user_id=user_id):
+            statement, params = self.get_bulk_insert(dialect, rows, upsert=upsert)
+            result = db.execute(statement, params)
+            for index, id in zip(indices, self.get_bulk_ids(dialect, result, rows, upsert=upsert)):
+                ids[index] = id
+        if commit:
+            db.commit()
+        if upsert:
+            self.invalidate_caches()
+        return ids
+
+    def get_bulk_chunk_size(self, dialect, columns: int, chunk_size: int = None) -> int:
+        """Rows per statement: `chunk_size`, capped so that rows x columns fits the bind parameter limit."""
+        chunk_size = chunk_size or settings.BULK_CHUNK_SIZE
+        return max(1, min(chunk_size, dialect.insertmanyvalues_max_parameters // max(1, columns)))
+
+    def get_bulk_chunks(
+            self, dialect, objs_in: List[Any], chunk_size: int = None, user_id: int = None
+    ) -> List[Tuple[List[int], List[dict]]]:
+        """
+        Group the rows to insert by the set of columns they have (a multi-row VALUES needs the
+        same columns in every row) and split the groups in chunks. Return [(indices, rows)].
+        """
+        columns = self.model.__table__.columns
+        groups = {}
+        for index, obj_in in enumerate(objs_in):
+            data = obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
+            row = {key: value for key, value in data.items() if key in columns}
+            if row.get("id") is None:
+                row.pop("id", None)
+            if user_id and "last_user_to_interact" in columns:
+                row["last_user_to_interact"] = user_id
+            groups.setdefault(tuple(sorted(row)), []).append((index, row))
+        chunks = []
+        for keys, group in groups.items():
+            size = self.get_bulk_chunk_size(dialect, len(keys), chunk_size)
+            for start in range(0, len(group), size):
+                chunk = group[start:start + size]
+                chunks.append(([index for index, _ in chunk], [row for _, row in chunk]))
+        return chunks
+
+    def get_bulk_insert(self, dialect, rows: List[dict], upsert: bool = False) -> Tuple[Any, Optional[List[dict]]]:
+        """
+        The statement inserting `rows` and its parameters.
+
+        When the database can return the ids of an executemany in the order of its parameters
+        (PostgreSQL, SQLite), the rows are passed as parameters: SQLAlchemy renders them as
+        multi-row VALUES and matches the RETURNING rows to them. Elsewhere the rows are the
+        VALUES of the statement and the ids are read by `get_bulk_ids`.
+        """
+        table = self.model.__table__
+        if not upsert:
+            statement = insert(table)
+        elif dialect.name not in UPSERT_INSERTS:
+            raise HTTPException(status_code=400, detail=f"Bulk upsert is not supported on {dialect.name}")
+        else:
+            statement = UPSERT_INSERTS[dialect.name](table)
+            updated = [key for key in rows[0] if key not in ("id", "created_at")]
+            if dialect.name == "mysql":
+                values = {key: statement.inserted[key] for key in updated}
+            else:
+                values = {key: statement.excluded[key] for key in updated}
+            if "updated_at" in table.columns:
+                values["updated_at"] = func.now()
+            values.update(self.get_version_bump())
+            if not values:
+                # Only ids were given: existing rows are left as they are
+                values = {"id": table.c.id}
+            if dialect.name == "mysql":
+                statement = statement.on_duplicate_key_update(values)
+            else:
+                statement = statement.on_conflict_do_update(index_elements=[table.c.id], set_=values)
+        if dialect.insert_executemany_returning_sort_by_parameter_order:
+            return statement.returning(table.c.id, sort_by_parameter_order=True), rows
+        statement = statement.values(rows)
+        if dialect.insert_returning:
+            statement = statement.returning(table.c.id)
+        return statement, None
+
+    def get_bulk_ids(self, dialect, result, rows: List[dict], upsert: bool = False) -> List[Optional[int]]:
+        """
+        Ids of the rows of a bulk insert: from RETURNING when the database has it (PostgreSQL,
+        SQLite, MariaDB), else the ids given in the rows, else the consecutive ids following
+        `lastrowid` (MySQL with `innodb_autoinc_lock_mode` 0 or 1, or no concurrent inserts).
+        Without RETURNING, the ids of upserted rows given without id are unknown (None).
+        """
+        if dialect.insert_returning:
+            return list(result.scalars())
+        if "id" in rows[0]:
+            return [row["id"] for row in rows]
+        if upsert:
+            return [None] * len(rows)
+        return list(range(result.lastrowid, result.lastrowid + len(rows)))
+
     def add_model(
             self,
             db: Session,
@@ -549,35 +926,84 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             user_id: int = None,
             commit: bool = True,
             current_user: User = None,
+            refresh: bool = False,
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
-        if "created_at" in jsonable_encoder(obj_in):
-            if current_user:
-                if current_user.role.name not in settings.ROLES_ACCESS_CREATED_AT:
-                    obj_in.created_at = db_obj.created_at
-            else:
-                obj_in.created_at = db_obj.created_at
+        """
+        Write the fields set in `obj_in` that changed, as a partial `UPDATE ... WHERE id = ?`.
+        The object is not read back after the commit unless `refresh` is set.
+        """
+        self.set_update_values(db_obj, self.get_update_values(db_obj, obj_in, current_user))
+        db.add(db_obj)
+        if commit:
+            self.commit_update(db)
+            if refresh:
+                db.refresh(db_obj)
+        return db_obj
+
+    def get_version_bump(self) -> Dict[str, Any]:
+        """SET clause incrementing the version column, for UPDATEs that bypass the ORM unit of work."""
+        if not self.version_key:
+            return {}
+        version_column = inspect(self.model).version_id_col
+        return {version_column.name: version_column + 1}
+
+    def get_update_values(
+            self,
+            db_obj: ModelType,
+            obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+            current_user: User = None,
+    ) -> Dict[str, Any]:
+        """
+        Values to set on `db_obj`: the columns set in `obj_in` whose value changed, plus
+        updated_at. created_at is only kept for the roles of `settings.ROLES_ACCESS_CREATED_AT`.
+        On a versioned model, a version in `obj_in` that is not the one of `db_obj` is a 409.
+
+        updated_at is computed here rather than with NOW() in the UPDATE: a SQL expression leaves
+        the attribute expired after the commit, and reading it selects the row again (lazy IO
+        that fails on an async session). It is local time to the second, like NOW() of MySQL.
+        """
         if isinstance(obj_in, dict):
-            update_data = obj_in
+            update_data = dict(obj_in)
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        update_data = (
-            {
-                **update_data,
-                "updated_at": func.now(),
-            }
-            if user_id
-            else {**update_data, "updated_at": func.now()}
-        )
-
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        db.add(db_obj)
-        if commit:
+        if "created_at" in update_data and (
+                not current_user or current_user.role.name not in settings.ROLES_ACCESS_CREATED_AT
+        ):
+            del update_data["created_at"]
+        column_keys = self.column_keys
+        if self.version_key:
+            version = update_data.pop(self.version_key, None)
+            if version is not None and version != getattr(db_obj, self.version_key):
+                raise HTTPException(status_code=409, detail=f"{self.model.__name__} was modified since it was read")
+        values = {
+            key: value for key, value in update_data.items()
+            if key in column_keys and getattr(db_obj, key) != value
+        }
+        if values and "updated_at" in column_keys:
+            values["updated_at"] = datetime.now().replace(microsecond=0)
+        return values
+
+    def set_update_values(self, db_obj: ModelType, values: Dict[str, Any]) -> None:
+        for key, value in values.items():
+            setattr(db_obj, key, value)
+        if "updated_at" in values:
+            # Written even when equal to the loaded value (same second), onupdate=NOW() would apply
+            flag_modified(db_obj, "updated_at")
+
+    def commit_update(self, db: Session):
+        """
+        Commit without expiring the loaded objects, so they are not selected again.
+        A versioned row changed by another transaction meanwhile is a 409.
+        """
+        expire_on_commit = db.expire_on_commit
+        db.expire_on_commit = False
+        try:
             db.commit()
-            db.refresh(db_obj)
-        return db_obj
+        except StaleDataError:
+            db.rollback()
+            raise HTTPException(status_code=409, detail=f"{self.model.__name__} was modified since it was read")
+        finally:
+            db.expire_on_commit = expire_on_commit
 
     def remove(self, db: Session, *, id: int, commit: bool = True) -> ModelType:
         obj = db.query(self.model).get(id)
@@ -624,19 +1050,14 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
     def bulk_remove(
             self, db: Session, *, ids_to_delete: str, commit: bool = True, keys: str = "id"
-    ) -> ModelType:
+    ) -> int:
         ids_to_select = [int(x) for x in ast.literal_eval(ids_to_delete)]
-        query = (
-            db.query(getattr(self.model, keys))
-            .filter(getattr(self.model, keys).in_(ids_to_select))
-            .all()
-        )
-        ids_found = [result[0] for result in query]
-        # to delete only the IDs that exist in the database
-        query = delete(self.model).where(getattr(self.model, keys).in_(ids_found))
-        db.execute(query)
+        # Missing ids simply match no row, a single DELETE is enough
+        query = delete(self.model).where(getattr(self.model, keys).in_(ids_to_select))
+        result = db.execute(query.execution_options(synchronize_session=False))
         if commit:
             db.commit()
+        return result.rowcount
 
     def soft_delete(
             self, db: Session, *, id: int, commit: bool = True, user_id: int = None
@@ -677,64 +1098,350 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             db.refresh(db_obj)
         return db_obj
 
+    def soft_delete_where(
+            self,
+            db: Session,
+            *,
+            where: Any = None,
+            ids: List[int] = None,
+            user_id: int = None,
+            commit: bool = True,
+    ) -> Tuple[int, List[int]]:
+        """
+        Soft delete the rows matching `where` and/or `ids` with a single
+        `UPDATE ... SET deleted_at = now()`, without loading them.
+        Return (count, ids), see `execute_set_statement` for the ids.
+        """
+        statement = self.get_set_statement(
+            update(self.model).where(self.get_deleted_at().is_(None)), where=where, ids=ids
+        )
+        values = {"deleted_at": func.now(), **self.get_version_bump()}
+        if user_id and "last_user_to_interact" in self.model.__table__.columns:
+            values["last_user_to_interact"] = user_id
+        return self.execute_set_statement(db, statement.values(values), where=where, commit=commit)
+
+    def restore_where(
+            self,
+            db: Session,
+            *,
+            where: Any = None,
+            ids: List[int] = None,
+            user_id: int = None,
+            commit: bool = True,
+    ) -> Tuple[int, List[int]]:
+        """Restore the soft deleted rows matching `where` and/or `ids` with a single UPDATE."""
+        statement = self.get_set_statement(
+            update(self.model).where(self.get_deleted_at().isnot(None)), where=where, ids=ids
+        )
+        values = {"deleted_at": None, **self.get_version_bump()}
+        if user_id and "last_user_to_interact" in self.model.__table__.columns:
+            values["last_user_to_interact"] = user_id
+        return self.execute_set_statement(db, statement.values(values), where=where, commit=commit)
+
+    def remove_where(
+            self, db: Session, *, where: Any = None, ids: List[int] = None, commit: bool = True
+    ) -> Tuple[int, List[int]]:
+        """Delete the rows matching `where` and/or `ids` (deleted or not) with a single DELETE."""
+        statement = self.get_set_statement(delete(self.model), where=where, ids=ids)
+        return self.execute_set_statement(db, statement, where=where, commit=commit)
+
+    def get_deleted_at(self):
+        if "deleted_at" not in self.model.__table__.columns:
+            raise HTTPException(status_code=400, detail=f"{self.model.__name__} has no deleted_at")
+        return self.model.deleted_at
+
+    def get_set_statement(self, statement, *, where: Any = None, ids: List[int] = None):
+        """
+        Restrict an UPDATE/DELETE to the rows matching `where` and/or `ids`, soft deleted
+        rows included. Refuse to run it on the whole table. The where params go to `execute`.
+        """
+        if not where and not ids:
+            raise HTTPException(status_code=400, detail="where or ids is required")
+        condition, _ = self.get_compiled_condition(where=where, include_deleted=True)
+        if condition is not None:
+            statement = statement.where(condition)
+        if ids:
+            statement = statement.where(self.model.id.in_(ids))
+        return statement.execution_options(synchronize_session=False)
+
+    def get_set_returning(self, db: Session, statement):
+        dialect = db.get_bind().dialect
+        returning = dialect.delete_returning if statement.is_delete else dialect.update_returning
+        return statement.returning(self.model.id) if returning else None
+
+    def execute_set_statement(
+            self, db: Session, statement, *, where: Any = None, commit: bool = True
+    ) -> Tuple[int, List[int]]:
+        """
+        Execute a statement of `get_set_statement`. Return (count, ids), the ids of the
+        affected rows come from RETURNING, they are empty on databases without it (MySQL).
+        """
+        _, params = self.get_compiled_condition(where=where, include_deleted=True)
+        returning = self.get_set_returning(db, statement)
+        if returning is not None:
+            ids = list(db.execute(returning, params).scalars())
+            count = len(ids)
+        else:
+            ids = []
+            count = db.execute(statement, params).rowcount
+        if commit:
+            db.commit()
+        self.invalidate_caches()
+        return count, ids
+
+    def invalidate_caches(self):
+        """Drop what is cached about the rows of the model, after a statement the ORM events don't see."""
+        cache.invalidate_model(self.model)
+
     def get_count_where_array(
             self,
             db: Session,
             where: Any = None,
             current_user=None,
             include_deleted=False,
-    ) -> int:
-        query = db.query(self.model.id)
+            mode: str = "exact",
+    ) -> Optional[int]:
+        """
+        Number of rows matching a where array.
 
-        conditions = self.get_full_condition(
-            db=db,
-            where=where,
-            current_user=current_user,
-            include_deleted=include_deleted,
-        )
-        if conditions is not None:
-            query = query.filter(conditions)
+        `mode` is "exact", "estimate" (optimizer estimate on MySQL, exact on other databases)
+        or "none", which skips counting and returns None. Estimates are cached for
+        `settings.COUNT_CACHE_TTL` seconds per where shape and values, exact counts are
+        not: they must see the rows written since.
+        """
+        self.check_count_mode(mode)
+        if mode == "none":
+            return None
+        cache_key = self.get_count_cache_key(where, include_deleted, mode)
+        result = self.get_cached_count(cache_key)
+        if result is not None:
+            return result
 
-        # print("count ito ah",str(query.statement.compile(compile_kwargs={"literal_binds": True})))
-        result = query.count()
+        if mode == "estimate" and db.get_bind().dialect.name == "mysql":
+            result = self.get_estimated_count(db, where=where, include_deleted=include_deleted)
+        else:
+            query = db.query(func.count(self.model.id))
+            query = self.filter_where(query, where=where, include_deleted=include_deleted)
+            result = query.scalar()
+        self.set_cached_count(cache_key, result)
         return result
 
+    def check_count_mode(self, mode: str):
+        if mode not in COUNT_MODES:
+            raise HTTPException(status_code=400, detail=f"count must be one of: {', '.join(COUNT_MODES)}")
+
+    def get_estimated_count(self, db: Session, where: Any = None, include_deleted=False) -> int:
+        """
+        MySQL row estimate: the table statistics when nothing is filtered, else the rows
+        the optimizer expects the filtered query to return (EXPLAIN rows * filtered).
+        The statistics count the soft deleted rows, so they are only used with `include_deleted`
+        or on tables without deleted_at.
+        """
+        if not where and (include_deleted or "deleted_at" not in self.model.__table__.columns):
+            result = db.execute(
+                text(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name"
+                ),
+                {"table_name": self.model.__tablename__},
+            ).scalar()
+            if result is not None:
+                return int(result)
+
+        query = self.filter_where(db.query(self.model.id), where=where, include_deleted=include_deleted)
+        compiled = query.statement.compile(
+            dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True}
+        )
+        params = compiled.params
+        if compiled.positional:
+            params = tuple(params[name] for name in compiled.positiontup)
+        plan = db.connection().exec_driver_sql(f"EXPLAIN {compiled}", params).mappings().first()
+        if plan is None or plan["rows"] is None:
+            return 0
+        return int(plan["rows"] * float(plan.get("filtered") or 100) / 100)
+
+    def get_count_cache_key(self, where: Any, include_deleted: bool, mode: str):
+        """Hashable key of a count: mode, where shape and values. None if it can't be cached (exact counts)."""
+        if mode != "estimate":
+            return None
+        plan = self.parse_where(where=where, include_deleted=include_deleted)
+        if plan is None:
+            return mode, None, ()
+        shape = self.get_where_shape(plan)
+        if shape is None:
+            return None
+        params = tuple(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in self.get_where_params(plan).items()
+        )
+        try:
+            hash(params)
+        except TypeError:
+            return None
+        return mode, shape, params
+
+    def get_cached_count(self, cache_key) -> Optional[int]:
+        if cache_key is None or settings.COUNT_CACHE_TTL <= 0:
+            return None
+        with self._where_cache_lock:
+            entry = self._count_cache.get(cache_key)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if expires_at < time.monotonic():
+                del self._count_cache[cache_key]
+                return None
+            self._count_cache.move_to_end(cache_key)
+            return result
+
+    def set_cached_count(self, cache_key, result: int):
+        if cache_key is None or settings.COUNT_CACHE_TTL <= 0:
+            return
+        with self._where_cache_lock:
+            self._count_cache[cache_key] = (time.monotonic() + settings.COUNT_CACHE_TTL, result)
+            self._count_cache.move_to_end(cache_key)
+            if len(self._count_cache) > settings.COUNT_CACHE_SIZE:
+                self._count_cache.popitem(last=False)
+
     def get_full_condition(
             self, db: Session, where: Any = None, current_user=None, include_deleted=False
     ) -> Any:
+        plan = self.parse_where(where=where, include_deleted=include_deleted)
+        if plan is None:
+            return None
+        return self.build_where(plan)
+
+    def parse_where(self, where: Any = None, include_deleted=False):
+        """Parse a where array into the plan rendered by `build_where`, None if there is no filter."""
         if not include_deleted:
-            if not where:
-                where = []
-            where.append(
+            where = list(where or []) + [
                 {
                     "key": "deleted_at",
                     "operator": "isNull",
                 }
-            )
-        if where is not None:
-            conditions = []
-            is_or = False
-            for parent_condition in where:
-                if type(parent_condition) is list:
-                    is_or = True
-                    temp_conditions = []
-                    for condition in parent_condition:
-                        filter_condition = self.get_condition_deep_multiple(
-                            db=db, condition=condition, current_user=current_user
-                        )
-                        if filter_condition is not None:
-                            temp_conditions.append(filter_condition)
-                    conditions.append(and_(*temp_conditions))
-                else:
-                    filter_condition = self.get_condition_deep_multiple(
-                        db=db, condition=parent_condition, current_user=current_user
-                    )
+            ]
+        if where is None:
+            return None
+        parents = []
+        is_or = False
+        for parent_condition in where:
+            if type(parent_condition) is list:
+                is_or = True
+                parents.append([self.parse_condition(condition) for condition in parent_condition])
+            else:
+                parents.append(self.parse_condition(parent_condition))
+        return is_or, parents
+
+    def build_where(self, plan, bind=None):
+        """
+        Build the condition of a parsed where array. With `bind`, every value goes
+        through `bind(value)`, which returns the bind parameter to use in its place.
+        """
+        is_or, parents = plan
+        conditions = []
+        for parent in parents:
+            if type(parent) is list:
+                temp_conditions = []
+                for condition_plan in parent:
+                    filter_condition = self.build_condition_plan(condition_plan, bind)
                     if filter_condition is not None:
-                        conditions.append(filter_condition)
-            query_operator = or_ if is_or else and_
-            return query_operator(*conditions)
-        else:
+                        temp_conditions.append(filter_condition)
+                conditions.append(and_(*temp_conditions))
+            else:
+                filter_condition = self.build_condition_plan(parent, bind)
+                if filter_condition is not None:
+                    conditions.append(filter_condition)
+        query_operator = or_ if is_or else and_
+        return query_operator(*conditions)
+
+    def _iter_condition_plans(self, plan):
+        for parent in plan[1]:
+            if type(parent) is list:
+                yield from parent
+            else:
+                yield parent
+
+    def get_where_shape(self, plan):
+        """Hashable form of a parsed where array without its values, None if it can't be cached."""
+
+        def condition_shape(condition_plan):
+            is_multiple, sub_plans = condition_plan
+            return "condition", is_multiple, tuple(
+                (
+                    keys,
+                    match,
+                    tuple(
+                        (operator, variant, args, tuple(isinstance(param, list) for param in params))
+                        for operator, variant, params, args in leaves
+                    ),
+                )
+                for keys, match, leaves in sub_plans
+            )
+
+        is_or, parents = plan
+        shape = is_or, tuple(
+            ("and", tuple(condition_shape(condition_plan) for condition_plan in parent))
+            if type(parent) is list else condition_shape(parent)
+            for parent in parents
+        )
+        try:
+            hash(shape)
+        except TypeError:
+            # e.g. "@method" keys called with list arguments
             return None
+        return shape
+
+    def get_where_params(self, plan):
+        """Values of a parsed where array, named in the order `build_where` binds them."""
+        params = {}
+        for _, sub_plans in self._iter_condition_plans(plan):
+            for _, _, leaves in sub_plans:
+                for _, _, leaf_params, _ in leaves:
+                    for value in leaf_params:
+                        params[f"w_{len(params)}"] = value
+        return params
+
+    def get_compiled_condition(self, where: Any = None, include_deleted=False):
+        """
+        Return (condition, params) for a where array.
+
+        The condition is built once per shape of the where array (keys, operators,
+        ...) with bind parameters, and kept in an LRU cache: calls with the same
+        shape only compute new `params`. Use it as `query.filter(condition).params(params)`.
+        """
+        plan = self.parse_where(where=where, include_deleted=include_deleted)
+        if plan is None:
+            return None, {}
+        shape = self.get_where_shape(plan)
+        if shape is None:
+            return self.build_where(plan), {}
+
+        with self._where_cache_lock:
+            condition = self._where_cache.get(shape)
+            if condition is not None:
+                self._where_cache.move_to_end(shape)
+        if condition is None:
+            counter = itertools.count()
+            condition = self.build_where(
+                plan,
+                bind=lambda value: bindparam(
+                    f"w_{next(counter)}", value, expanding=isinstance(value, list)
+                ),
+            )
+            with self._where_cache_lock:
+                self._where_cache[shape] = condition
+                if len(self._where_cache) > settings.WHERE_CACHE_SIZE:
+                    self._where_cache.popitem(last=False)
+        return condition, self.get_where_params(plan)
+
+    def filter_where(self, query, where: Any = None, include_deleted=False):
+        """Apply a where array to `query` through the compiled condition cache."""
+        condition, params = self.get_compiled_condition(where=where, include_deleted=include_deleted)
+        if condition is not None:
+            query = query.filter(condition)
+            if params:
+                query = query.params(params)
+        return query
 
     def remove_where_array(
             self, db: Session, where: Any = None, commit: bool = True
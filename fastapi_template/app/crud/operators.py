@@ -0,0 +1,218 @@
+"""
+Filter operators of the where array DSL used by `CRUDBase`.
+
+Every operator is looked up by name in a dict, so dispatching a condition does
+not depend on how many operators exist. An operator has two parts:
+
+* `prepare(value)` turns the request value into `(variant, params)`: `params`
+  are bound to the query, `variant` is whatever else changes the SQL (e.g.
+  comparing to None). It runs once per request.
+* `build(attribute, operator, variant, params)` returns the SQLAlchemy
+  condition. Its result is cached per where shape by `CRUDBase`, so it must only
+  depend on its arguments.
+
+Operators whose name starts with a registered prefix (`json.<key>`) are looked
+up by that prefix. Projects add their own operators at import time, e.g. in
+`main.py`, before any request is served:
+
+    from app.crud.operators import register_operator
+
+    register_operator(
+        "match",
+        lambda attribute, operator, variant, params: attribute.match(params[0]),
+    )
+"""
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import and_, extract, func, or_
+
+
+def single_value(value) -> Tuple[Any, tuple]:
+    return None, (value,)
+
+
+def nullable_value(value) -> Tuple[Any, tuple]:
+    if value is None:
+        return "null", ()
+    return None, (value,)
+
+
+def no_value(value) -> Tuple[Any, tuple]:
+    return None, ()
+
+
+class FilterOperator:
+    """
+    One operator of the where array DSL.
+
+    **Parameters**
+
+    * `name`: Name used in the `operator` field of a condition, or a prefix ending with "."
+    * `build`: `build(attribute, operator, variant, params)` returning the SQL condition
+    * `prepare`: `prepare(value)` returning `(variant, params)`, one bound parameter per value
+    """
+
+    def __init__(self, name: str, build: Callable, prepare: Callable = single_value):
+        self.name = name
+        self.build = build
+        self.prepare = prepare
+
+    def __repr__(self):
+        return f"FilterOperator({self.name!r})"
+
+
+OPERATORS: Dict[str, FilterOperator] = {}
+PREFIX_OPERATORS: Dict[str, FilterOperator] = {}
+
+
+def register_operator(name: str, build: Callable, prepare: Callable = single_value) -> FilterOperator:
+    """Add or replace an operator. A name ending with "." registers a prefix such as "json."."""
+    operator = FilterOperator(name, build, prepare)
+    if name.endswith("."):
+        PREFIX_OPERATORS[name] = operator
+    else:
+        OPERATORS[name] = operator
+    return operator
+
+
+def get_operator(name: str) -> Optional[FilterOperator]:
+    operator = OPERATORS.get(name)
+    if operator is None and "." in name:
+        operator = PREFIX_OPERATORS.get(name.split(".", 1)[0] + ".")
+    return operator
+
+
+def get_datetime_string(date_string: str) -> str:
+    if len(date_string.split(" ")) >= 2:
+        return date_string
+    return datetime.strptime(date_string, "%Y-%m-%d").strftime("%Y-%m-%d %H:%M")
+
+
+def prepare_like(value):
+    return None, ("%" + value + "%",)
+
+
+def prepare_date(value):
+    return None, (datetime.strptime(value, "%Y-%m-%d").date(),)
+
+
+def prepare_last_24h(value):
+    now = datetime.now()
+    return None, (now - timedelta(hours=24), now)
+
+
+def prepare_between_date(value):
+    date_split = value.split(",")
+    date_1 = datetime.strptime(get_datetime_string(date_split[0]), "%Y-%m-%d %H:%M").date()
+    date_2 = datetime.strptime(get_datetime_string(date_split[1]), "%Y-%m-%d %H:%M").date()
+    return None, (date_1, date_2)
+
+
+def prepare_list(value):
+    return None, (list(value),)
+
+
+def prepare_in_date_range(value):
+    # "2024" filters on the year, "2024-05" on year and month
+    variant = []
+    params = []
+    for date_value in value:
+        parts = date_value.split("-")
+        if len(parts) in (1, 2):
+            variant.append(len(parts))
+            params += [int(part) for part in parts]
+    return tuple(variant), tuple(params)
+
+
+def prepare_json(value):
+    if value in ("isNull", "isNotNull"):
+        return value, ()
+    return None, (value,)
+
+
+def prepare_ratio(value):
+    return None, (value[0], value[1] / 100)
+
+
+def build_equal(attribute, operator, variant, params):
+    return attribute.is_(None) if variant == "null" else attribute == params[0]
+
+
+def build_not_equal(attribute, operator, variant, params):
+    return attribute.isnot(None) if variant == "null" else attribute != params[0]
+
+
+def build_extract(attribute, operator, variant, params):
+    if variant == "null":
+        return extract(operator, attribute).is_(None)
+    return extract(operator, attribute) == params[0]
+
+
+def build_year_bound(compare):
+    def build(attribute, operator, variant, params):
+        if variant == "null":
+            return extract("year", attribute).is_(None)
+        return compare(extract("year", attribute), params[0])
+    return build
+
+
+def build_in_date_range(attribute, operator, variant, params):
+    filters = []
+    params = iter(params)
+    for parts in variant:
+        if parts == 1:
+            filters.append(extract("year", attribute) == next(params))
+        else:
+            filters.append(
+                and_(
+                    extract("year", attribute) == next(params),
+                    extract("month", attribute) == next(params),
+                )
+            )
+    return or_(*filters)
+
+
+def build_json(attribute, operator, variant, params):
+    json_key = "$." + operator.split(".")[1]
+    col_value = func.json_extract(func.json_unquote(attribute), json_key)
+    if variant == "isNull":
+        return or_(
+            col_value.is_(None),
+            col_value.is_(False),
+            col_value.like("false"),
+        )
+    elif variant == "isNotNull":
+        return col_value.isnot(None)
+    return col_value.like(params[0])
+
+
+def build_ratio(attribute, operator, variant, params):
+    return func.levenshtein_ratio(func.upper(attribute), func.upper(params[0])) > params[1]
+
+
+register_operator("==", build_equal, nullable_value)
+register_operator("!=", build_not_equal, nullable_value)
+register_operator(">", lambda attribute, operator, variant, params: attribute > params[0])
+register_operator("<", lambda attribute, operator, variant, params: attribute < params[0])
+register_operator("like", lambda attribute, operator, variant, params: attribute.like(params[0]), prepare_like)
+for extract_field in ("month", "year", "week"):
+    register_operator(extract_field, build_extract, nullable_value)
+register_operator("lower_or_equal_year", build_year_bound(lambda year, value: year <= value), nullable_value)
+register_operator("greater_or_equal_year", build_year_bound(lambda year, value: year >= value), nullable_value)
+register_operator("date", lambda attribute, operator, variant, params: func.date(attribute) == params[0], prepare_date)
+register_operator(
+    "last_24h", lambda attribute, operator, variant, params: attribute.between(*params), prepare_last_24h
+)
+register_operator(
+    "between_date", lambda attribute, operator, variant, params: attribute.between(*params), prepare_between_date
+)
+register_operator("isNull", lambda attribute, operator, variant, params: attribute.is_(None), no_value)
+register_operator("isNotNull", lambda attribute, operator, variant, params: attribute.isnot(None), no_value)
+register_operator("isTrue", lambda attribute, operator, variant, params: attribute.is_(True), no_value)
+register_operator("isFalse", lambda attribute, operator, variant, params: attribute.is_(False), no_value)
+register_operator("in", lambda attribute, operator, variant, params: attribute.in_(params[0]), prepare_list)
+register_operator("notIn", lambda attribute, operator, variant, params: attribute.notin_(params[0]), prepare_list)
+register_operator("in_date_range", build_in_date_range, prepare_in_date_range)
+register_operator("json.", build_json, prepare_json)
+register_operator("ratio", build_ratio, prepare_ratio)
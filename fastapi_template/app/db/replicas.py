@@ -0,0 +1,149 @@
+"""
+Read replicas of the primary database (`settings.MYSQL_REPLICAS`).
+
+Read-only endpoints open their session on a replica picked round robin among the healthy
+ones (`deps.get_read_db`). A background thread checks every replica each
+`settings.REPLICA_HEALTH_INTERVAL` seconds, a replica whose connection fails is skipped
+until it passes a check again. Without a healthy replica, reads go to the primary.
+
+Read your writes: once a request of a user has written to the primary, the reads of this
+user go to the primary for `settings.REPLICA_STICKY_SECONDS`, until the replicas caught up.
+"""
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.core import cache
+from app.core.config import settings
+
+
+def replica_url(replica: str, primary_url: str) -> str:
+    """A replica DSN, or `host[:port]` of a replica with the credentials and database of the primary."""
+    if "://" in replica:
+        url = make_url(replica)
+        return url.set(drivername=make_url(primary_url).drivername).render_as_string(hide_password=False)
+    host, _, port = replica.partition(":")
+    url = make_url(primary_url).set(host=host, port=int(port) if port else None)
+    return url.render_as_string(hide_password=False)
+
+
+class Replica:
+    def __init__(self, name: str, engine: Engine, async_engine=None):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        self.healthy = True
+        self.checked_at = 0.0
+        self.error: Optional[str] = None
+
+    def check(self):
+        try:
+            with self.engine.connect() as connection:
+                connection.exec_driver_sql("SELECT 1")
+            self.healthy, self.error = True, None
+        except Exception as e:
+            self.healthy, self.error = False, str(e)
+        self.checked_at = time.time()
+
+    def mark_down(self, error: str):
+        self.healthy, self.error = False, error
+
+    def info(self) -> dict:
+        return {"name": self.name, "healthy": self.healthy, "checked_at": self.checked_at, "error": self.error}
+
+
+class ReplicaPool:
+    """Round robin over the replicas that passed their last health check."""
+
+    def __init__(self, replicas: List[Replica], interval: float):
+        self.replicas = replicas
+        self.interval = interval
+        self._next = 0
+        self._lock = threading.Lock()
+        self._checker: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def start(self):
+        """Start the health checks, once per process (the first `choose` does it)."""
+        if self._checker is not None or not self.replicas or self.interval <= 0:
+            return
+        with self._lock:
+            if self._checker is None:
+                self._checker = threading.Thread(target=self._run_checks, name="replica-health", daemon=True)
+                self._checker.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run_checks(self):
+        while not self._stopped.is_set():
+            self.check()
+            self._stopped.wait(self.interval)
+
+    def check(self):
+        for replica in self.replicas:
+            replica.check()
+
+    def choose(self) -> Optional[Replica]:
+        self.start()
+        with self._lock:
+            healthy = [replica for replica in self.replicas if replica.healthy]
+            if not healthy:
+                return None
+            self._next += 1
+            return healthy[self._next % len(healthy)]
+
+    def info(self) -> List[dict]:
+        return [replica.info() for replica in self.replicas]
+
+
+class RoutingSession(Session):
+    """
+    Session bound to a replica. Flushes and INSERT/UPDATE/DELETE statements still go to `primary`,
+    so an endpoint that writes by mistake does not fail on a read-only replica.
+    """
+
+    def __init__(self, *args, primary: Engine = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.primary = primary
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.primary is not None and (self._flushing or isinstance(clause, UpdateBase)):
+            return self.primary
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+# Users (the `sub` of their token) who recently wrote, their reads stay on the primary
+recent_writers = cache.create_cache("recent_writers", settings.REPLICA_STICKY_SECONDS, settings.USER_CACHE_SIZE)
+
+
+def has_written(session: Session) -> bool:
+    return session.info.get("has_written", False)
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_flush(session, flush_context):
+    session.info["has_written"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _flag_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_written"] = True
+
+
+def mark_writer(writer: Optional[str]):
+    if writer is not None and settings.REPLICA_STICKY_SECONDS > 0:
+        recent_writers.set(writer, {"at": time.time()})
+
+
+def is_sticky(writer: Optional[str]) -> bool:
+    return writer is not None and settings.REPLICA_STICKY_SECONDS > 0 and recent_writers.get(writer) is not None
@@ -2,6 +2,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.db.replicas import Replica, ReplicaPool, RoutingSession, replica_url
 
 
 engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True, pool_size=10,  # Increase the pool size
@@ -9,3 +10,37 @@ engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True, poo
                        pool_timeout=30,  # Increase the timeout duration
                        pool_recycle=3600)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# The sync engine stays available for scripts, migrations and exports
+async_engine = None
+AsyncSessionLocal = None
+if settings.ASYNC_DB:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(settings.ASYNC_SQLALCHEMY_DATABASE_URI, pool_pre_ping=True, pool_size=10,
+                                       max_overflow=20,
+                                       pool_timeout=30,
+                                       pool_recycle=3600)
+    # Objects are not expired on commit: an async session can't lazy load them again
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def create_replica(replica: str) -> Replica:
+    replica_engine = create_engine(replica_url(replica, settings.SQLALCHEMY_DATABASE_URI), pool_pre_ping=True,
+                                   pool_size=10, max_overflow=20, pool_timeout=30, pool_recycle=3600)
+    replica_async_engine = None
+    if settings.ASYNC_DB:
+        replica_async_engine = create_async_engine(
+            replica_url(replica, settings.ASYNC_SQLALCHEMY_DATABASE_URI), pool_pre_ping=True,
+            pool_size=10, max_overflow=20, pool_timeout=30, pool_recycle=3600,
+        )
+    return Replica(replica_engine.url.render_as_string(), replica_engine, replica_async_engine)
+
+
+replica_pool = ReplicaPool([create_replica(replica) for replica in settings.MYSQL_REPLICAS],
+                           settings.REPLICA_HEALTH_INTERVAL)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, class_=RoutingSession, primary=engine)
+AsyncReadSessionLocal = None
+if settings.ASYNC_DB:
+    AsyncReadSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False,
+                                               sync_session_class=RoutingSession, primary=async_engine.sync_engine)
@@ -0,0 +1,8 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class BulkResult(BaseModel):
+    count: int
+    ids: List[Optional[int]] = []
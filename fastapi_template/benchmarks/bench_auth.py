@@ -0,0 +1,79 @@
+"""
+Per-request cost of authenticating a bearer token.
+
+Compares decoding the JWT and building the TokenPayload on every call (what every
+authenticated request used to do) with the token verification cache, then the
+whole get_current_user dependency with cold and warm token and user caches
+against an in-memory SQLite database.
+
+Usage (from the root of a generated project):
+
+    python -m benchmarks.bench_auth --iterations 20000
+"""
+import argparse
+import timeit
+
+from jose import jwt
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.db.base  # noqa: F401, registers every model on Base.metadata
+from app import models, schemas
+from app.api import deps
+from app.core import security
+from app.core.config import settings
+from app.db.base_class import Base
+
+
+def setup_database():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    user = models.User(email="bench@example.com", hashed_password="x", is_active=True)
+    db.add(user)
+    db.commit()
+    return db, user
+
+
+def decode_uncached(token):
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[security.ALGORITHM])
+    return schemas.TokenPayload(**payload)
+
+
+def current_user_cold(db, token):
+    security.token_verifier.cache.clear()
+    deps.user_cache.clear()
+    return deps.get_current_user(db=db, token=token)
+
+
+def report(label, func, iterations, unit="us"):
+    seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+    per_call = seconds / iterations * (1_000_000_000 if unit == "ns" else 1_000_000)
+    print(f"  {label:<28} {per_call:9.1f} {unit}/call")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    db, user = setup_database()
+    token = security.create_access_token(data={"id": str(user.id), "email": user.email})
+
+    print("token verification:")
+    before = report("decode, uncached", lambda: decode_uncached(token), args.iterations)
+    after = report("verify, cached", lambda: security.token_verifier.verify(token), args.iterations)
+    print(f"  {'':<28} x{before / after:.1f}")
+
+    print("get_current_user:")
+    before = report("cold caches", lambda: current_user_cold(db, token), args.iterations // 10)
+    deps.get_current_user(db=db, token=token)
+    after = report("warm caches", lambda: deps.get_current_user(db=db, token=token), args.iterations // 10)
+    print(f"  {'':<28} x{before / after:.1f}")
+    print(f"  token cache: {security.token_verifier.cache.info()}")
+    print(f"  user cache: {deps.user_cache.info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Login throughput, and how much a login storm slows down the other endpoints.
+
+Fires concurrent logins at the login endpoint together with requests to a trivial sync
+endpoint, against an in-memory SQLite database, in two modes:
+
+* inline: bcrypt runs in the request thread (HASH_WORKERS=0, sync authenticate),
+  what every login used to do
+* pool: the async login path with bcrypt in the hashing process pool
+
+Usage (from the root of a generated project):
+
+    python -m benchmarks.bench_login --logins 64 --concurrency 16
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.db.base  # noqa: F401, registers every model on Base.metadata
+from app import crud, models
+from app.api import deps
+from app.api.api_v1.endpoints import login
+from app.core import hashing, security
+from app.core.config import settings
+from app.db.base_class import Base
+
+PASSWORD = "bench-password"
+
+
+def setup_database():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine)
+    db = SessionLocal()
+    db.add(models.User(email="bench@example.com", hashed_password=security.get_password_hash(PASSWORD),
+                       is_active=True))
+    db.commit()
+    db.close()
+    return SessionLocal
+
+
+def create_app(SessionLocal) -> FastAPI:
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    bench_app = FastAPI()
+    bench_app.include_router(login.router, prefix="/login")
+    bench_app.dependency_overrides[deps.get_db] = get_db
+
+    @bench_app.post("/login-inline")
+    def login_inline(db: Session = Depends(deps.get_db), form_data: OAuth2PasswordRequestForm = Depends()):
+        if not crud.user.authenticate(db, email=form_data.username, password=form_data.password):
+            raise HTTPException(status_code=400, detail="Incorrect email or password")
+        return {}
+
+    @bench_app.get("/ping")
+    def ping():
+        return {}
+
+    return bench_app
+
+
+async def timed(client, method, url, latencies, **kwargs):
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    latencies.append(time.perf_counter() - start)
+    return response.status_code
+
+
+async def storm(bench_app, login_url, logins, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    login_latencies, ping_latencies, statuses = [], [], []
+    form = {"username": "bench@example.com", "password": PASSWORD}
+    transport = httpx.ASGITransport(app=bench_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one_login():
+            async with semaphore:
+                statuses.append(await timed(client, "POST", login_url, login_latencies, data=form))
+
+        async def pings():
+            while len(statuses) < logins:
+                await timed(client, "GET", "/ping", ping_latencies)
+                await asyncio.sleep(0.01)
+
+        start = time.perf_counter()
+        await asyncio.gather(pings(), *(one_login() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+    return elapsed, login_latencies, ping_latencies, statuses
+
+
+def report(label, elapsed, login_latencies, ping_latencies, statuses):
+    ok = sum(status == 200 for status in statuses)
+    print(f"{label}:")
+    print(f"  {'logins/s':<28} {ok / elapsed:9.1f}  ({ok}/{len(statuses)} ok)")
+    print(f"  {'login p50':<28} {statistics.median(login_latencies) * 1000:9.1f} ms")
+    if ping_latencies:
+        print(f"  {'ping p50 during storm':<28} {statistics.median(ping_latencies) * 1000:9.1f} ms")
+        print(f"  {'ping max during storm':<28} {max(ping_latencies) * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=settings.HASH_WORKERS)
+    args = parser.parse_args()
+
+    bench_app = create_app(setup_database())
+
+    settings.HASH_WORKERS = 0
+    report("inline", *asyncio.run(storm(bench_app, "/login-inline", args.logins, args.concurrency)))
+
+    settings.HASH_WORKERS = args.workers
+    hashing.get_executor()  # start the pool outside of the measure
+    report(f"pool ({args.workers} workers)",
+           *asyncio.run(storm(bench_app, "/login/access-token", args.logins, args.concurrency)))
+    hashing.shutdown()
+
+
+if __name__ == "__main__":
+    main()
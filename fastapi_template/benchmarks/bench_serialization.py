@@ -0,0 +1,107 @@
+"""
+Rows per second serialized by a list endpoint, per worker.
+
+Compares the path the generated read endpoints used to take (jsonable_encoder, then the
+Response schema, then FastAPI validating and encoding it again against response_model) with
+app.api.serializers (loaded state, one TypeAdapter validation and JSON dump), on rows of an
+in-memory SQLite database with a JSON column.
+
+Usage (from the root of a generated project):
+
+    python -m benchmarks.bench_serialization --rows 1000 --iterations 20
+"""
+import argparse
+import json
+import timeit
+from typing import List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from sqlalchemy import JSON, Column, DateTime, Float, Integer, String, Text, create_engine, func
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.api import serializers
+
+BenchBase = declarative_base()
+
+
+class BenchRow(BenchBase):
+    __tablename__ = "bench_row"
+    id = Column(Integer, primary_key=True)
+    label = Column(String(100))
+    amount = Column(Float)
+    description = Column(Text)
+    attributes = Column(JSON)
+    created_at = Column(DateTime, default=func.now())
+
+
+class BenchRowSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: Optional[int]
+    label: Optional[str]
+    amount: Optional[float] = None
+    description: Optional[str] = None
+    attributes: Optional[dict] = None
+
+
+class ResponseBenchRow(BaseModel):
+    count: Optional[int] = None
+    data: Optional[List[BenchRowSchema]]
+    next_cursor: Optional[str] = None
+
+
+def load_rows(rows: int):
+    engine = create_engine("sqlite://")
+    BenchBase.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(
+        BenchRow(
+            label=f"row {i}",
+            amount=i / 3,
+            description="lorem ipsum " * 20,
+            attributes={"tags": ["a", "b", "c"], "index": i, "nested": {"enabled": bool(i % 2)}},
+        )
+        for i in range(rows)
+    )
+    db.commit()
+    return db.query(BenchRow).all()
+
+
+response_adapter = TypeAdapter(ResponseBenchRow)
+
+
+def old_path(items):
+    response = ResponseBenchRow(**{"count": len(items), "data": jsonable_encoder(items), "next_cursor": None})
+    # What FastAPI does with the returned model and response_model
+    value = response_adapter.validate_python(response.model_dump())
+    return JSONResponse(response_adapter.dump_python(value, mode="json")).body
+
+
+def new_path(items):
+    return serializers.page_response(ResponseBenchRow, items, count=len(items)).body
+
+
+def report(label, func, rows, iterations):
+    seconds = min(timeit.repeat(func, number=iterations, repeat=3)) / iterations
+    print(f"  {label:<28} {rows / seconds:12,.0f} rows/s")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    items = load_rows(args.rows)
+    assert json.loads(old_path(items)) == json.loads(new_path(items))
+    print(f"{args.rows} rows per response:")
+    before = report("jsonable_encoder + validate", lambda: old_path(items), args.rows, args.iterations)
+    after = report("serializers.page_response", lambda: new_path(items), args.rows, args.iterations)
+    print(f"  {'':<28} x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Cost per request of the timing middlewares (budget: 50 µs).
+
+Sends requests straight to an ASGI app that answers a small body (no server, no FastAPI),
+alone and wrapped by ServerTimingMiddleware and QueryStatsMiddleware, like main.py does.
+The difference is what the middlewares add to every request, including the phases timed
+by the auth dependency and the serializers.
+
+Usage (from the root of a generated project):
+
+    python -m benchmarks.bench_timing --requests 100000
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from app.core import instrumentation, timing
+
+BUDGET_US = 50.0
+
+
+class Route:
+    path = "/api/v1/items/by_id/"
+
+
+async def endpoint(scope, receive, send):
+    # What the router and the dependencies of a read endpoint do
+    scope["route"] = Route
+    with timing.phase("auth"):
+        pass
+    with timing.phase("serialize"):
+        body = b'{"id": 1}'
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def run(app, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/api/v1/items/by_id/", "headers": []}
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - start
+
+
+def per_request_us(app, requests: int) -> float:
+    asyncio.run(run(app, requests // 10))  # warm up
+    return min(asyncio.run(run(app, requests)) for _ in range(3)) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+
+    bare = per_request_us(endpoint, args.requests)
+    timed = per_request_us(timing.ServerTimingMiddleware(endpoint), args.requests)
+    both = per_request_us(
+        timing.ServerTimingMiddleware(instrumentation.QueryStatsMiddleware(endpoint)), args.requests
+    )
+    print(f"  {'bare app':<36} {bare:8.2f} µs/request")
+    print(f"  {'+ ServerTimingMiddleware':<36} {timed:8.2f} µs/request  (+{timed - bare:.2f})")
+    print(f"  {'+ QueryStatsMiddleware':<36} {both:8.2f} µs/request  (+{both - bare:.2f})")
+    overhead = both - bare
+    print(f"overhead {overhead:.2f} µs, budget {BUDGET_US:.0f} µs: {'ok' if overhead < BUDGET_US else 'OVER BUDGET'}")
+    if overhead >= BUDGET_US:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
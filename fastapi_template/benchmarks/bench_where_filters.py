@@ -0,0 +1,126 @@
+"""
+Per-request cost of building where-array filters in CRUDBase.
+
+Compares building the condition from scratch on every call (what every list
+request used to do) with the compiled condition cache, both for the filter
+build alone and for a full query against an in-memory SQLite database, and
+measures the operator registry lookup for early and late registered operators.
+
+Usage (from the root of a generated project):
+
+    python -m benchmarks.bench_where_filters --iterations 5000
+"""
+import argparse
+import copy
+import timeit
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+
+from app.crud.base_copy import CRUDBase
+from app.crud.operators import OPERATORS, get_operator
+
+BenchBase = declarative_base()
+
+
+class BenchParent(BenchBase):
+    __tablename__ = "bench_parent"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100))
+    deleted_at = Column(DateTime)
+
+
+class BenchItem(BenchBase):
+    __tablename__ = "bench_item"
+    id = Column(Integer, primary_key=True)
+    label = Column(String(100))
+    amount = Column(Float)
+    created_at = Column(DateTime)
+    deleted_at = Column(DateTime)
+    parent_id = Column(Integer, ForeignKey("bench_parent.id"))
+    parent = relationship(BenchParent)
+
+
+WHERES = {
+    "simple": [{"key": "label", "operator": "like", "value": "item"}],
+    "relation": [
+        {"key": "parent.name", "operator": "==", "value": "parent 1"},
+        {"key": "amount", "operator": ">", "value": 10},
+    ],
+    "dashboard": [
+        {"key": "id", "operator": "in", "value": [1, 2, 3, 4, 5]},
+        {"key": "created_at", "operator": "between_date", "value": "2024-01-01,2024-12-31"},
+        {"key": "parent.[name,id]", "operator": "like,>", "value": "parent,0"},
+        [{"key": "amount", "operator": "<", "value": 50}],
+    ],
+}
+
+
+def setup_database(rows: int):
+    engine = create_engine("sqlite://")
+    BenchBase.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    parents = [BenchParent(name=f"parent {i}") for i in range(10)]
+    db.add_all(parents)
+    db.flush()
+    db.add_all(
+        BenchItem(label=f"item {i}", amount=i % 100, parent_id=parents[i % 10].id)
+        for i in range(rows)
+    )
+    db.commit()
+    return db
+
+
+def build_uncached(crud, where):
+    crud._key_parts_cache.clear()
+    return crud.get_full_condition(db=None, where=copy.deepcopy(where))
+
+
+def build_compiled(crud, where):
+    return crud.get_compiled_condition(where=copy.deepcopy(where))
+
+
+def query_uncached(crud, db, where):
+    condition = build_uncached(crud, where)
+    return db.query(BenchItem).filter(condition).limit(20).all()
+
+
+def query_compiled(crud, db, where):
+    return crud.filter_where(db.query(BenchItem), where=copy.deepcopy(where)).limit(20).all()
+
+
+def report(label, func, iterations, unit="us"):
+    seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+    per_call = seconds / iterations * (1_000_000_000 if unit == "ns" else 1_000_000)
+    print(f"  {label:<28} {per_call:9.1f} {unit}/call")
+    return per_call
+
+
+def report_dispatch(iterations):
+    print("operator dispatch:")
+    names = list(OPERATORS)
+    for name in (names[0], names[len(names) // 2], names[-1], "json.status"):
+        report(f"get_operator({name!r})", lambda: get_operator(name), iterations * 100, unit="ns")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    report_dispatch(args.iterations)
+    db = setup_database(args.rows)
+    crud = CRUDBase(BenchItem)
+    for name, where in WHERES.items():
+        print(f"{name}:")
+        before = report("build, uncached", lambda: build_uncached(crud, where), args.iterations)
+        after = report("build, compiled", lambda: build_compiled(crud, where), args.iterations)
+        print(f"  {'':<28} x{before / after:.1f}")
+        before = report("query, uncached", lambda: query_uncached(crud, db, where), args.iterations // 10)
+        after = report("query, compiled", lambda: query_compiled(crud, db, where), args.iterations // 10)
+        print(f"  {'':<28} x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
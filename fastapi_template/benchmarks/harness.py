@@ -0,0 +1,330 @@
+"""
+Load test of the generated endpoints of a class, in process.
+
+Used by the `bench_api_<table>.py` modules written by the generator, one per class:
+
+    python -m benchmarks.bench_api_order --rows 10000 --requests 500 --concurrency 16 \
+        --output benchmarks/results/order.json --compare previous/order.json
+
+The table is seeded with `--rows` rows built from the fixtures of the module (rendered with the
+generator test data factories), after one row of every parent class of a required foreign key,
+then list, get by id, create, update and delete are each sent
+`--requests` times by `--concurrency` clients through an in-process ASGI transport (httpx), as a
+superuser. Latencies (p50/p95/p99) and requests per second of every endpoint are written as
+JSON, `--compare` prints the change against the report of a previous generation. A scenario
+with failed requests is reported on stderr and the run exits with status 1.
+
+The database is a fresh SQLite file unless `--database-url` is given, its tables are then
+created when missing and never dropped: use a scratch database.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+import app.db.base  # noqa: F401, registers every model on Base.metadata
+from app import models
+from app.api import deps
+from app.core import security
+from app.core.config import settings
+from app.db.base_class import Base
+
+SCENARIOS = ["list", "get_by_id", "create", "update", "delete"]
+
+
+def parse_args(table_name: str) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=f"Benchmark of the {table_name} endpoints.\n\n{__doc__}",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--rows", type=int, default=10000, help="rows seeded before the run")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--page-size", type=int, default=100, help="limit of the list requests")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--output", default=None, help="JSON report path (default: stdout)")
+    parser.add_argument("--compare", default=None, help="JSON report of a previous run")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def async_url(url: str) -> str:
+    """The URL of the async driver of the database of `url`."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        drivername = "sqlite+aiosqlite"
+    else:
+        drivername = make_url(settings.ASYNC_SQLALCHEMY_DATABASE_URI).drivername
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def make_unique(row: dict, unique: Dict[str, int], index: int) -> dict:
+    """Suffix the unique columns of `row` with `index`, within their length."""
+    row = dict(row)
+    for column, length in unique.items():
+        value = row.get(column)
+        if isinstance(value, str):
+            suffix = f"-{index}"
+            row[column] = value[:max(0, (length or 255) - len(suffix))] + suffix
+        elif isinstance(value, int) and not isinstance(value, bool):
+            row[column] = index
+    return row
+
+
+class Rows:
+    """Request bodies cycling over the fixtures, unique columns made unique."""
+
+    def __init__(self, fixtures: List[dict], unique: Dict[str, int], parent_ids: Dict[str, int] = None):
+        self.fixtures = fixtures or [{}]
+        self.unique = unique
+        self.parent_ids = parent_ids or {}
+        self.counter = itertools.count(int(time.time() * 1000) % 10 ** 9)
+
+    def next(self) -> dict:
+        index = next(self.counter)
+        return make_unique({**self.fixtures[index % len(self.fixtures)], **self.parent_ids}, self.unique, index)
+
+
+def seed_rows(rows: Rows, create_schema, count: int) -> List[dict]:
+    """
+    `count` validated create bodies for `create_bulk`. A password is hashed once and shared by the
+    rows as hashed_password: a hash per seeded user would time the hashing, not the endpoints.
+    """
+    objs_in, hashed_password = [], None
+    for _ in range(count):
+        obj_in = create_schema(**rows.next()).dict(exclude_unset=True)
+        password = obj_in.pop("password", None)
+        if password is not None:
+            hashed_password = hashed_password or security.get_password_hash(password)
+            obj_in["hashed_password"] = hashed_password
+        objs_in.append(obj_in)
+    return objs_in
+
+
+def seed_parents(db, parents: Optional[Dict[str, tuple]]) -> Dict[str, int]:
+    """
+    Create a row of the parent class of every required foreign key, its own parents first.
+    `parents` is the PARENTS of a benchmark module. Return {column: id of the parent row}.
+    """
+    parent_ids = {}
+    for column, (crud_object, create_schema, fixtures, unique, grandparents) in (parents or {}).items():
+        rows = Rows(fixtures, unique, seed_parents(db, grandparents))
+        parent_id = crud_object.create_bulk(db, objs_in=seed_rows(rows, create_schema, 1))[0]
+        if parent_id is None:
+            parent_id = db.query(func.max(crud_object.model.id)).scalar()
+        parent_ids[column] = parent_id
+    return parent_ids
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest rank percentile of sorted `values`."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def drive(client: httpx.AsyncClient, make_request: Callable[[int], tuple], requests: int,
+                concurrency: int) -> dict:
+    """Send `requests` requests (method, url, kwargs) = make_request(i) with `concurrency` clients."""
+    latencies, errors, first_error = [], 0, None
+    indices = iter(range(requests))
+
+    async def client_loop():
+        nonlocal errors, first_error
+        for index in indices:
+            method, url, kwargs = make_request(index)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+                first_error = first_error or f"{response.status_code} {response.text[:200]}"
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    result = summarize(latencies, errors, time.perf_counter() - start)
+    if first_error:
+        result["first_error"] = first_error
+    return result
+
+
+def setup_app(router, prefix: str, database_url: str) -> FastAPI:
+    engine = create_engine(database_url, connect_args={"check_same_thread": False}
+                           if make_url(database_url).get_backend_name() == "sqlite" else {})
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    bench_app = FastAPI()
+    bench_app.include_router(router, prefix=prefix)
+    bench_app.state.SessionLocal = SessionLocal
+    bench_app.dependency_overrides[deps.get_db] = get_db
+    bench_app.dependency_overrides[deps.get_read_db] = get_db
+    if settings.ASYNC_DB:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        AsyncSessionLocal = async_sessionmaker(create_async_engine(async_url(database_url)),
+                                               autoflush=False, expire_on_commit=False)
+
+        async def get_async_db():
+            async with AsyncSessionLocal() as db:
+                yield db
+
+        bench_app.dependency_overrides[deps.get_async_db] = get_async_db
+        bench_app.dependency_overrides[deps.get_async_read_db] = get_async_db
+    return bench_app
+
+
+def get_token(db) -> str:
+    email = "benchmark@example.com"
+    user = db.query(models.User).filter(models.User.email == email).first()
+    if user is None:
+        user = models.User(email=email, hashed_password=security.get_password_hash(os.urandom(16).hex()),
+                           is_active=True, is_superuser=True)
+        db.add(user)
+        db.commit()
+    return security.create_access_token(data={"id": user.id, "email": user.email})
+
+
+async def run_scenarios(bench_app: FastAPI, table_name: str, prefix: str, rows: Rows, ids: List[int],
+                        token: str, args: argparse.Namespace) -> Dict[str, Any]:
+    headers = {"Authorization": f"Bearer {token}"}
+    id_param = f"{table_name}_id"
+    created = []
+    results = {}
+    # An exception of the app is a 500 counted in the errors of its scenario, not the end of the run
+    transport = httpx.ASGITransport(app=bench_app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", headers=headers) as client:
+        # Warm up the caches of the app (token, user, compiled statements)
+        await client.get(f"{prefix}/", params={"limit": 1})
+
+        # Each update goes to another row: concurrent updates of one row of a versioned class are
+        # refused with a 409
+        update_ids = random.sample(ids, len(ids))
+        scenarios = {
+            "list": lambda index: ("GET", f"{prefix}/", {"params": {
+                "limit": args.page_size, "skip": random.randrange(max(1, len(ids) - args.page_size))}}),
+            "get_by_id": lambda index: ("GET", f"{prefix}/by_id/", {"params": {id_param: random.choice(ids)}}),
+            "create": lambda index: ("POST", f"{prefix}/", {"json": rows.next()}),
+            "update": lambda index: ("PUT", f"{prefix}/", {"params": {id_param: update_ids[index % len(update_ids)]},
+                                                         "json": rows.next()}),
+            "delete": lambda index: ("DELETE", f"{prefix}/", {"params": {id_param: created[index]}}),
+        }
+        for name in SCENARIOS:
+            requests = args.requests
+            if name == "delete":
+                # Delete the rows of the create scenario, the seeded ones stay for the next runs
+                created = await created_ids(client, prefix, args.requests)
+                requests = len(created)
+            results[name] = await drive(client, scenarios[name], requests, args.concurrency)
+    return results
+
+
+async def created_ids(client: httpx.AsyncClient, prefix: str, count: int) -> List[int]:
+    response = await client.get(f"{prefix}/", params={"limit": count, "order_by": "id", "order": "DESC",
+                                                     "count": "none"})
+    return [row["id"] for row in response.json()["data"]]
+
+
+def compare(previous: dict, current: dict) -> List[str]:
+    lines = [f"{'endpoint':<12} {'p95 ms':>20} {'rps':>22}"]
+    for name, result in current["endpoints"].items():
+        before = previous.get("endpoints", {}).get(name)
+        if not before:
+            continue
+
+        def change(key):
+            return (result[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+
+        lines.append(f"{name:<12} {before['p95_ms']:>8} -> {result['p95_ms']:>8} ({change('p95_ms'):+.0f}%)"
+                     f" {before['rps']:>8} -> {result['rps']:>8} ({change('rps'):+.0f}%)")
+    return lines
+
+
+def run(table_name: str, router, crud_object, create_schema, fixtures: List[dict], unique: Dict[str, int],
+        parents: Dict[str, tuple] = None):
+    """Seed, benchmark and report the endpoints of `router` (the generated router of `table_name`)."""
+    args = parse_args(table_name)
+    random.seed(args.seed)
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/benchmark.db"
+    prefix = f"{settings.API_V1_STR}/{table_name}s"
+    bench_app = setup_app(router, prefix, database_url)
+
+    db = bench_app.state.SessionLocal()
+    try:
+        token = get_token(db)
+        rows = Rows(fixtures, unique, seed_parents(db, parents))
+        start = time.perf_counter()
+        ids = crud_object.create_bulk(db, objs_in=seed_rows(rows, create_schema, args.rows))
+        seed_seconds = time.perf_counter() - start
+        ids = [id for id in ids if id is not None] or [0]
+    finally:
+        db.close()
+
+    endpoints = asyncio.run(run_scenarios(bench_app, table_name, prefix, rows, ids, token, args))
+    report = {
+        "class": table_name,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "database": make_url(database_url).get_backend_name(),
+        "async_db": settings.ASYNC_DB,
+        "python": platform.python_version(),
+        "rows": args.rows,
+        "seed_seconds": round(seed_seconds, 3),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "endpoints": endpoints,
+    }
+    content = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as output:
+            output.write(content + "\n")
+    else:
+        print(content)
+    if args.compare:
+        with open(args.compare) as previous:
+            print("\n".join(compare(json.load(previous), report)), file=sys.stderr)
+
+    # The latencies of failed requests don't measure the endpoint: the report is kept to debug
+    # the run, but the run fails
+    failed = [name for name, result in endpoints.items() if result["errors"]]
+    for name in failed:
+        result = endpoints[name]
+        print(f"{name}: {result['errors']} of {result['requests']} requests failed, first: {result['first_error']}",
+              file=sys.stderr)
+    if failed:
+        sys.exit(f"Benchmark of {table_name} failed, errors in: {', '.join(failed)}")
+    return report
@@ -3,7 +3,9 @@ from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.api_v1.api import api_router
+from app.core import hashing, instrumentation, timing
 from app.core.config import settings
+from app.db.session import replica_pool
 from backend_pre_start import main
 
 app = FastAPI(
@@ -20,7 +22,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.QUERY_METRICS:
+    instrumentation.install()
+    app.add_middleware(instrumentation.QueryStatsMiddleware)
+if settings.SERVER_TIMING:
+    # The db phase is timed by the statement listeners
+    instrumentation.install()
+    app.add_middleware(timing.ServerTimingMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.add_event_handler("shutdown", hashing.shutdown)
+app.add_event_handler("shutdown", replica_pool.stop)
 
 
 if __name__ == "__main__":
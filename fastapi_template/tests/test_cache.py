@@ -0,0 +1,97 @@
+import datetime
+import decimal
+import enum
+import json
+import uuid
+
+import pytest
+from sqlalchemy import Boolean, Column, Integer, String, delete, update
+
+from app.core import cache
+from app.db.base_class import Base
+
+
+class CacheSample(Base):
+    __tablename__ = "test_cache_sample"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50))
+    is_active = Column(Boolean, default=True)
+
+
+sample_cache = cache.MemoryCache("test_cache_sample", ttl=60, max_size=100)
+cache.invalidate_on_change(CacheSample, sample_cache)
+
+
+class Color(enum.Enum):
+    RED = "red"
+
+
+@pytest.fixture
+def sample(db):
+    CacheSample.__table__.create(bind=db.get_bind(), checkfirst=True)
+    sample = CacheSample(name="a")
+    db.add(sample)
+    db.commit()
+    sample_cache.clear()
+    yield sample
+    db.rollback()
+    db.execute(delete(CacheSample))
+    db.commit()
+
+
+def test_encoded_values_round_trip():
+    value = {
+        "at": datetime.datetime(2024, 1, 2, 3, 4, 5),
+        "day": datetime.date(2024, 1, 2),
+        "time": datetime.time(3, 4, 5),
+        "price": decimal.Decimal("1.10"),
+        "ref": uuid.UUID(int=7),
+        "color": Color.RED,
+    }
+    decoded = json.loads(json.dumps(value, default=cache._encode), object_hook=cache._decode)
+    # Enums are stored by value, as in the responses
+    assert decoded == {**value, "color": "red"}
+
+
+def test_update_is_dropped_again_at_commit(db, sample):
+    sample.is_active = False
+    db.flush()
+    assert sample_cache.get(sample.id) is None
+    # Another request reads the row before the commit and caches the old values
+    sample_cache.set(sample.id, {"id": sample.id, "is_active": True})
+    db.commit()
+    assert sample_cache.get(sample.id) is None
+
+
+def test_delete_is_dropped_again_at_commit(db, sample):
+    db.delete(sample)
+    db.flush()
+    sample_cache.set(sample.id, {"id": sample.id})
+    db.commit()
+    assert sample_cache.get(sample.id) is None
+
+
+def test_bulk_update_clears_again_at_commit(db, sample):
+    db.execute(update(CacheSample).values(is_active=False))
+    sample_cache.set(sample.id, {"id": sample.id})
+    db.commit()
+    assert sample_cache.get(sample.id) is None
+
+
+def test_rolled_back_changes_are_forgotten(db, sample):
+    sample.name = "b"
+    db.flush()
+    db.rollback()
+    sample_cache.set(sample.id, {"id": sample.id})
+    db.commit()
+    assert sample_cache.get(sample.id) == {"id": sample.id}
+
+
+def test_redis_errors_are_misses():
+    pytest.importorskip("redis")
+    # Nothing listens on this port: every call fails and the caller falls back to the database
+    redis_cache = cache.RedisCache("test", ttl=60, url="redis://127.0.0.1:1/0")
+    redis_cache.set(1, {"id": 1})
+    assert redis_cache.get(1) is None
+    redis_cache.delete(1)
+    assert redis_cache.stats.errors == 3 and redis_cache.stats.misses == 1
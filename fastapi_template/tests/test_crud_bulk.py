@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String, delete
+
+from app.crud.base_copy import CRUDBase
+from app.db.base_class import Base
+
+
+class BulkSample(Base):
+    __tablename__ = "test_bulk_sample"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50))
+    rank = Column(Integer)
+    updated_at = Column(DateTime)
+    deleted_at = Column(DateTime)
+
+
+@pytest.fixture
+def crud_sample(db):
+    BulkSample.__table__.create(bind=db.get_bind(), checkfirst=True)
+    yield CRUDBase(BulkSample)
+    db.rollback()
+    db.execute(delete(BulkSample))
+    db.commit()
+
+
+def test_create_bulk_returns_ids_in_order(db, crud_sample):
+    rows = [{"name": f"sample {index}", "rank": index} for index in range(10)]
+    ids = crud_sample.create_bulk(db, objs_in=rows, chunk_size=3)
+    assert len(ids) == 10
+    samples = {sample.id: sample for sample in db.query(BulkSample)}
+    assert [samples[id].rank for id in ids] == list(range(10))
+
+
+def test_create_bulk_with_different_columns(db, crud_sample):
+    # Rows with other columns go in other statements, the ids still follow objs_in
+    rows = [{"name": "a"}, {"name": "b", "rank": 1}, {"rank": 2}, {"name": "d", "rank": 3}, {"name": "e"}]
+    ids = crud_sample.create_bulk(db, objs_in=rows, chunk_size=2)
+    samples = {sample.id: sample for sample in db.query(BulkSample)}
+    assert [(samples[id].name, samples[id].rank) for id in ids] == [
+        ("a", None), ("b", 1), (None, 2), ("d", 3), ("e", None)
+    ]
+
+
+def test_create_bulk_ignores_unknown_keys_and_empty_ids(db, crud_sample):
+    ids = crud_sample.create_bulk(db, objs_in=[{"id": None, "name": "a", "unknown": 1}])
+    assert db.get(BulkSample, ids[0]).name == "a"
+
+
+def test_upsert_bulk(db, crud_sample):
+    first, second = crud_sample.create_bulk(db, objs_in=[{"name": "a", "rank": 1}, {"name": "b", "rank": 2}])
+    ids = crud_sample.create_bulk(
+        db, objs_in=[{"id": first, "rank": 10}, {"name": "c", "rank": 3}, {"id": second, "name": "bb"}], upsert=True
+    )
+    assert ids[0] == first and ids[2] == second
+    db.expire_all()
+    # Only the fields that were set are updated
+    assert (db.get(BulkSample, first).name, db.get(BulkSample, first).rank) == ("a", 10)
+    assert (db.get(BulkSample, second).name, db.get(BulkSample, second).rank) == ("bb", 2)
+    assert db.get(BulkSample, ids[1]).name == "c"
+    assert db.get(BulkSample, first).updated_at is not None
+
+
+def test_bulk_chunk_size_fits_the_bind_parameter_limit(crud_sample):
+    dialect = SimpleNamespace(insertmanyvalues_max_parameters=100)
+    assert crud_sample.get_bulk_chunk_size(dialect, columns=4, chunk_size=1000) == 25
+    assert crud_sample.get_bulk_chunk_size(dialect, columns=4, chunk_size=10) == 10
+    assert crud_sample.get_bulk_chunk_size(dialect, columns=200, chunk_size=10) == 1
+
+    chunks = crud_sample.get_bulk_chunks(dialect, [{"name": "a", "rank": 1}] * 120, chunk_size=1000)
+    assert [len(rows) for _, rows in chunks] == [50, 50, 20]
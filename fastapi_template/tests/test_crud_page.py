@@ -0,0 +1,133 @@
+import base64
+import datetime
+import decimal
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, Numeric, String, Time, Uuid, delete
+
+from app.crud.base_copy import CRUDBase
+from app.db.base_class import Base
+
+ROWS = 23
+
+
+class PageSample(Base):
+    __tablename__ = "test_page_sample"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    label = Column(String(50))
+    price = Column(Numeric(10, 2))
+    at = Column(Time)
+    ref = Column(Uuid)
+    created_at = Column(DateTime)
+    blob = Column(LargeBinary)
+    deleted_at = Column(DateTime)
+
+
+@pytest.fixture
+def crud_sample(db):
+    PageSample.__table__.create(bind=db.get_bind(), checkfirst=True)
+    # Three distinct values per column: pages end in the middle of ties
+    db.add_all(
+        PageSample(
+            label=None if index % 3 == 2 else f"label {index % 3}",
+            price=decimal.Decimal(index % 3) + decimal.Decimal("0.25"),
+            at=datetime.time(index % 3, 30),
+            ref=uuid.UUID(int=index % 3),
+            created_at=datetime.datetime(2024, 1, 1 + index % 3),
+            blob=bytes([index % 3]),
+        )
+        for index in range(ROWS)
+    )
+    db.commit()
+    yield CRUDBase(PageSample)
+    db.rollback()
+    db.execute(delete(PageSample))
+    db.commit()
+
+
+def all_pages(crud_sample, db, **kwargs):
+    ids, cursor = [], None
+    while True:
+        items, cursor, _ = crud_sample.get_page_where_array(db=db, limit=4, cursor=cursor, count="none", **kwargs)
+        ids += [item.id for item in items]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("order_by", ["id", "label", "price", "at", "ref", "created_at"])
+@pytest.mark.parametrize("order", ["DESC", "ASC"])
+def test_cursor_pages_follow_the_list_order(db, crud_sample, order_by, order):
+    expected = [
+        item.id for item in crud_sample.get_multi_where_array(db=db, order_by=order_by, order=order, limit=ROWS)
+    ]
+    assert all_pages(crud_sample, db, order_by=order_by, order=order) == expected
+    assert len(set(expected)) == ROWS
+
+
+def test_cursor_round_trip(db, crud_sample):
+    sample = db.query(PageSample).first()
+    for order_by in ("price", "at", "ref", "created_at"):
+        cursor = crud_sample.encode_cursor(sample, order_by, "ASC")
+        assert crud_sample.decode_cursor(cursor, order_by, "ASC") == (getattr(sample, order_by), sample.id)
+
+
+def test_cursor_with_where(db, crud_sample):
+    where = [{"key": "price", "operator": ">", "value": 1}]
+    expected = [item.id for item in crud_sample.get_multi_where_array(db=db, where=where, limit=ROWS)]
+    assert all_pages(crud_sample, db, where=where) == expected
+    assert len(expected) == 15
+
+
+def test_invalid_cursors(db, crud_sample):
+    _, cursor, _ = crud_sample.get_page_where_array(db=db, limit=4, order_by="price")
+    with pytest.raises(HTTPException) as error:
+        crud_sample.get_page_where_array(db=db, limit=4, cursor=cursor, order_by="label")
+    assert error.value.status_code == 400
+
+    tampered = base64.urlsafe_b64encode(b'{"k":"price","o":"DESC","v":"x","t":"decimal","id":1}').decode()
+    for cursor in ("garbage", tampered):
+        with pytest.raises(HTTPException) as error:
+            crud_sample.get_page_where_array(db=db, limit=4, cursor=cursor, order_by="price")
+        assert error.value.detail == "Invalid cursor"
+
+
+def test_cursor_on_a_column_json_cannot_hold(db, crud_sample):
+    with pytest.raises(HTTPException) as error:
+        crud_sample.get_page_where_array(db=db, limit=4, order_by="blob")
+    assert error.value.status_code == 400
+
+
+def test_count_modes(db, crud_sample):
+    where = [{"key": "price", "operator": ">", "value": 1}]
+    _, _, total = crud_sample.get_page_where_array(db=db, limit=4, where=where, count="exact")
+    assert total == 15
+    # Estimates are exact outside MySQL
+    _, _, total = crud_sample.get_page_where_array(db=db, limit=4, where=where, count="estimate")
+    assert total == 15
+    _, _, total = crud_sample.get_page_where_array(db=db, limit=4, where=where, count="none")
+    assert total is None
+    with pytest.raises(HTTPException) as error:
+        crud_sample.get_page_where_array(db=db, limit=4, count="approximate")
+    assert error.value.status_code == 400
+
+
+def test_exact_count_of_cursor_and_empty_pages(db, crud_sample):
+    _, cursor, total = crud_sample.get_page_where_array(db=db, limit=4, count="exact")
+    assert total == ROWS
+    _, _, total = crud_sample.get_page_where_array(db=db, limit=4, cursor=cursor, count="exact")
+    assert total == ROWS
+    # A page past the end has no row to read the window count from
+    items, _, total = crud_sample.get_page_where_array(db=db, skip=ROWS, limit=4, count="exact")
+    assert items == [] and total == ROWS
+
+
+def test_exact_count_sees_writes(db, crud_sample):
+    assert crud_sample.get_count_where_array(db, mode="exact") == ROWS
+    sample = db.query(PageSample).first()
+    sample.deleted_at = datetime.datetime(2024, 2, 1)
+    db.commit()
+    # Soft deleted rows are not counted, and exact counts are never cached
+    assert crud_sample.get_count_where_array(db, mode="exact") == ROWS - 1
+    assert crud_sample.get_count_where_array(db, mode="exact", include_deleted=True) == ROWS
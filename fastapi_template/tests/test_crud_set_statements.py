@@ -0,0 +1,91 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, String, delete
+
+from app.crud.base_copy import CRUDBase
+from app.db.base_class import Base
+
+
+class SetSample(Base):
+    __tablename__ = "test_set_sample"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50))
+    rank = Column(Integer)
+    deleted_at = Column(DateTime)
+
+
+class SetSampleWithoutDeletedAt(Base):
+    __tablename__ = "test_set_sample_without_deleted_at"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50))
+
+
+@pytest.fixture
+def crud_sample(db):
+    SetSample.__table__.create(bind=db.get_bind(), checkfirst=True)
+    db.add_all(SetSample(name=f"sample {rank}", rank=rank) for rank in range(10))
+    db.commit()
+    yield CRUDBase(SetSample)
+    db.rollback()
+    db.execute(delete(SetSample))
+    db.commit()
+
+
+def visible_ranks(crud_sample, db):
+    return sorted(sample.rank for sample in crud_sample.get_multi_where_array(db=db, limit=100))
+
+
+def test_soft_delete_and_restore_where(db, crud_sample):
+    count, ids = crud_sample.soft_delete_where(db, where=[{"key": "rank", "operator": "<", "value": 3}])
+    assert count == 3
+    assert sorted(db.get(SetSample, id).rank for id in ids) == [0, 1, 2]
+    assert visible_ranks(crud_sample, db) == list(range(3, 10))
+
+    # Rows already soft deleted are not counted again
+    count, _ = crud_sample.soft_delete_where(db, where=[{"key": "rank", "operator": "<", "value": 4}])
+    assert count == 1
+
+    count, _ = crud_sample.restore_where(db, where=[{"key": "rank", "operator": "<", "value": 2}])
+    assert count == 2
+    assert visible_ranks(crud_sample, db) == [0, 1] + list(range(4, 10))
+
+
+def test_soft_delete_and_restore_ids(db, crud_sample):
+    ids = [sample.id for sample in db.query(SetSample).filter(SetSample.rank.in_([5, 6]))]
+    count, deleted = crud_sample.soft_delete_where(db, ids=ids)
+    assert count == 2 and sorted(deleted) == sorted(ids)
+    assert 5 not in visible_ranks(crud_sample, db)
+
+    count, restored = crud_sample.restore_where(db, ids=ids)
+    assert count == 2 and sorted(restored) == sorted(ids)
+    assert visible_ranks(crud_sample, db) == list(range(10))
+
+
+def test_where_and_ids_combined(db, crud_sample):
+    ids = [sample.id for sample in db.query(SetSample).filter(SetSample.rank.in_([1, 8]))]
+    count, _ = crud_sample.soft_delete_where(db, where=[{"key": "rank", "operator": ">", "value": 5}], ids=ids)
+    assert count == 1
+    assert 8 not in visible_ranks(crud_sample, db)
+
+
+def test_remove_where(db, crud_sample):
+    crud_sample.soft_delete_where(db, where=[{"key": "rank", "operator": "==", "value": 0}])
+    # Soft deleted rows are deleted too
+    count, _ = crud_sample.remove_where(db, where=[{"key": "rank", "operator": "<", "value": 2}])
+    assert count == 2
+    assert db.query(SetSample).count() == 8
+
+
+@pytest.mark.parametrize("method", ["soft_delete_where", "restore_where", "remove_where"])
+def test_set_statements_need_where_or_ids(db, crud_sample, method):
+    for empty in ({}, {"where": [], "ids": []}):
+        with pytest.raises(HTTPException) as error:
+            getattr(crud_sample, method)(db, **empty)
+        assert error.value.status_code == 400
+    assert db.query(SetSample).filter(SetSample.deleted_at.is_(None)).count() == 10
+
+
+def test_soft_delete_needs_deleted_at(db):
+    with pytest.raises(HTTPException) as error:
+        CRUDBase(SetSampleWithoutDeletedAt).soft_delete_where(db, ids=[1])
+    assert error.value.status_code == 400
@@ -0,0 +1,88 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, Integer, String, delete, event, func, inspect, update
+
+from app.crud.base_copy import CRUDBase
+from app.db.base_class import Base
+
+
+class VersionSample(Base):
+    __tablename__ = "test_version_sample"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50))
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    deleted_at = Column(DateTime)
+    version_id = Column(Integer, nullable=False)
+
+    __mapper_args__ = {"version_id_col": version_id}
+
+
+@pytest.fixture
+def crud_sample(db):
+    VersionSample.__table__.create(bind=db.get_bind(), checkfirst=True)
+    yield CRUDBase(VersionSample)
+    db.rollback()
+    db.execute(delete(VersionSample))
+    db.commit()
+
+
+@pytest.fixture
+def sample(db, crud_sample):
+    sample = VersionSample(name="a")
+    db.add(sample)
+    db.commit()
+    db.refresh(sample)
+    return sample
+
+
+def test_update_is_a_single_statement(db, crud_sample, sample):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement.split()[0])
+
+    event.listen(db.get_bind(), "before_cursor_execute", before_cursor_execute)
+    try:
+        sample = crud_sample.update(db, db_obj=sample, obj_in={"name": "b"})
+        # Nothing is expired by the commit, reading the object back selects nothing
+        assert not inspect(sample).expired_attributes
+        assert (sample.name, sample.version_id) == ("b", 2)
+        assert sample.updated_at is not None
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", before_cursor_execute)
+    assert statements == ["UPDATE"]
+
+
+def test_update_without_changes_writes_nothing(db, crud_sample, sample):
+    sample = crud_sample.update(db, db_obj=sample, obj_in={"name": "a", "unknown": 1})
+    assert sample.version_id == 1
+
+
+def test_stale_version_is_409(db, crud_sample, sample):
+    with pytest.raises(HTTPException) as error:
+        crud_sample.update(db, db_obj=sample, obj_in={"name": "b", "version_id": 5})
+    assert error.value.status_code == 409
+
+    sample = crud_sample.update(db, db_obj=sample, obj_in={"name": "b", "version_id": 1})
+    assert sample.version_id == 2
+
+
+def test_concurrent_update_is_409(db, crud_sample, sample):
+    # Another writer bumps the version after the object was read
+    db.execute(
+        update(VersionSample).where(VersionSample.id == sample.id).values(version_id=2)
+        .execution_options(synchronize_session=False)
+    )
+    with pytest.raises(HTTPException) as error:
+        crud_sample.update(db, db_obj=sample, obj_in={"name": "b"})
+    assert error.value.status_code == 409
+    assert db.get(VersionSample, sample.id).name == "a"
+
+
+def test_set_statements_bump_the_version(db, crud_sample, sample):
+    crud_sample.soft_delete_where(db, ids=[sample.id])
+    db.refresh(sample)
+    assert sample.version_id == 2
+    with pytest.raises(HTTPException) as error:
+        crud_sample.update(db, db_obj=sample, obj_in={"name": "b", "version_id": 1})
+    assert error.value.status_code == 409
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String, delete
+
+from app.crud.base_copy import CRUDBase
+from app.db.base_class import Base
+
+
+class WhereSample(Base):
+    __tablename__ = "test_where_sample"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50))
+    rank = Column(Integer)
+    deleted_at = Column(DateTime)
+
+
+@pytest.fixture
+def crud_sample(db):
+    WhereSample.__table__.create(bind=db.get_bind(), checkfirst=True)
+    db.add_all(WhereSample(name=name, rank=rank) for rank, name in enumerate(["a", "b", "b", "c", None]))
+    db.commit()
+    yield CRUDBase(WhereSample)
+    db.rollback()
+    db.execute(delete(WhereSample))
+    db.commit()
+
+
+def names(crud_sample, db, where):
+    return sorted(
+        (sample.name or "") for sample in crud_sample.get_multi_where_array(db=db, where=where, limit=100)
+    )
+
+
+def test_where_condition_reused_for_other_values(db, crud_sample):
+    condition, params = crud_sample.get_compiled_condition(where=[{"key": "name", "operator": "==", "value": "a"}])
+    same_condition, other_params = crud_sample.get_compiled_condition(
+        where=[{"key": "name", "operator": "==", "value": "b"}]
+    )
+    assert same_condition is condition
+    assert list(params.values()) == ["a"]
+    assert list(other_params.values()) == ["b"]
+
+    # Each call filters with its own values
+    assert names(crud_sample, db, [{"key": "name", "operator": "==", "value": "a"}]) == ["a"]
+    assert names(crud_sample, db, [{"key": "name", "operator": "==", "value": "b"}]) == ["b", "b"]
+
+
+def test_where_in_lists_of_different_lengths(db, crud_sample):
+    condition, _ = crud_sample.get_compiled_condition(where=[{"key": "rank", "operator": "in", "value": [0, 1]}])
+    longer, params = crud_sample.get_compiled_condition(
+        where=[{"key": "rank", "operator": "in", "value": [0, 1, 3]}]
+    )
+    assert longer is condition
+    assert list(params.values()) == [[0, 1, 3]]
+
+    assert names(crud_sample, db, [{"key": "rank", "operator": "in", "value": [0, 1]}]) == ["a", "b"]
+    assert names(crud_sample, db, [{"key": "rank", "operator": "in", "value": [0, 1, 3]}]) == ["a", "b", "c"]
+    assert names(crud_sample, db, [{"key": "rank", "operator": "in", "value": []}]) == []
+
+
+def test_where_condition_per_shape(db, crud_sample):
+    equal, _ = crud_sample.get_compiled_condition(where=[{"key": "name", "operator": "==", "value": "a"}])
+    greater, _ = crud_sample.get_compiled_condition(where=[{"key": "rank", "operator": ">", "value": 2}])
+    # Comparing to None renders IS NULL, another shape than comparing to a value
+    is_none, params = crud_sample.get_compiled_condition(where=[{"key": "name", "operator": "==", "value": None}])
+    assert len({id(equal), id(greater), id(is_none)}) == 3
+    assert params == {}
+
+    assert names(crud_sample, db, [{"key": "rank", "operator": ">", "value": 2}]) == ["", "c"]
+    assert names(crud_sample, db, [{"key": "name", "operator": "==", "value": None}]) == [""]
+
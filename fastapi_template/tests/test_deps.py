@@ -1,6 +1,6 @@
 from fastapi import HTTPException
 from jose import jwt
-from app.api.deps import get_current_user, get_current_active_user, get_current_active_superuser
+from app.api.deps import get_current_user, get_current_active_user, get_current_active_superuser, user_cache
 from app.core import security
 from app.models import User
 
@@ -45,3 +45,26 @@ def test_get_current_active_superuser(db, client):
     # Test get_current_active_superuser
     current_user = get_current_active_superuser(current_user=user)
     assert current_user.is_superuser
+
+
+def test_get_current_user_cached(db, client):
+    # Create a test user
+    user_data = {"email": "cached@example.com", "hashed_password": "x", "is_active": True}
+    user = User(**user_data)
+    db.add(user)
+    db.commit()
+    token = security.create_access_token(data={"id": str(user.id), "email": user.email})
+
+    # The second lookup is served from the user cache
+    user_cache.clear()
+    hits = user_cache.stats.hits
+    get_current_user(db=db, token=token)
+    current_user = get_current_user(db=db, token=token)
+    assert user_cache.stats.hits == hits + 1
+    assert current_user.email == user.email
+
+    # Deactivating the user drops the cached entry
+    current_user.is_active = False
+    db.commit()
+    assert user_cache.get(user.id) is None
+    assert not get_current_user(db=db, token=token).is_active
@@ -8,21 +8,19 @@ from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware  # Import CORSMiddleware
 
 from core.delete_models import delete_files
-from core.generate_apis_unit_test import write_test_apis
+from core.generated_files import GenerationManifest
+from core.generation_engine import GenerationEngine
 from core.generate_base_file import write_base_files
-from core.generate_crud import write_crud
-from core.generate_crud_unit_test import write_test_crud
-from core.generate_endpoints import write_endpoints
 from core.generate_env import generate_env
 from core.generate_init_file import write_init_files
-from core.generate_models import write_models
-from core.generate_schema import write_schemas
+from core.jobs import GenerationJobManager
 from model_type import create_or_update_mysql_user, write_config, drop_mysql_database_user
 from schemas import ClassModel, ProjectUpdate
 from sqlalchemy.orm import Session
 from fastapi import FastAPI, Depends, HTTPException
 
 import models, schemas, crud
+from core.config import settings
 from core.database import engine, get_db, Base
 from utils.alembic_command import run_migrations
 from pathlib import Path
@@ -49,56 +47,81 @@ def set_full_permissions(directory: str):
         print(f"Failed to set permissions for directory {directory}: {e}")
 
 
-def create_all_file(project, destination_dir, migration_message):
+def create_all_file(project, destination_dir, migration_message, progress=None):
     print("Setting permissions...")
     set_full_permissions(destination_dir)
 
     print("Generating project files...")
-    write_models(project.class_model, destination_dir)
-    write_schemas(project.class_model, destination_dir)
-    write_crud(project.class_model, destination_dir)
-    write_endpoints(project.class_model, destination_dir)
-    write_init_files(destination_dir)
-    write_base_files(project.class_model, destination_dir)
-    write_test_crud(project.class_model, destination_dir)
-    write_test_apis(project.class_model, destination_dir)
-    generate_env(project.config, output_file=os.path.normpath(os.path.join(destination_dir, ".env")))
-
-    # Optionally force file system sync
-    try:
-        os.sync()
-    except AttributeError:
-        pass  # os.sync doesn't exist on some platforms
+    manifest = GenerationManifest(destination_dir)
+    generation_engine = GenerationEngine(
+        destination_dir,
+        manifest=manifest,
+        max_workers=settings.GENERATION_WORKERS,
+        executor=settings.GENERATION_EXECUTOR,
+        config=project.config,
+    )
+    generation_engine.run(project.class_model, on_step=progress)
+    write_init_files(destination_dir, manifest, project.config)
+    write_base_files(project.class_model, destination_dir, manifest)
+    generate_env(project.config, output_file=os.path.normpath(os.path.join(destination_dir, ".env")),
+                 manifest=manifest)
+    manifest.save()
+    manifest.sync(settings.GENERATION_DURABILITY)
+
+    report = manifest.report()
+    print(f"Files written: {len(report['written'])}, unchanged: {len(report['skipped'])}")
+    for file_name in report["written"]:
+        print(f"  written: {file_name}")
 
     print("All files generated. Proceeding with Alembic migration...")
-    run_migrations(message=migration_message)
+    if progress:
+        progress("migrations", "running")
+    run_migrations(message=migration_message, project=project)
+    if progress:
+        progress("migrations")
+    return report
 
 
-def generate_project(project, migration_message):
+def generate_project(project, migration_message, progress=None):
     # Get current file's directory (inside 'test')
     current_dir = Path(__file__).resolve().parent
     root_dir = current_dir.parent
     template_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), "fastapi_template"))
     destination_dir = os.path.normpath(os.path.join(os.path.normpath(root_dir), project.name))
 
-    write_config(project)
     try:
         print("mandalo tsara", template_dir, destination_dir)
         if os.path.exists(destination_dir):
-            create_all_file(project, destination_dir, migration_message)
+            return create_all_file(project, destination_dir, migration_message, progress)
         else:
             # Copy the template directory to the destination
             shutil.copytree(template_dir, destination_dir)
 
             # Generate files in the new directory
-            create_all_file(project, destination_dir, migration_message)
-
-
+            return create_all_file(project, destination_dir, migration_message, progress)
 
     except FileExistsError as e:
         print("Error: Directory already exists.", e)
-    except Exception as e:
-        print(f"An error occurred: {e}")
+
+
+def run_generation_job(project, migration_message, deleted_class, progress):
+    """Generate a project in a background worker, then drop the files of its deleted classes."""
+    report = generate_project(project, migration_message, progress)
+    if len(deleted_class) > 0:
+        destination_dir = os.path.join(project.path, project.name)
+        manifest = GenerationManifest(destination_dir)
+        for class_name in deleted_class:
+            delete_files(class_name, destination_dir, manifest)
+        write_init_files(destination_dir, manifest, project.config)
+        write_base_files(project.class_model, destination_dir, manifest)
+        manifest.save()
+        manifest.sync(settings.GENERATION_DURABILITY)
+    return report
+
+
+generation_jobs = GenerationJobManager(run_generation_job, max_workers=settings.GENERATION_JOB_WORKERS)
+# Queued jobs are cancelled on shutdown, a running one is not waited for
+app.add_event_handler("shutdown", generation_jobs.shutdown)
 
 
 @app.post("/project/config", response_model=schemas.ProjectResponse)
@@ -163,8 +186,8 @@ def read_project(project_id: int, db: Session = Depends(get_db)):
     return "deleted"
 
 
-@app.put("/project")
-async def update_project(
+@app.put("/project", response_model=schemas.ProjectResponse)
+def update_project(
         project_id: int,
         project_in: ProjectUpdate,
         db: Session = Depends(get_db),
@@ -188,16 +211,19 @@ async def update_project(
     project_in.class_model = [project_ for project_ in project.class_model if project_['name'].lower() in updated_class
                               and project_['name'].lower() not in new_class]
     if write_project:
-        generate_project(project, migration_message)
-        if len(deleted_class) > 0:
-            destination_dir = os.path.join(project.path, project.name)
-            for class_name in deleted_class:
-                delete_files(class_name, destination_dir)
-            write_init_files(destination_dir)
-            write_base_files(project.class_model, destination_dir)
+        job = generation_jobs.submit(project, migration_message, deleted_class)
+        project.job_id = job.id
     return project
 
 
+@app.get("/project/jobs/{job_id}", response_model=schemas.GenerationJobResponse)
+def read_generation_job(job_id: str):
+    job = generation_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return job.to_dict()
+
+
 if __name__ == "__main__":
     config = {
         "app": "main:app",
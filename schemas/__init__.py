@@ -1 +1,3 @@
 from .project import ProjectCreate, ProjectResponse, ClassModel, ConfigSchema, AttributesModel, ProjectUpdate, Body
+from .job import GenerationJobResponse
+
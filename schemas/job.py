@@ -0,0 +1,17 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+
+class GenerationJobResponse(BaseModel):
+    id: str
+    project_id: int
+    status: str
+    steps: Dict[str, str]
+    coalesced: int = 0
+    report: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
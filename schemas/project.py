@@ -23,6 +23,9 @@ class ClassModel(BaseModel):
 
     name: str
     attributes: List[AttributesModel]
+    # Add a version_id column used for optimistic concurrency: updating a row changed
+    # since it was read is refused with a 409
+    versioned: bool = False
 
     @property
     def column_type_list(self) -> str:
@@ -58,6 +61,10 @@ class ConfigSchema(BaseModel):
     mysql_user: str
     mysql_password: str
     mysql_database: str
+    # Read replicas of the database: DSNs, or host[:port] with the credentials above
+    mysql_replicas: List[str] = []
+    # Generate an async stack: AsyncSession, AsyncCRUDBase and `async def` routers
+    async_db: bool = False
 
     @classmethod
     def from_body(cls, body, config):
@@ -102,6 +109,8 @@ class ConfigSchema(BaseModel):
             mysql_user=get_or_default("mysql_user", ""),
             mysql_password=get_or_default("mysql_password", ""),
             mysql_database=get_or_default("mysql_database", ""),
+            mysql_replicas=get_or_default("mysql_replicas", []),
+            async_db=get_or_default("async_db", False),
         )
 
 
@@ -124,6 +133,8 @@ class ProjectUpdate(BaseModel):
 
 class ProjectResponse(ProjectBase):
     id: int
+    # Set when the request queued a generation job
+    job_id: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -0,0 +1,5 @@
+import os
+
+# core.config requires the meta-API database settings, the generator tests never connect to it
+for name in ("MYSQL_USER", "MYSQL_PASSWORD", "MYSQL_HOST", "MYSQL_PORT", "MYSQL_DATABASE"):
+    os.environ.setdefault(name, "test")
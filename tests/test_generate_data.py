@@ -0,0 +1,27 @@
+import pytest
+
+from core.generate_apis_unit_test import render_test_api
+from core.generate_benchmarks import render_benchmark
+from core.generate_crud_unit_test import render_test_crud
+from schemas import AttributesModel, ClassModel
+
+
+@pytest.fixture
+def model():
+    return ClassModel(
+        name="Event",
+        attributes=[
+            AttributesModel(name="id", type="Integer", is_primary=True, is_auto_increment=True),
+            AttributesModel(name="name", type="String", length=50),
+            AttributesModel(name="starts_at", type="DateTime"),
+            AttributesModel(name="day", type="Date"),
+            AttributesModel(name="ref", type="UUID"),
+        ],
+    )
+
+
+@pytest.mark.parametrize("render", [render_test_crud, render_test_api, render_benchmark])
+def test_unchanged_class_renders_the_same_file(tmp_path, model, render):
+    _, first = render(model, str(tmp_path))
+    _, second = render(model.copy(deep=True), str(tmp_path))
+    assert first == second
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from core.generated_files import MANIFEST_FILE, GenerationManifest, write_generated_file
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    return str(tmp_path / "module.py")
+
+
+def test_unchanged_file_is_skipped(tmp_path, file_path):
+    manifest = GenerationManifest(str(tmp_path))
+    assert manifest.write(file_path, "a = 1\n")
+    assert not manifest.write(file_path, "a = 1\n")
+    assert manifest.report() == {"written": ["module.py"], "skipped": ["module.py"]}
+
+
+def test_changed_content_is_rewritten(tmp_path, file_path):
+    manifest = GenerationManifest(str(tmp_path))
+    manifest.write(file_path, "a = 1\n")
+    assert manifest.write(file_path, "a = 2\n")
+    with open(file_path) as f:
+        assert f.read() == "a = 2\n"
+
+
+def test_file_edited_on_disk_is_rewritten(tmp_path, file_path):
+    manifest = GenerationManifest(str(tmp_path))
+    manifest.write(file_path, "a = 1\n")
+    with open(file_path, "w") as f:
+        f.write("a = 10\n")
+    assert manifest.write(file_path, "a = 1\n")
+    with open(file_path) as f:
+        assert f.read() == "a = 1\n"
+
+
+def test_deleted_file_is_rewritten(tmp_path, file_path):
+    manifest = GenerationManifest(str(tmp_path))
+    manifest.write(file_path, "a = 1\n")
+    os.remove(file_path)
+    assert manifest.write(file_path, "a = 1\n")
+    assert os.path.exists(file_path)
+
+
+def test_forget_drops_the_entry(tmp_path, file_path):
+    manifest = GenerationManifest(str(tmp_path))
+    manifest.write(file_path, "a = 1\n")
+    manifest.forget(file_path)
+    assert manifest.entries == {}
+    # Forgetting a file the manifest never saw is a no-op
+    manifest.forget(str(tmp_path / "other.py"))
+
+
+def test_manifest_persists(tmp_path, file_path):
+    manifest = GenerationManifest(str(tmp_path))
+    manifest.write(file_path, "a = 1\n")
+    manifest.save()
+    manifest.sync()
+
+    manifest = GenerationManifest(str(tmp_path))
+    assert not manifest.write(file_path, "a = 1\n")
+    assert manifest.report()["written"] == []
+
+
+def test_unreadable_manifest_is_ignored(tmp_path, file_path):
+    (tmp_path / MANIFEST_FILE).write_text("{not json")
+    manifest = GenerationManifest(str(tmp_path))
+    assert manifest.entries == {}
+    assert manifest.write(file_path, "a = 1\n")
+
+
+def test_write_keeps_the_file_mode(tmp_path, file_path):
+    manifest = GenerationManifest(str(tmp_path))
+    manifest.write(file_path, "a = 1\n")
+    os.chmod(file_path, 0o755)
+    manifest.write(file_path, "a = 2\n")
+    assert os.stat(file_path).st_mode & 0o777 == 0o755
+
+
+def test_write_without_manifest(file_path):
+    assert write_generated_file(file_path, "a = 1\n")
+    assert write_generated_file(file_path, "a = 1\n")
+
+
+def test_invalid_durability(tmp_path):
+    with pytest.raises(ValueError):
+        GenerationManifest(str(tmp_path)).sync("sometimes")
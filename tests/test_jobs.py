@@ -0,0 +1,71 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from core.jobs import GenerationJobManager
+
+
+def project(id):
+    return SimpleNamespace(id=id, name=f"project_{id}", path="/tmp", config={}, class_model=[])
+
+
+@pytest.fixture
+def runs():
+    return []
+
+
+@pytest.fixture
+def release():
+    return threading.Event()
+
+
+@pytest.fixture
+def manager(runs, release):
+    def runner(project, migration_message, deleted_class, progress):
+        runs.append((project.id, migration_message))
+        if project.id == 1:
+            release.wait(5)
+        return {"written": [], "skipped": []}
+
+    manager = GenerationJobManager(runner, max_workers=2)
+    yield manager
+    release.set()
+    manager.shutdown()
+
+
+def wait_for(job, status="done"):
+    for _ in range(500):
+        if job.status == status:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"job is {job.status}, not {status}")
+
+
+def test_busy_project_does_not_starve_other_projects(manager, runs, release):
+    first = manager.submit(project(1), "first")
+    wait_for(first, "running")
+    # Waits for the first one without taking the second worker
+    second = manager.submit(project(1), "second")
+    other = manager.submit(project(2), "other")
+    wait_for(other)
+    assert second.status == "queued"
+
+    release.set()
+    wait_for(first)
+    wait_for(second)
+    assert runs == [(1, "first"), (2, "other"), (1, "second")]
+
+
+def test_saves_of_a_waiting_project_are_coalesced(manager, runs, release):
+    first = manager.submit(project(1), "first")
+    wait_for(first, "running")
+    second = manager.submit(project(1), "second", ["Item"])
+    assert manager.submit(project(1), "third", ["Order"]) is second
+    assert second.coalesced == 1 and second.deleted_class == ["Item", "Order"]
+
+    release.set()
+    wait_for(second)
+    assert runs == [(1, "first"), (1, "third")]
+    # The project is idle again, the next save runs at once
+    wait_for(manager.submit(project(1), "fourth"))
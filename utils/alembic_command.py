@@ -1,40 +1,79 @@
 import json
 import os
 import sys
-import subprocess
-from utils.move_migrations_versions import move_migration_files
+import threading
+
+from alembic import command
+from alembic.config import Config
+
+from model_type import write_config
 
 DEFAULT_PATH = os.path.join("alembic", "versions")
+ALEMBIC_INI = "alembic.ini"
 
+# Migrations import the generated project as the `app` package and touch sys.path,
+# so two generations must never migrate at the same time.
+_migration_lock = threading.Lock()
 
-def run_migrations(message: str):
-    try:
-        with open("config.json") as f:
-            config_data = json.load(f)
 
-        os.environ["PYTHONPATH"] = config_data["new_project_path"]
-        sys.path.append(config_data["new_project_path"])
+class MigrationError(Exception):
+    """Raised when generating or applying the migrations of a project fails."""
 
-        local_directory = DEFAULT_PATH
-        remote_directory = os.path.normpath(os.path.join(config_data["new_project_path"], DEFAULT_PATH))
 
-        print(f"Remote directory: {remote_directory}")
-        print("Moving migration files to local directory...")
-        move_migration_files(remote_directory, local_directory)
-        print("Finished moving migration files.")
+def purge_project_modules(package: str = "app"):
+    """Forget the previously imported generated project so its models are imported fresh."""
+    for module_name in list(sys.modules):
+        if module_name == package or module_name.startswith(package + "."):
+            del sys.modules[module_name]
 
-        # ✅ Run Alembic in a fresh subprocess
-        print("Creating migration...")
-        subprocess.run(["alembic", "revision", "--autogenerate", "-m", message], check=True)
 
-        print("Applying migration...")
-        subprocess.run(["alembic", "upgrade", "head"], check=True)
+def get_alembic_config(project_path: str) -> Config:
+    """Alembic config running our env.py against the versions directory of the generated project."""
+    versions_directory = os.path.normpath(os.path.join(project_path, DEFAULT_PATH))
+    os.makedirs(versions_directory, exist_ok=True)
+
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("version_locations", versions_directory)
+    # Logging is already configured by the running application
+    config.attributes["configure_logger"] = False
+    return config
 
-        print("Migrations completed successfully!")
 
-        print("Moving migration files back to remote directory...")
-        move_migration_files(local_directory, remote_directory)
+def run_migrations(message: str, project=None):
+    """Autogenerate and apply a revision. When `project` is given, its config.json is written under the lock."""
+    with _migration_lock:
+        if project is not None:
+            write_config(project)
+        with open("config.json") as f:
+            config_data = json.load(f)
+
+        project_path = config_data["new_project_path"]
+        # The generated project is importable only while it is migrated, the meta-API's own
+        # `core`, `schemas` and `models` must not resolve to its modules afterwards
+        saved_sys_path = list(sys.path)
+        saved_pythonpath = os.environ.get("PYTHONPATH")
+        os.environ["PYTHONPATH"] = project_path
+        if project_path in sys.path:
+            sys.path.remove(project_path)
+        sys.path.insert(0, project_path)
+        purge_project_modules()
 
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        sys.exit(1)
+        try:
+            alembic_config = get_alembic_config(project_path)
+            print(f"Versions directory: {alembic_config.get_main_option('version_locations')}")
+            try:
+                print("Creating migration...")
+                command.revision(alembic_config, message=message, autogenerate=True)
+
+                print("Applying migration...")
+                command.upgrade(alembic_config, "head")
+            except Exception as e:
+                raise MigrationError(f"Migration of {project_path} failed: {e}") from e
+        finally:
+            sys.path[:] = saved_sys_path
+            if saved_pythonpath is None:
+                os.environ.pop("PYTHONPATH", None)
+            else:
+                os.environ["PYTHONPATH"] = saved_pythonpath
+
+        print("Migrations completed successfully!")
@@ -5,68 +5,82 @@ import random
 import string
 
 
-def generate_random_text(length):
+# The generators draw from `rng`: the `random` module by default, or a `random.Random`
+# seeded by the caller to render the same data on every run without touching the global one
+
+
+def generate_random_text(length, rng=random):
     # Generate a random string of letters and digits
     characters = string.ascii_letters + string.digits
-    return ''.join(random.choices(characters, k=length))
+    return ''.join(rng.choices(characters, k=length))
 
 
-def generate_random_integer(max_value):
+def generate_random_integer(max_value, rng=random):
     # Generate a random integer between 0 and max_value (exclusive)
-    return random.randint(0, max_value)
+    return rng.randint(0, max_value)
 
 
-def generate_random_float():
+def generate_random_float(rng=random):
     a = 1.5
     b = 5.5
     # Generate a random float between a and b
-    return random.uniform(a, b)
+    return rng.uniform(a, b)
+
+
+def generate_random_boolean(rng=random):
+    return rng.choice([True, False])
+
+
+def generate_random_datetime(rng=random):
+    # Generate a random datetime in 2024, drawn from `rng` rather than the clock
+    return datetime.datetime(2024, 1, 1) + datetime.timedelta(seconds=rng.randrange(365 * 24 * 3600))
 
 
-def generate_random_boolean():
-    return random.choice([True, False])
+def generate_random_uuid(rng=random):
+    # Generate a random UUID, drawn from `rng` rather than uuid4
+    return uuid.UUID(int=rng.getrandbits(128))
 
 
-def generate_random_json():
+def generate_random_json(rng=random):
     # Generate a random JSON object
     return {
-        "id": random.randint(1, 100),  # Random integer
-        "is_active": random.choice([True, False]),  # Random boolean
-        "score": round(random.uniform(0, 100), 2),  # Random float
+        "id": rng.randint(1, 100),  # Random integer
+        "is_active": rng.choice([True, False]),  # Random boolean
+        "score": round(rng.uniform(0, 100), 2),  # Random float
         "metadata": {  # Nested JSON object
-            "created_at": f"2023-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",  # Random date
-            "updated_at": f"2023-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",  # Random date
+            "created_at": f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",  # Random date
+            "updated_at": f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",  # Random date
         }
     }
 
 
-def generate_data(type_: Any, length: int = 0):
+def generate_data(type_: Any, length: int = 0, rng=random):
     type_ = type_.upper()
     limit = 10 if length and length >= 10 else length
     if type_ == "STRING":
-        return generate_random_text(generate_random_integer(limit))
+        return generate_random_text(generate_random_integer(limit, rng), rng)
     elif type_ == "INTEGER":
-        return generate_random_integer(20)
+        return generate_random_integer(20, rng)
     elif type_ == "TEXT":
-        return generate_random_text(generate_random_integer(100))
+        return generate_random_text(generate_random_integer(100, rng), rng)
     elif type_ == "BOOLEAN":
-        return generate_random_boolean()
+        return generate_random_boolean(rng)
     elif type_ == "FLOAT":
-        return generate_random_float()
+        return generate_random_float(rng)
     elif type_ == "DATETIME":
-        return datetime.datetime.now()
+        return generate_random_datetime(rng)
     elif type_ == "DATE":
-        return datetime.date.today()
+        return generate_random_datetime(rng).date()
     elif type_ == "TIME":
         return datetime.time(
-            hour=generate_random_integer(23),
-            minute=generate_random_integer(59),
-            second=generate_random_integer(59)
+            hour=generate_random_integer(23, rng),
+            minute=generate_random_integer(59, rng),
+            second=generate_random_integer(59, rng)
         )
     elif type_ == "JSON":
-        return generate_random_json()
+        return generate_random_json(rng)
     elif type_ == "UUID":
-        return uuid.uuid4()
+        return generate_random_uuid(rng)
     else:
         return ""
 